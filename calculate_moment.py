@@ -42,6 +42,7 @@ To verify that the I1 >= I2 (see comments in GaussianMomentsAccountant in
 accountant.py for the context), run the same loop above with verify=True
 passed to compute_log_moment.
 """
+import functools
 import math
 import sys
 
@@ -148,6 +149,62 @@ def compute_b(sigma, q, lmbd, verbose=False):
     return _to_np_float64(b_lambda)
 
 
+@functools.lru_cache(maxsize=4096)
+def _compute_log_a(q, sigma, lmbd):
+    """Memoized one-step log moment log(A_lambda), the T-step log moment is T times this value."""
+    moment = compute_a(sigma, q, lmbd)
+    return np.inf if np.isinf(moment) else np.log(moment)
+
+
+#######################
+# VECTORIZED ROUTINES #
+#######################
+
+
+@functools.lru_cache(maxsize=1024)
+def _compute_log_a_all_orders(q, sigma, max_lmbd):
+    """Compute log(A_lambda) for all orders 1..max_lmbd in one pass.
+
+    The binomial expansion in compute_a is rewritten as
+        A_lambda = sum_i binom(lambda, i) q^i ((1 - q) S1_i + q S2_i),
+        S1_i = sum_j binom(i, j) (-1)^(i - j) exp((j^2 - j) / (2 sigma^2)),
+        S2_i = sum_j binom(i, j) (-1)^(i - j) exp((j^2 + j) / (2 sigma^2)),
+    where S1 and S2 do not depend on lambda, so they are shared by all orders.
+    Orders that overflow are inf, as in compute_a.
+    """
+    i = np.arange(max_lmbd + 1)
+    lower = i[None, :] <= i[:, None]
+    binom = scipy.special.binom(i[:, None], i[None, :])
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        coef_j = np.where(lower, binom * (-1.) ** (i[:, None] - i[None, :]), 0.)
+        s1 = np.sum(np.where(lower, coef_j * np.exp((i * i - i) / (2.0 * sigma ** 2)), 0.), axis=1)
+        s2 = np.sum(np.where(lower, coef_j * np.exp((i * i + i) / (2.0 * sigma ** 2)), 0.), axis=1)
+        coef_i = np.where(lower, binom * q ** i[None, :], 0.)
+        a_lambda = ((1.0 - q) * np.sum(np.where(lower, coef_i * s1, 0.), axis=1) +
+                    q * np.sum(np.where(lower, coef_i * s2, 0.), axis=1))
+        a_lambda[~np.isfinite(a_lambda)] = np.inf
+        log_a = np.log(a_lambda[1:])
+    log_a.flags.writeable = False
+    return log_a
+
+
+def compute_log_moments(q, sigma, steps, max_lmbd):
+    """Compute the log moments of Gaussian mechanism for all orders 1..max_lmbd.
+
+    Same as [compute_log_moment(q, sigma, steps, lmbd) for lmbd in 1..max_lmbd],
+    but vectorized over the orders and memoized on (q, sigma, max_lmbd).
+
+    Args:
+        q: the sampling ratio.
+        sigma: the noise sigma.
+        steps: the number of steps.
+        max_lmbd: the maximum moment order.
+    Returns:
+        array of the log moments of orders 1..max_lmbd, could contain np.inf.
+    """
+    return _compute_log_a_all_orders(float(q), float(sigma), int(max_lmbd)) * steps
+
+
 ###########################
 # MULTIPRECISION ROUTINES #
 ###########################
@@ -288,6 +345,8 @@ def compute_log_moment(q, sigma, steps, lmbd, verify=False, verbose=False):
     Returns:
         the log moment with type np.float64, could be np.inf.
     """
+    if not verify and not verbose:
+        return _compute_log_a(q, sigma, lmbd) * steps
     moment = compute_a(sigma, q, lmbd, verbose=verbose)
     if verify:
         mp.dps = 50
@@ -0,0 +1,122 @@
+"""A utility for computing the Renyi differential privacy (RDP) of the sampled Gaussian mechanism.
+
+compute_rdp(q, sigma, steps, orders) computes the RDP of `steps` compositions of the sampled Gaussian mechanism
+with sampling ratio q and noise sigma, for all `orders` at once. get_privacy_spent_rdp converts the RDP to
+(eps, delta)-DP.
+
+The RDP of the sampled Gaussian mechanism of order alpha is log(A_alpha) / (alpha - 1), see
+Mironov et al., Renyi Differential Privacy of the Sampled Gaussian Mechanism (https://arxiv.org/abs/1908.10530):
+
+- for integer orders, A_alpha is the finite binomial sum
+  sum_k binom(alpha, k) (1 - q)^(alpha - k) q^k exp((k^2 - k) / (2 sigma^2)),
+- for fractional orders, A_alpha is the sum of two infinite series with alternating signs, truncated once the
+  terms are negligible.
+
+All sums are computed in log space, so they do not overflow for large orders.
+
+Since the log moment of order lambda of the moments accountant is lambda times the RDP of order lambda + 1,
+the integer orders give the same bound as :mod:`calculate_moment`, in milliseconds.
+"""
+import math
+
+import numpy as np
+import scipy.special
+
+DEFAULT_ORDERS = np.concatenate([1 + np.arange(1, 100) / 10., np.arange(11, 64), [128., 256., 512.]])
+
+
+def _compute_log_a_int(q, sigma, alpha):
+    """Compute log(A_alpha) for an integer alpha."""
+    k = np.arange(alpha + 1)
+    log_binom = scipy.special.gammaln(alpha + 1) - scipy.special.gammaln(k + 1) - scipy.special.gammaln(alpha - k + 1)
+    log_terms = log_binom + k * math.log(q) + (alpha - k) * math.log1p(-q) + (k * k - k) / (2 * sigma ** 2)
+    return scipy.special.logsumexp(log_terms)
+
+
+def _log_erfc(x):
+    return math.log(2) + scipy.special.log_ndtr(-x * math.sqrt(2))
+
+
+def _compute_log_a_frac(q, sigma, alpha, max_terms=100000):
+    """Compute log(A_alpha) for a fractional alpha.
+
+    The binomial coefficients binom(alpha, i) of the two series change sign for i > alpha, so the terms are summed
+    with their sign, in batches of terms, until they are negligible (below exp(-30) of the total) and decreasing.
+    """
+    z0 = sigma ** 2 * math.log(1 / q - 1) + .5
+    log_terms, signs = [], []
+    for start in range(0, max_terms, 256):
+        i = np.arange(start, start + 256, dtype=float)
+        j = alpha - i
+        log_coef = (scipy.special.gammaln(alpha + 1) - scipy.special.gammaln(i + 1) -
+                    scipy.special.gammaln(alpha - i + 1))
+        sign = scipy.special.gammasgn(alpha - i + 1)  # sign of binom(alpha, i), the other gamma terms are positive
+        log_s0 = (log_coef + i * math.log(q) + j * math.log1p(-q) + (i * i - i) / (2 * sigma ** 2) +
+                  math.log(.5) + _log_erfc((i - z0) / (math.sqrt(2) * sigma)))
+        log_s1 = (log_coef + j * math.log(q) + i * math.log1p(-q) + (j * j - j) / (2 * sigma ** 2) +
+                  math.log(.5) + _log_erfc((z0 - j) / (math.sqrt(2) * sigma)))
+        log_terms += [log_s0, log_s1]
+        signs += [sign, sign]
+        total, total_sign = scipy.special.logsumexp(np.concatenate(log_terms), b=np.concatenate(signs),
+                                                    return_sign=True)
+        tail = np.maximum(log_s0, log_s1)[-2:]
+        if tail[1] < tail[0] and tail[1] < total - 30:
+            return total if total_sign > 0 else np.inf
+    return np.inf
+
+
+def _compute_rdp_one_step(q, sigma, alpha):
+    if q == 0:
+        return 0.
+    if sigma == 0:
+        return np.inf
+    if q == 1.:
+        return alpha / (2 * sigma ** 2)
+    if float(alpha).is_integer():
+        log_a = _compute_log_a_int(q, sigma, int(alpha))
+    else:
+        log_a = _compute_log_a_frac(q, sigma, alpha)
+    return log_a / (alpha - 1)
+
+
+def compute_rdp(q, sigma, steps, orders=DEFAULT_ORDERS):
+    """Compute the RDP of the sampled Gaussian mechanism.
+
+    Args:
+        q: the sampling ratio.
+        sigma: the noise sigma, the ratio of the standard deviation of the noise to the L2-sensitivity.
+        steps: the number of steps.
+        orders: the RDP orders, all greater than 1.
+    Returns:
+        array of the RDP for each order.
+    """
+    orders = np.atleast_1d(np.asarray(orders, dtype=float))
+    assert np.all(orders > 1), "RDP orders should be greater than 1."
+    return np.array([_compute_rdp_one_step(q, sigma, alpha) for alpha in orders]) * steps
+
+
+def get_privacy_spent_rdp(orders, rdp, target_eps=None, target_delta=None):
+    """Compute delta (or eps) for given eps (or delta) from the RDP curve, vectorized over the orders.
+
+    Uses eps = rdp(alpha) + log(1 / delta) / (alpha - 1), minimized over the orders.
+
+    Args:
+        orders: array of the RDP orders.
+        rdp: array of the RDP for each order.
+        target_eps: if not None, the epsilon for which we would like to compute
+            corresponding delta value.
+        target_delta: if not None, the delta for which we would like to compute
+            corresponding epsilon value. Exactly one of target_eps and target_delta
+            is None.
+    Returns:
+        eps, delta pair
+    """
+    assert (target_eps is None) ^ (target_delta is None)
+    orders, rdp = np.asarray(orders, dtype=float), np.asarray(rdp, dtype=float)
+    if target_eps is not None:
+        with np.errstate(over="ignore"):
+            delta = np.exp((orders - 1) * (rdp - target_eps))
+        return (target_eps, float(min(np.nanmin(delta), 1.)))
+    else:
+        eps = rdp - math.log(target_delta) / (orders - 1)
+        return (float(np.nanmin(eps)), target_delta)
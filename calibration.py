@@ -0,0 +1,128 @@
+"""
+Calibration of the noise of the sampled Gaussian mechanism to a target privacy budget.
+
+:func:`calibrate_noise_multiplier` finds the smallest noise multiplier (`sigma` of `private_SGD`, `noise_scale` of
+`DPFedAvgServer.train`) such that the moment accountant spends at most the target :math:`(\epsilon,\delta)`.
+The :math:`\epsilon` spent is decreasing in the noise multiplier, so it is found by bisection on the vectorized
+log moments of :mod:`calculate_moment`. The solved configurations can be kept in a JSON file shared by processes,
+so repeated sweeps over the same configurations do not solve them again.
+"""
+
+import fcntl
+import json
+import math
+import os
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from calculate_moment import compute_log_moments
+
+_cache_lock = threading.Lock()
+_caches = {}  # type: Dict[str, Dict[str, float]]  # configurations read from or written to each cache file
+
+
+def compute_epsilon(sampling_ratio: float, sigma: float, steps: int, target_delta: float,
+                    moment_order: int = 32) -> float:
+    """Compute the :math:`\epsilon` spent by the sampled Gaussian mechanism for a target :math:`\delta`,
+    same as `get_privacy_spent` of the moment accountant but vectorized over the moment orders.
+
+    :param sampling_ratio: Ratio of data used to total data in one step
+    :param sigma: Noise multiplier
+    :param steps: Number of steps
+    :param target_delta: Target value of :math:`\delta`
+    :param moment_order: Maximum order of moment, defaults to 32
+    :return: Value of :math:`\epsilon`, `inf` if the log moments of all orders overflow
+    """
+    log_moments = compute_log_moments(sampling_ratio, sigma, steps, moment_order)
+    eps = (log_moments - math.log(target_delta)) / np.arange(1, moment_order + 1)
+    eps = eps[np.isfinite(eps)]
+    return float(np.min(eps)) if len(eps) > 0 else math.inf
+
+
+def _read_cache(path: str) -> Dict[str, float]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _lookup_cache(path: str, key: str) -> Optional[float]:
+    """Return the noise multiplier of a configuration, the file is read again if the configuration is not in memory
+    since other processes may have solved it."""
+    cache = _caches.setdefault(path, {})
+    if key not in cache:
+        cache.update(_read_cache(path))
+    return cache.get(key)
+
+
+def _save_cache(path: str, key: str, sigma: float):
+    """Add a configuration to the file. The file is read again and merged under a file lock, so the configurations
+    saved concurrently by other processes are kept, and replaced atomically, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file is closed
+        cache = _read_cache(path)
+        cache[key] = sigma
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, path)
+    _caches.setdefault(path, {}).update(cache)
+
+
+def calibrate_noise_multiplier(sampling_ratio: float, steps: int, target_eps: float, target_delta: float,
+                               moment_order: int = 32, tolerance: float = 1e-3,
+                               cache_path: Optional[str] = None) -> float:
+    """Find the smallest noise multiplier such that `steps` steps of the sampled Gaussian mechanism with sampling
+    ratio `sampling_ratio` are :math:`(\epsilon,\delta)`-DP by the moment accountant.
+
+    :param sampling_ratio: Ratio of data used to total data in one step
+    :param steps: Number of steps
+    :param target_eps: Target value of :math:`\epsilon`
+    :param target_delta: Target value of :math:`\delta`
+    :param moment_order: Maximum order of moment, defaults to 32
+    :param tolerance: Relative tolerance of the noise multiplier, defaults to 1e-3
+    :param cache_path: JSON file of the solved configurations, shared by the processes using the same path,
+        defaults to None (no cache)
+    :return: The noise multiplier, which spends at most the target :math:`\epsilon` and is within `tolerance` of
+        the smallest one
+    """
+    assert 0 < sampling_ratio <= 1, "expected a sampling ratio in (0, 1]."
+    assert steps > 0, "expected a positive number of steps."
+    assert target_eps > 0, "Value of epsilon should be positive"
+    assert 0 < target_delta < 1, "Value of delta should be in (0, 1)"
+    assert tolerance > 0, "expected a positive value."
+
+    key = f'{sampling_ratio!r},{steps},{target_eps!r},{target_delta!r},{moment_order},{tolerance!r}'
+    if cache_path is not None:
+        with _cache_lock:
+            sigma = _lookup_cache(cache_path, key)
+        if sigma is not None:
+            return sigma
+
+    def spends_at_most_target(sigma: float) -> bool:
+        return compute_epsilon(sampling_ratio, sigma, steps, target_delta, moment_order) <= target_eps
+
+    # bracket the noise multiplier between low (too small) and high (enough noise) by doubling
+    high = 1.
+    while not spends_at_most_target(high):
+        high *= 2
+        assert high < 1e6, "the target privacy budget cannot be reached."
+    low = high / 2
+    while low > 1e-6 and spends_at_most_target(low):
+        high, low = low, low / 2
+
+    while high - low > tolerance * high:
+        mid = (low + high) / 2
+        if spends_at_most_target(mid):
+            high = mid
+        else:
+            low = mid
+
+    if cache_path is not None:
+        with _cache_lock:
+            _save_cache(cache_path, key, high)
+    return high
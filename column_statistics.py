@@ -0,0 +1,178 @@
+"""
+ColumnStatistics classes.
+"""
+
+from functools import cached_property
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+
+from data_domain import CategoricalDataDomain, DataDomain, RealDataDomain
+
+
+class ColumnStatistics:
+    """Lazily computed sufficient statistics of a single column.
+
+    Each statistic is computed by one scan over the column at its first access and cached afterwards,
+    so repeated queries on the same column only need to add noise.
+
+    - count, sum, variance, min, max: for numerical columns
+    - sorted values: for order statistics such as median
+    - category counts: for categorical columns
+    """
+
+    def __init__(self, values: Union[ndarray, pd.Categorical]):
+        """
+        :param values: Values of the column, categorical columns are given as `pandas.Categorical`
+        """
+        self._values = values
+
+    @cached_property
+    def count(self) -> int:
+        return len(self._values)
+
+    @cached_property
+    def sum(self) -> float:
+        return np.sum(self._values)
+
+    @cached_property
+    def var(self) -> float:
+        # two passes (numpy.var), the one-pass formula E[X^2] - E[X]^2 loses all precision for large offsets
+        return float(np.var(np.asarray(self._values, dtype=float)))
+
+    @cached_property
+    def min(self) -> float:
+        return np.min(self._values)
+
+    @cached_property
+    def max(self) -> float:
+        return np.max(self._values)
+
+    @cached_property
+    def sorted_values(self) -> ndarray:
+        return np.sort(np.asarray(self._values))
+
+    @cached_property
+    def category_counts(self) -> Tuple[ndarray, ndarray]:
+        """Return the distinct values and their number of occurrences.
+
+        For a `pandas.Categorical` these are all its categories in order, counted with `numpy.bincount` over the
+        integer codes. Otherwise the distinct values occurring in the column, sorted.
+        """
+        if isinstance(self._values, pd.Categorical):
+            categories = np.asarray(self._values.categories, dtype=object)
+            return categories, np.bincount(self._values.codes[self._values.codes >= 0], minlength=len(categories))
+        return np.unique(np.asarray(self._values), return_counts=True)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count
+
+    @property
+    def std(self) -> float:
+        return np.sqrt(self.var)
+
+    @property
+    def median(self) -> float:
+        values, n = self.sorted_values, self.count
+        return values[n // 2] if n % 2 == 1 else (values[n // 2 - 1] + values[n // 2]) / 2
+
+
+class StreamingColumnStatistics(ColumnStatistics):
+    """Mergeable sufficient statistics of a single column, updated chunk by chunk with bounded memory.
+
+    The variance is accumulated as the sum of squared deviations from the mean, updated for each chunk and merged
+    with the pairwise formula of Chan et al., which is numerically stable unlike the sum of squares.
+
+    Order statistics cannot be computed exactly in one pass with bounded memory, so the median of a numerical column
+    is approximated by interpolating a histogram with `resolution` equal-width bins over the data domain. The result
+    is within the width of one bin from a median of the column.
+    """
+
+    def __init__(self, domain: DataDomain, resolution: int = 1024):
+        """
+        :param domain: Data domain of the column
+        :param resolution: Number of histogram bins used to approximate the median, defaults to 1024
+        """
+        assert resolution > 0, "expected a positive value."
+        self._domain = domain
+        self.count = 0
+        self.sum = 0.
+        self._mean = 0.
+        self._m2 = 0.  # sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+        if isinstance(domain, CategoricalDataDomain):
+            self._counts = np.zeros(len(domain.values), dtype=np.int64)
+        if isinstance(domain, RealDataDomain):
+            self._bin_edges = np.linspace(domain.lower_bound, domain.upper_bound, resolution + 1)
+            self._hist = np.zeros(resolution, dtype=np.int64)
+
+    def update(self, values: Union[ndarray, pd.Series]):
+        """Add a chunk of values of the column.
+
+        :param values: Values of the chunk
+        """
+        if len(values) == 0:
+            return
+        if isinstance(self._domain, RealDataDomain):
+            values = np.asarray(values, dtype=float)
+            mean = np.mean(values)
+            self._combine_moments(len(values), mean, np.dot(values - mean, values - mean))
+            self.sum += np.sum(values)
+            self.min = min(self.min, np.min(values))
+            self.max = max(self.max, np.max(values))
+            if self._domain.length() > 0:
+                self._hist += np.histogram(values, bins=self._bin_edges)[0]
+        elif isinstance(self._domain, CategoricalDataDomain):
+            codes = self._domain.encode(values)
+            self._counts += np.bincount(codes[codes >= 0], minlength=len(self._counts))
+        self.count += len(values)
+
+    def _combine_moments(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self._mean
+        self._m2 += m2 + delta**2 * self.count * count / total
+        self._mean += delta * count / total
+
+    def merge(self, other: 'StreamingColumnStatistics'):
+        """Merge the statistics of another part of the same column.
+
+        :param other: Statistics of the other part, must use the same data domain and resolution
+        """
+        if other.count > 0:
+            self._combine_moments(other.count, other._mean, other._m2)
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if isinstance(self._domain, RealDataDomain):
+            self._hist += other._hist
+        elif isinstance(self._domain, CategoricalDataDomain):
+            self._counts += other._counts
+
+    @property
+    def var(self) -> float:
+        return self._m2 / self.count
+
+    @property
+    def sorted_values(self) -> ndarray:
+        raise TypeError('sorted values are not supported in streaming mode, use the approximate median.')
+
+    @property
+    def category_counts(self) -> Tuple[ndarray, ndarray]:
+        """Return all values of the categorical data domain in order and their number of occurrences."""
+        return np.array(self._domain.values, dtype=object), self._counts.copy()
+
+    @property
+    def median(self) -> float:
+        if not isinstance(self._domain, RealDataDomain) or self._domain.length() == 0:
+            return self.min
+        cumulative = np.cumsum(self._hist)
+        i = int(np.searchsorted(cumulative, self.count / 2))
+        below = cumulative[i - 1] if i > 0 else 0
+        fraction = (self.count / 2 - below) / self._hist[i]
+        median = self._bin_edges[i] + fraction * (self._bin_edges[i + 1] - self._bin_edges[i])
+        return float(np.clip(median, self.min, self.max))
@@ -1,6 +1,10 @@
 import abc
 from abc import ABC
-from typing import Any, Iterable, Union
+from typing import Any, Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
 
 
 class DataDomain(ABC):
@@ -19,6 +23,16 @@ class DataDomain(ABC):
     def contains(self, value: Union[float, Any]):
         pass
 
+    def contains_all(self, values: Union[ndarray, pd.Series, Iterable[Any]]) -> ndarray:
+        """Check element-wise if values contain in the data domain.
+
+        Subclasses should override this with a vectorized check, the default falls back to :func:`contains`.
+
+        :param values: The values to be checked
+        :return: Boolean array, `True` where the value contains in the data domain
+        """
+        return np.array([self.contains(value) for value in values], dtype=bool)
+
 
 class RealDataDomain(DataDomain):
     """A range of real values: [left, right].
@@ -42,6 +56,25 @@ class RealDataDomain(DataDomain):
         """
         return self._lower_bound <= value <= self._upper_bound
 
+    def contains_all(self, values: Union[ndarray, pd.Series, Iterable[Any]]) -> ndarray:
+        """Check element-wise if values contain in the data domain using a single comparison over the whole array.
+
+        :param values: The values to be checked
+        :return: Boolean array, `True` where the value contains in the data domain
+        """
+        values = np.asarray(values)
+        if not np.issubdtype(values.dtype, np.number):
+            return super().contains_all(values)
+        return (values >= self._lower_bound) & (values <= self._upper_bound)
+
+    @property
+    def lower_bound(self) -> float:
+        return self._lower_bound
+
+    @property
+    def upper_bound(self) -> float:
+        return self._upper_bound
+
     def length(self) -> float:
         return self._upper_bound - self._lower_bound
 
@@ -55,10 +88,14 @@ class CategoricalDataDomain(DataDomain):
 
     def __init__(self, values: Iterable[Any]):
         """
-        :param values: List that contains all possible values of the data domain
+        :param values: List that contains all possible values of the data domain, the order of the list is kept.
+            Null values (None, NaN) are not supported, missing data should be replaced by a placeholder value.
         """
         super().__init__()
-        self._values = set(values)
+        self._ordered_values = list(dict.fromkeys(values))
+        assert not any(pd.api.types.is_scalar(value) and pd.isna(value) for value in self._ordered_values), \
+            "null values are not supported in a categorical data domain, replace them by a placeholder, e.g. 'missing'."
+        self._values = set(self._ordered_values)
 
     def contains(self, value: Union[float, Any]) -> bool:
         """Check if value contains in the data domain.
@@ -68,5 +105,39 @@ class CategoricalDataDomain(DataDomain):
         """
         return value in self._values
 
+    def contains_all(self, values: Union[ndarray, pd.Series, Iterable[Any]]) -> ndarray:
+        """Check element-wise if values contain in the data domain using a vectorized `isin`.
+
+        :param values: The values to be checked
+        :return: Boolean array, `True` where the value contains in the data domain
+        """
+        if not isinstance(values, pd.Series):
+            values = pd.Series(list(values), dtype=object)
+        return values.isin(self._ordered_values).to_numpy()
+
+    def encode(self, values: Union[ndarray, pd.Series, Iterable[Any]]) -> ndarray:
+        """Encode values into integer codes, following the order of the values of the data domain.
+
+        :param values: The values to be encoded
+        :return: Compact integer codes (int8 for up to 127 values), -1 for values not in the data domain
+        """
+        if not isinstance(values, (ndarray, pd.Series)):
+            values = pd.Series(list(values), dtype=object)
+        codes = pd.Index(self._ordered_values).get_indexer(values)
+        return codes.astype(np.min_scalar_type(-len(self._ordered_values)))
+
+    def decode(self, codes: ndarray) -> pd.Categorical:
+        """Decode integer codes created by :func:`encode` without copying them.
+
+        :param codes: The integer codes
+        :return: Categorical values
+        """
+        return pd.Categorical.from_codes(codes, categories=self._ordered_values)
+
+    @property
+    def values(self) -> List[Any]:
+        """All possible values of the data domain, in the order given at construction."""
+        return list(self._ordered_values)
+
     def __repr__(self):
         return f'a set of {self._values}'
@@ -1,31 +1,74 @@
-import abc
 import itertools
 import random
-import threading
-from typing import Any, Callable, Iterable, List, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 import tensorflow as tf
 from numpy import ndarray
-from numpy.random import normal
 from tensorflow.keras import Model, losses
 
+# the servers do not depend on TensorFlow, they are re-exported here for the users of this module
+from federated_server import AsyncDPFedAvgServer, AsyncFedAvgServer, DPFedAvgServer, FedAvgServer  # noqa: F401
+from parameter_vector import ParameterLayout, clip_by_l2_norm
+from update_codec import UpdateCodec
+
+
+def make_dataset(data: Union[ndarray, list], minibatch_size: int) -> tf.data.Dataset:
+    """Helper function used to create the tf.data pipeline of the training data of a client. The data is shuffled
+    at every epoch, split into minibatches of size minibatch_size, and the next minibatches are prefetched while
+    the model is trained.
+
+    :param data: Client's traning data. Each element represent one training sample.
+    :param minibatch_size: Size of minibatch.
+    :return: Dataset of minibatches.
+    """
+    return (tf.data.Dataset.from_tensor_slices(data)
+            .shuffle(len(data), reshuffle_each_iteration=True)
+            .batch(minibatch_size)
+            .prefetch(tf.data.experimental.AUTOTUNE))
+
+
+def compile_train_epoch(train_step: Callable[..., None]) -> Callable[..., None]:
+    """Helper function used to compile one epoch of training, a loop of train_step over the minibatches of a
+    dataset, into one graph with tf.function.
+
+    :param train_step: Function training the model using one minibatch, with TensorFlow ops only.
+    :return: Function training the model using a dataset of minibatches and the other arguments of train_step.
+    """
+    @tf.function
+    def train_epoch(dataset: tf.data.Dataset, *args: Any):
+        for minibatch in dataset:
+            train_step(minibatch, *args)
+    return train_epoch
+
 
 class FedAvgClient:
     """Client side of FederatedAveraging (FedAvg) algorithm (https://arxiv.org/pdf/1602.05629.pdf).
     The implementation is based on Tensorflow.
     """
 
-    def __init__(self, model_fn: Callable[[], Model], loss_fn: Callable[[Any, ndarray], ndarray], data: ndarray):
+    def __init__(self, model_fn: Callable[[], Model], loss_fn: Callable[[Any, ndarray], ndarray], data: ndarray,
+                 codec: Optional[UpdateCodec] = None, use_tf_data: bool = False, use_tf_function: bool = False):
         """
         :param model_fn: Function used to create instance of model, should be the same as server.
         :param loss_fn: Function that receives model and data batch, and return the loss value caluclated by tf.keras.losses.
         :param data: Client's traning data. Each element represent one training sample.
+        :param codec: Codec used to compress the update sent to the server, defaults to None (no compression).
+        :param use_tf_data: Feed the minibatches through a tf.data pipeline (see :func:`make_dataset`) instead of
+            lists, in which case loss_fn receives tensors, defaults to False.
+        :param use_tf_function: Compile the whole epoch over the tf.data pipeline with tf.function, requires
+            use_tf_data since list minibatches of varying sizes would trace the function again, defaults to False.
         """
+        assert use_tf_data or not use_tf_function, "use_tf_function requires use_tf_data."
         self.data = data
         self.model = model_fn()
         self.loss_fn = loss_fn
         self.optimizer = tf.keras.optimizers.SGD()
+        self.codec = codec
+        self.use_tf_data = use_tf_data
+        self.use_tf_function = use_tf_function
+        self._datasets = {}  # type: Dict[int, tf.data.Dataset]
+        self._compiled_train_fn = None  # type: Optional[Callable]
 
     def split_data(self, minibatch_size: int) -> list:
         """Function used to split data into minibatches with size of minibatch_size.
@@ -46,98 +89,64 @@ class FedAvgClient:
             grads = tape.gradient(loss, self.model.trainable_variables)
             self.optimizer.apply_gradients(zip(grads, self.model.trainable_variables))
 
+    def minibatches(self, minibatch_size: int) -> Union[list, tf.data.Dataset]:
+        """Function used to get the minibatches of one epoch, from the tf.data pipeline if use_tf_data is set.
+
+        :param minibatch_size: Size of minibatch.
+        :return: List of batches data, or dataset of minibatches.
+        """
+        if not self.use_tf_data:
+            return self.split_data(minibatch_size)
+        if minibatch_size not in self._datasets:
+            self._datasets[minibatch_size] = make_dataset(self.data, minibatch_size)
+        return self._datasets[minibatch_size]
+
+    def train_epoch(self, minibatches: Union[list, tf.data.Dataset]):
+        """Function for training the model using the minibatches of one epoch.
+
+        :param minibatches: List of batches data, or dataset of minibatches.
+        """
+        if not self.use_tf_function:
+            for batch in minibatches:
+                self.train_step(batch)
+            return
+        if self._compiled_train_fn is None:
+            self._compiled_train_fn = compile_train_epoch(self.train_step)
+        self._compiled_train_fn(minibatches)
+
     def train(self, global_weights: ndarray, minibatch_size: int, epoch: int):
         """Function for training the model.
 
         :param global_weights: Global weights received from server.
         :param minibatch_size: Size of a single minibatch.
         :param epoch: Number of epoch.
-        :return: return model weights and number of data used for training.
+        :return: return model weights and number of data used for training. With a codec, the model weights are
+            replaced by the encoded update, i.e. the difference between the model weights and the global weights.
         """
         self.model.set_weights(global_weights)
+        if self.codec is not None:
+            weights = self.model.get_weights()
+            layout = ParameterLayout.from_arrays(weights)
+            initial_weights = layout.flatten(weights)
 
         for _ in range(epoch):
-            minibatch_data = self.split_data(minibatch_size)
-            for batch in minibatch_data:
-                self.train_step(batch)
+            self.train_epoch(self.minibatches(minibatch_size))
+        if self.codec is not None:
+            return self.codec.encode(layout.flatten(self.model.get_weights()) - initial_weights), len(self.data)
         return self.model.get_weights(), len(self.data)
 
 
-class FedAvgServer:
-    """Server side of FederatedAveraging (FedAvg) algorithm (https://arxiv.org/pdf/1602.05629.pdf).
-    The implementation is based on Tensorflow.
-    """
-
-    def __init__(self, model_fn: Callable[[], Model], clients: List[Any]):
-        """
-        :param model_fn: Function used to create instance of model, should be the same as clients.
-        :param clients: List of client objects used to identify each client.
-        """
-        self.clients = clients
-        self.model = model_fn()
-
-    @abc.abstractmethod
-    def send_train_request(self, client: Any, minibatch_size: int, epoch: int):
-        """Abstract method for sending training request to client.
-
-        :param client: Target client used for training.
-        :param minibatch_size: Size of minibatch used by client during training.
-        :param epoch: Number of epoch for training.
-        """
-        pass
-
-    def train_client(self, client: Any, minibatch_size: int, epoch: int, res: List[Any], idx: int):
-        """Intermediate function to call :func:`send_train_request`
-
-        :param client: Target client used for training.
-        :param minibatch_size: Size of minibatch used by client during training.
-        :param epoch: Number of epoch for training.
-        :param res: Reference to array to record the model weight returned by client.
-        :param idx: Index of array res to record the model weight returned by client.
-        """
-        res[idx] = self.send_train_request(client, minibatch_size, epoch)
-
-    def train(self, clients: List[Any], minibatch_size: int, epoch: int):
-        """Function to train the model by calling clients using multithreading.
-
-        :param clients: List of client objects used to identify each client.
-        :param minibatch_size: Size of minibatch used by client during training.
-        :param epoch: Number of epoch used by client for training.
-        """
-        threads = list()
-        res = [(np.array([]), 0)] * len(clients)  # type: List[Tuple[ndarray, int]]
-        for i in range(len(clients)):
-            x = threading.Thread(target=self.train_client, args=(clients[i], minibatch_size, epoch, res, i))
-            threads.append(x)
-            x.start()
-        for thread in threads:
-            thread.join()
-
-        weights = [i[0] for i in res]
-        number = [i[1] for i in res]
-        number = np.array(number) / sum(number)
-        new_weights = sum([np.array(weights[i], dtype=object)*number[i] for i in range(len(clients))])  # type: ndarray
-        self.model.set_weights(new_weights)
-
-    def select_clients(self, number: int) -> List[Any]:
-        """Select clients from self.clients randomly.
-
-        :param number: Number of client to select.
-        :return: List of clients object in self.clients.
-        """
-        return np.random.choice(self.clients, size=min(number, len(self.clients)), replace=False)
-
-
-def flat_clip(gradient: ndarray, gradient_norm_bound: float) -> ndarray:
+def flat_clip(gradient: Union[ndarray, List[ndarray]], gradient_norm_bound: float) -> Union[ndarray, List[ndarray]]:
     """Helper function used to clip gradient with L2-norm bound of gradient_norm_bound.
 
-    :param gradient: The gradient to be clipepd.
+    :param gradient: The gradient to be clipepd, either a flat parameter vector (clipped in place) or a list of arrays.
     :param gradient_norm_bound: L2-norm bound of gradient.
-    :return: The clipped gradient.
+    :return: The clipped gradient, in the same form as `gradient`.
     """
-    grad = np.array(gradient, dtype=object)
-    grad /= max(1, np.linalg.norm(np.hstack([np.array(i).flatten() for i in grad]))/gradient_norm_bound)
-    return grad
+    if isinstance(gradient, ndarray) and gradient.dtype != object and gradient.ndim == 1:
+        return clip_by_l2_norm(gradient, gradient_norm_bound)
+    layout = ParameterLayout.from_arrays(gradient)
+    return layout.unflatten(clip_by_l2_norm(layout.flatten(gradient), gradient_norm_bound))
 
 
 class DPFedAvgClient:
@@ -145,16 +154,28 @@ class DPFedAvgClient:
     The implementation is based on Tensorflow.
     """
 
-    def __init__(self, model_fn: Callable[[], Model], loss_fn: Callable[[Any, ndarray], ndarray], data: ndarray):
+    def __init__(self, model_fn: Callable[[], Model], loss_fn: Callable[[Any, ndarray], ndarray], data: ndarray,
+                 codec: Optional[UpdateCodec] = None, use_tf_data: bool = False, use_tf_function: bool = False):
         """
         :param model_fn: Function used to create instance of model, should be the same as server.
         :param loss_fn: Function that receives model and data batch, and return the loss value caluclated by tf.keras.losses.
         :param data: Client's traning data. Each element represent one training sample.
+        :param codec: Codec used to compress the update sent to the server, defaults to None (no compression).
+        :param use_tf_data: Feed the minibatches through a tf.data pipeline (see :func:`make_dataset`) instead of
+            lists, in which case loss_fn receives tensors, defaults to False.
+        :param use_tf_function: Compile the whole epoch over the tf.data pipeline with tf.function, requires
+            use_tf_data since list minibatches of varying sizes would trace the function again, defaults to False.
         """
+        assert use_tf_data or not use_tf_function, "use_tf_function requires use_tf_data."
         self.data = data
         self.model = model_fn()
         self.loss_fn = loss_fn
         self.optimizer = tf.keras.optimizers.SGD()
+        self.codec = codec
+        self.use_tf_data = use_tf_data
+        self.use_tf_function = use_tf_function
+        self._datasets = {}  # type: Dict[int, tf.data.Dataset]
+        self._compiled_train_fn = None  # type: Optional[Callable]
 
     def split_data(self, minibatch_size: int) -> list:
         """Function used to split data into minibatches with size of minibatch_size.
@@ -170,7 +191,7 @@ class DPFedAvgClient:
         """Function for training the model using one minibatch.
 
         :param minibatch: List of data of minibacth.
-        :param initial_weights: Initial global weight get from server.
+        :param initial_weights: Initial global weight get from server, as a flat parameter vector.
         :param gradient_norm_bound: L2-norm bound of gradient.
         """
         with tf.GradientTape() as tape:
@@ -178,121 +199,83 @@ class DPFedAvgClient:
             grads = tape.gradient(loss, self.model.trainable_variables)
             self.optimizer.apply_gradients(zip(grads, self.model.trainable_variables))
 
-            updated_weights = np.array(self.model.get_weights(), dtype=object)
-            updated_weights = initial_weights + flat_clip(updated_weights - initial_weights, gradient_norm_bound)
-            self.model.set_weights(updated_weights)
+            # clip the update in place in the preallocated buffer, the layers passed to the model are views of it
+            update = self.layout.flatten(self.model.get_weights(), out=self._buffer)
+            update -= initial_weights
+            flat_clip(update, gradient_norm_bound)
+            update += initial_weights
+            self.model.set_weights(self.layout.unflatten(update))
 
-    def train(self, global_weights: ndarray, minibatch_size: int, epoch: int, gradient_norm_bound: float):
-        """Function for training the model.
+    def graph_train_step(self, minibatch: Union[tf.Tensor, Any], initial_weights: List[tf.Tensor],
+                         gradient_norm_bound: tf.Tensor):
+        """Same as :meth:`train_step` with the update clipped by TensorFlow ops, so that it can be compiled by
+        tf.function. The global L2-norm of the update of all layers is its L2-norm as a flat parameter vector.
 
-        :param global_weights: Global weights received from server.
-        :param minibatch_size: Size of a single minibatch.
-        :param epoch: Number of epoch.
+        :param minibatch: Minibatch of data.
+        :param initial_weights: Initial global weight get from server, one tensor for each layer.
         :param gradient_norm_bound: L2-norm bound of gradient.
-        :return: return model gradient and number of data used for training.
-        """
-        self.model.set_weights(global_weights)
-        initial_weights = np.array(global_weights, dtype=object)
-
-        for _ in range(epoch):
-            minibatch_data = self.split_data(minibatch_size)
-            for batch in minibatch_data:
-                self.train_step(batch, initial_weights, gradient_norm_bound)
-
-        grad = np.array(self.model.get_weights(), dtype=object) - initial_weights
-        return grad, len(self.data)
-
-
-class DPFedAvgServer:
-    """Server side of DP-FedAvg algorithm (https://arxiv.org/pdf/1710.06963.pdf).
-    The implementation is based on Tensorflow.
-    """
-
-    def __init__(self, model_fn: Callable[[], Model], clients: List[Any], total_data: int):
-        """
-        :param model_fn: Function used to create instance of model, should be the same as clients.
-        :param clients: List of client objects used to identify each client.
-        :param total_data: Number of total data.
         """
-        self.clients = clients
-        self.model = model_fn()
+        with tf.GradientTape() as tape:
+            loss = self.loss_fn(self.model, minibatch)
+        grads = tape.gradient(loss, self.model.trainable_variables)
+        self.optimizer.apply_gradients(zip(grads, self.model.trainable_variables))
 
-        # since we know len of data of client, and let w_hat = sum(n_clients), W = 1
-        self.W = 1
-        self.total_data = total_data
+        updates = [variable - weight for variable, weight in zip(self.model.weights, initial_weights)]
+        updates, _ = tf.clip_by_global_norm(updates, gradient_norm_bound)
+        for variable, weight, update in zip(self.model.weights, initial_weights, updates):
+            variable.assign(weight + update)
 
-    @abc.abstractmethod
-    def send_train_request(self, client: Any, minibatch_size: int, epoch: int, gradient_norm_bound: float):
-        """Abstract method for sending training request to client.
+    def minibatches(self, minibatch_size: int) -> Union[list, tf.data.Dataset]:
+        """Function used to get the minibatches of one epoch, from the tf.data pipeline if use_tf_data is set.
 
-        :param client: Target client used for training.
-        :param minibatch_size: Size of minibatch used by client during training.
-        :param epoch: Number of epoch for training.
-        :param gradient_norm_bound: L2-norm bound of gradient.
+        :param minibatch_size: Size of minibatch.
+        :return: List of batches data, or dataset of minibatches.
         """
-        pass
-
-    def train_client(self, client: Any, minibatch_size: int, epoch: int, gradient_norm_bound: float, res: List[Any], idx: int):
-        """Intermediate function to call :func:`send_train_request`
-
-        :param client: Target client used for training.
-        :param minibatch_size: Size of minibatch used by client during training.
-        :param epoch: Number of epoch for training.
+        if not self.use_tf_data:
+            return self.split_data(minibatch_size)
+        if minibatch_size not in self._datasets:
+            self._datasets[minibatch_size] = make_dataset(self.data, minibatch_size)
+        return self._datasets[minibatch_size]
+
+    def train_epoch(self, minibatches: Union[list, tf.data.Dataset], initial_weights: ndarray,
+                    gradient_norm_bound: float):
+        """Function for training the model using the minibatches of one epoch.
+
+        :param minibatches: List of batches data, or dataset of minibatches.
+        :param initial_weights: Initial global weight get from server, as a flat parameter vector.
         :param gradient_norm_bound: L2-norm bound of gradient.
-        :param res: Reference to array to record the model weight returned by client.
-        :param idx: Index of array res to record the model weight returned by client.
         """
-        res[idx] = self.send_train_request(client, minibatch_size, epoch, gradient_norm_bound)
+        if not self.use_tf_function:
+            for batch in minibatches:
+                self.train_step(batch, initial_weights, gradient_norm_bound)
+            return
+        if self._compiled_train_fn is None:
+            self._compiled_train_fn = compile_train_epoch(self.graph_train_step)
+        # tensors, so that the compiled function is not traced again for new weights or bounds
+        layers = [tf.constant(layer) for layer in self.layout.unflatten(initial_weights)]
+        bound = tf.constant(gradient_norm_bound, dtype=self.layout.dtype)
+        self._compiled_train_fn(minibatches, layers, bound)
 
-    def train(self, clients: List[Any], minibatch_size: int, epoch: int, gradient_norm_bound: float, noise_scale: float):
-        """Function to train the model by calling clients using multithreading.
+    def train(self, global_weights: ndarray, minibatch_size: int, epoch: int, gradient_norm_bound: float):
+        """Function for training the model.
 
-        :param clients: List of client objects used to identify each client.
-        :param minibatch_size: Size of minibatch used by client during training.
-        :param epoch: Number of epoch used by client for training.
+        :param global_weights: Global weights received from server.
+        :param minibatch_size: Size of a single minibatch.
+        :param epoch: Number of epoch.
         :param gradient_norm_bound: L2-norm bound of gradient.
-        :param noise_scale: Value of noise scale. Higher noise scale correspond to higher noise and lower privacy budget.
-        """
-        threads = list()
-        res = [(np.array([]), 0)] * len(clients)  # type: List[Tuple[ndarray, int]]
-        for i in range(len(clients)):
-            x = threading.Thread(target=self.train_client,
-                                 args=(clients[i], minibatch_size, epoch, gradient_norm_bound, res, i))
-            threads.append(x)
-            x.start()
-        for thread in threads:
-            thread.join()
-
-        qW = len(clients)/len(self.clients) * self.W
-        grad = [i[0] for i in res]
-        number = [i[1] for i in res]
-        number = np.array(number) / self.total_data
-        total_grad = sum([np.array(grad[i], dtype=object)*number[i] for i in range(len(clients))])  # type: ndarray
-        total_grad /= qW
-
-        sigma = noise_scale*gradient_norm_bound/qW
-        total_grad = np.array([self.gaussian_noise(i, sigma) for i in total_grad], dtype=object)
-        new_weights = np.array(self.model.get_weights(), dtype=object) + total_grad
-
-        self.model.set_weights(new_weights)
-
-    def select_clients(self, number: int) -> List[Any]:
-        """Select clients from self.clients randomly.
-
-        :param number: Number of client to select.
-        :return: List of clients object in self.clients.
+        :return: return model gradient, as a flat parameter vector, and number of data used for training. With a codec,
+            the gradient is encoded after it is clipped.
         """
-        return np.random.choice(self.clients, size=min(number, len(self.clients)), replace=False)
+        self.model.set_weights(global_weights)
+        weights = self.model.get_weights()
+        self.layout = ParameterLayout.from_arrays(weights)
+        self._buffer = self.layout.zeros()
+        initial_weights = self.layout.flatten(weights)
 
-    def gaussian_noise(self, x: Union[int, float, ndarray], standard_deviation: float):
-        """Helper function for adding Gaussian noise.
+        for _ in range(epoch):
+            self.train_epoch(self.minibatches(minibatch_size), initial_weights, gradient_norm_bound)
 
-        :param x: Input data
-        :param standard_deviation: Standard deviation of Gaussian noise.
-        :return: Input data with noise
-        """
-        shape = (1, ) if isinstance(x, (int, float)) else x.shape
-        noise = normal(loc=0.,
-                       scale=standard_deviation,
-                       size=shape)
-        return x + noise
+        grad = self.layout.flatten(self.model.get_weights()) - initial_weights
+        if self.codec is not None:
+            return self.codec.encode(grad), len(self.data)
+        return grad, len(self.data)
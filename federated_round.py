@@ -0,0 +1,235 @@
+"""
+Execution of the client requests of one federated learning round.
+
+:class:`RoundExecutor` sends the training requests of a round concurrently on a bounded pool of workers, instead of
+one thread per client, and collects the results of the clients that finish first. It supports:
+
+- any `concurrent.futures.Executor`, e.g. a `ThreadPoolExecutor` (the default) or a `ProcessPoolExecutor`, for
+  which the request function and its arguments must be picklable,
+- coroutine functions, e.g. for I/O bound requests, run on an asyncio event loop in a background thread,
+- a deadline for the round, after which the clients that have not finished are dropped,
+- over-selection, i.e. selecting more clients than needed and keeping the results of the first ones to finish.
+
+:func:`run_round_async` is the same for the asynchronous servers, whose requests all run on the event loop of the
+caller, and :class:`LocalTransport` is an in-process stand-in of their network transport.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+
+class RoundExecutor:
+    """Executor of the client requests of federated learning rounds."""
+
+    def __init__(self, executor: Optional[Executor] = None, max_workers: int = 32):
+        """
+        :param executor: Executor used to send the requests, defaults to None (a thread pool with `max_workers`
+            threads, created at the first round)
+        :param max_workers: Maximum number of concurrent requests of the default thread pool, defaults to 32
+        """
+        assert max_workers > 0, "expected a positive value."
+        self.max_workers = max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._loop_thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'RoundExecutor':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _submit(self, request: Callable[..., Any], client: Any, args: Sequence[Any]) -> Future:
+        with self._lock:
+            if asyncio.iscoroutinefunction(request):
+                if self._loop is None:
+                    self._loop = asyncio.new_event_loop()
+                    self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                    self._loop_thread.start()
+                return asyncio.run_coroutine_threadsafe(request(client, *args), self._loop)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor.submit(request, client, *args)
+
+    def run(self, request: Callable[..., Any], clients: Sequence[Any], args: Sequence[Any] = (),
+            deadline: Optional[float] = None, target_clients: Optional[int] = None,
+            on_result: Optional[Callable[[Any, Any], None]] = None) -> List[Tuple[Any, Any]]:
+        """Send `request(client, *args)` to every client and collect the results.
+
+        The clients which fail are dropped. The clients which have not finished when the deadline is reached or when
+        `target_clients` results are collected are dropped as well: their requests are cancelled if they have not
+        started, otherwise their results are ignored.
+
+        :param request: Function (or coroutine function) sending the request to a client
+        :param clients: Clients of the round
+        :param args: Other arguments of `request`, defaults to ()
+        :param deadline: Time in seconds after which the round stops waiting for the clients, defaults to None
+        :param target_clients: Number of results after which the round stops waiting for the other clients,
+            defaults to None (all clients)
+        :param on_result: Function called with (client, result) in the calling thread as soon as each result is
+            collected, while the other clients are still running, defaults to None. The results passed to it are
+            released afterwards and not returned.
+        :return: List of (client, result) of the clients that finished, in the order they finished, with None
+            results if `on_result` is given
+        """
+        assert target_clients is None or target_clients > 0, "expected a positive value."
+        target_clients = len(clients) if target_clients is None else min(target_clients, len(clients))
+        end = None if deadline is None else time.monotonic() + deadline
+
+        # finished futures are queued by their done callback, and dropped once their result is collected
+        finished = queue.Queue()  # type: queue.Queue
+        futures = {}  # type: Dict[Future, Any]
+        for client in clients:
+            future = self._submit(request, client, args)
+            futures[future] = client
+            future.add_done_callback(finished.put)
+
+        results = []  # type: List[Tuple[Any, Any]]
+        errors = []  # type: List[BaseException]
+        try:
+            for _ in range(len(clients)):
+                try:
+                    future = finished.get(timeout=None if end is None else max(0., end - time.monotonic()))
+                except queue.Empty:
+                    break
+                client = futures.pop(future)
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                results.append(_collect(client, future.result(), on_result))
+                del future
+                if len(results) >= target_clients:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if not results and errors:
+            raise errors[0]
+        return results
+
+    def close(self):
+        """Shut down the default thread pool and the event loop."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(_cancel_tasks(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+
+
+async def _cancel_tasks():
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_round_async(request: Callable[..., Awaitable[Any]], clients: Sequence[Any], args: Sequence[Any] = (),
+                          deadline: Optional[float] = None, target_clients: Optional[int] = None,
+                          on_result: Optional[Callable[[Any, Any], None]] = None) -> List[Tuple[Any, Any]]:
+    """Send `await request(client, *args)` to every client concurrently on the running event loop, with the same
+    semantics as :meth:`RoundExecutor.run`. The requests which are still running at the end of the round are
+    cancelled.
+
+    :param request: Coroutine function sending the request to a client
+    :param clients: Clients of the round
+    :param args: Other arguments of `request`, defaults to ()
+    :param deadline: Time in seconds after which the round stops waiting for the clients, defaults to None
+    :param target_clients: Number of results after which the round stops waiting for the other clients,
+        defaults to None (all clients)
+    :param on_result: Function called with (client, result) as soon as each result is collected, defaults to None.
+        The results passed to it are released afterwards and not returned.
+    :return: List of (client, result) of the clients that finished, in the order they finished, with None results
+        if `on_result` is given
+    """
+    assert target_clients is None or target_clients > 0, "expected a positive value."
+    target_clients = len(clients) if target_clients is None else min(target_clients, len(clients))
+    loop = asyncio.get_running_loop()
+    end = None if deadline is None else loop.time() + deadline
+
+    # finished tasks are queued by their done callback, so waiting for the next one does not scan all the tasks
+    finished = asyncio.Queue()  # type: asyncio.Queue
+    tasks = {}  # type: Dict[asyncio.Future, Any]
+    for client in clients:
+        task = asyncio.ensure_future(request(client, *args))
+        task.add_done_callback(finished.put_nowait)
+        tasks[task] = client
+
+    results = []  # type: List[Tuple[Any, Any]]
+    errors = []  # type: List[BaseException]
+    try:
+        for _ in range(len(clients)):
+            timeout = None if end is None else max(0., end - loop.time())
+            try:
+                task = await asyncio.wait_for(finished.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            client = tasks.pop(task)
+            if task.exception() is not None:
+                errors.append(task.exception())
+                continue
+            results.append(_collect(client, task.result(), on_result))
+            del task
+            if len(results) >= target_clients:
+                break
+    finally:
+        pending = list(tasks)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if not results and errors:
+        raise errors[0]
+    return results
+
+
+def _collect(client: Any, result: Any, on_result: Optional[Callable[[Any, Any], None]]) -> Tuple[Any, Any]:
+    if on_result is None:
+        return client, result
+    on_result(client, result)
+    return client, None
+
+
+class LocalTransport:
+    """In-process stand-in of the network transport of asynchronous federated learning servers, to test and
+    benchmark them without a network. A request waits for a simulated latency, then calls `client.train` directly.
+
+    Example of a `send_train_request` of :class:`AsyncFedAvgServer`::
+
+        async def send_train_request(self, client, minibatch_size, epoch):
+            return await transport.send(client, self.model.get_weights(), minibatch_size, epoch)
+    """
+
+    def __init__(self, latency: Union[float, Callable[[Any], float]] = 0., executor: Optional[Executor] = None):
+        """
+        :param latency: Latency in seconds of a request, or function of the client returning it, defaults to 0
+        :param executor: Executor running `client.train`, defaults to None (run on the event loop)
+        """
+        self.latency = latency
+        self.executor = executor
+        self.requests = 0
+
+    async def send(self, client: Any, *args: Any) -> Any:
+        """Send a training request to an in-process client.
+
+        :param client: Client object with a `train` method
+        :param args: Arguments of `client.train`
+        :return: The result of `client.train`
+        """
+        self.requests += 1
+        latency = self.latency(client) if callable(self.latency) else self.latency
+        if latency > 0:
+            await asyncio.sleep(latency)
+        if self.executor is None:
+            return client.train(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, client.train, *args)
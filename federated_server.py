@@ -0,0 +1,367 @@
+"""
+Server side of the federated learning algorithms, see :mod:`federated_learning` for the clients.
+
+The servers only exchange weights with the clients and do not depend on TensorFlow: the model created by model_fn
+can be a Keras model or any object with `get_weights` and `set_weights` methods.
+"""
+
+import abc
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from numpy import ndarray
+from numpy.random import Generator
+
+from federated_round import RoundExecutor, run_round_async
+from parameter_vector import ParameterLayout, StreamingAggregator
+from random_generator import get_default_rng
+from update_codec import decode_update
+
+
+class FedAvgServer:
+    """Server side of FederatedAveraging (FedAvg) algorithm (https://arxiv.org/pdf/1602.05629.pdf).
+    The implementation is based on Tensorflow.
+    """
+
+    def __init__(self, model_fn: Callable[[], Any], clients: List[Any], rng: Optional[Generator] = None,
+                 executor: Optional[Executor] = None, max_workers: int = 32,
+                 request_fn: Optional[Callable[[Any, List[ndarray], int, int], Any]] = None):
+        """
+        :param model_fn: Function used to create instance of model, should be the same as clients.
+        :param clients: List of client objects used to identify each client.
+        :param rng: Random number generator used to select clients, defaults to None (the default generator of the calling thread)
+        :param executor: Executor used to send the training requests, defaults to None (a thread pool with max_workers threads).
+            :func:`send_train_request` may also be a coroutine function, which is run on an asyncio event loop.
+        :param max_workers: Maximum number of concurrent training requests of the default thread pool, defaults to 32.
+        :param request_fn: Picklable function request_fn(client, global_weights, minibatch_size, epoch) sending the
+            training request instead of :func:`send_train_request`, required with a ProcessPoolExecutor since the
+            server cannot be pickled, defaults to None.
+        """
+        assert request_fn is not None or not isinstance(executor, ProcessPoolExecutor), \
+            "a process pool requires a picklable request_fn."
+        self.clients = clients
+        self.model = model_fn()
+        self.rng = rng
+        self.request_fn = request_fn
+        self.round_executor = RoundExecutor(executor, max_workers)
+        self.participants = []  # type: List[Any]
+
+    @abc.abstractmethod
+    def send_train_request(self, client: Any, minibatch_size: int, epoch: int):
+        """Abstract method for sending training request to client.
+
+        :param client: Target client used for training.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch for training.
+        """
+        pass
+
+    def train(self, clients: List[Any], minibatch_size: int, epoch: int, deadline: Optional[float] = None,
+              target_clients: Optional[int] = None) -> int:
+        """Function to train the model by calling clients concurrently with the executor of the server.
+
+        To tolerate stragglers, more clients than needed can be selected and the round aggregates the models of the
+        first target_clients clients to finish, or of the clients that finished before the deadline. The clients
+        which fail or do not finish in time are dropped, and the aggregated clients are kept in self.participants.
+        Each model is folded into a running average as soon as it arrives, while the other clients are still
+        training, so the memory used by the server does not grow with the number of clients.
+
+        :param clients: List of client objects used to identify each client.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch used by client for training.
+        :param deadline: Time in seconds after which the round stops waiting for the clients, defaults to None.
+        :param target_clients: Number of clients to aggregate, defaults to None (all clients).
+        :return: Number of clients aggregated, the model is unchanged if it is 0.
+        """
+        aggregator = self._aggregator()
+        request, args = self._request(minibatch_size, epoch)
+        res = self.round_executor.run(request, clients, args, deadline=deadline, target_clients=target_clients,
+                                      on_result=self._collector(aggregator))
+        return self._aggregate(res, aggregator)
+
+    def _request(self, *args: Any) -> Tuple[Callable[..., Any], Tuple[Any, ...]]:
+        """Return the function sending the training requests of a round and its arguments after the client."""
+        if self.request_fn is None:
+            return self.send_train_request, args
+        return self.request_fn, (self.model.get_weights(), *args)
+
+    def _aggregator(self) -> StreamingAggregator:
+        """Create the running weighted sum of the models of a round, with the layout of the model of the server."""
+        return StreamingAggregator(ParameterLayout.from_arrays(self.model.get_weights()))
+
+    def _collector(self, aggregator: StreamingAggregator) -> Callable[[Any, Tuple[Any, int]], None]:
+        """Create the function adding the model returned by a client to the aggregator. An encoded model is the
+        update of the client, which is decoded and added to the global weights."""
+        global_weights = None  # type: Optional[ndarray]
+
+        def collect(client: Any, result: Tuple[Any, int]):
+            nonlocal global_weights
+            weights, number = result
+            if isinstance(weights, (bytes, bytearray, memoryview)):
+                if global_weights is None:
+                    global_weights = aggregator.layout.flatten(self.model.get_weights())
+                weights = decode_update(weights)
+                weights += global_weights
+            aggregator.add(weights, number)
+        return collect
+
+    def _aggregate(self, res: List[Tuple[Any, Any]], aggregator: StreamingAggregator) -> int:
+        """Set the model to the average of the models returned by the clients of a round, weighted by their number
+        of data.
+
+        :param res: List of (client, None) of the clients that finished.
+        :param aggregator: Weighted sum of the models of the clients that finished.
+        :return: Number of clients aggregated.
+        """
+        self.participants = [client for client, _ in res]
+        if aggregator.count == 0:
+            return 0
+        self.model.set_weights(aggregator.layout.unflatten(aggregator.mean()))
+        return aggregator.count
+
+    def close(self):
+        """Shut down the default thread pool of the server."""
+        self.round_executor.close()
+
+    def select_clients(self, number: int) -> List[Any]:
+        """Select clients from self.clients randomly.
+
+        :param number: Number of client to select.
+        :return: List of clients object in self.clients.
+        """
+        rng = get_default_rng() if self.rng is None else self.rng
+        return rng.choice(self.clients, size=min(number, len(self.clients)), replace=False)
+
+
+class DPFedAvgServer:
+    """Server side of DP-FedAvg algorithm (https://arxiv.org/pdf/1710.06963.pdf).
+    The implementation is based on Tensorflow.
+    """
+
+    def __init__(self, model_fn: Callable[[], Any], clients: List[Any], total_data: int, rng: Optional[Generator] = None,
+                 executor: Optional[Executor] = None, max_workers: int = 32,
+                 request_fn: Optional[Callable[[Any, List[ndarray], int, int, float], Any]] = None):
+        """
+        :param model_fn: Function used to create instance of model, should be the same as clients.
+        :param clients: List of client objects used to identify each client.
+        :param total_data: Number of total data.
+        :param rng: Random number generator used to select clients and add noise, defaults to None (the default generator of the calling thread)
+        :param executor: Executor used to send the training requests, defaults to None (a thread pool with max_workers threads).
+            :func:`send_train_request` may also be a coroutine function, which is run on an asyncio event loop.
+        :param max_workers: Maximum number of concurrent training requests of the default thread pool, defaults to 32.
+        :param request_fn: Picklable function request_fn(client, global_weights, minibatch_size, epoch,
+            gradient_norm_bound) sending the training request instead of :func:`send_train_request`, required with a
+            ProcessPoolExecutor since the server cannot be pickled, defaults to None.
+        """
+        assert request_fn is not None or not isinstance(executor, ProcessPoolExecutor), \
+            "a process pool requires a picklable request_fn."
+        self.clients = clients
+        self.model = model_fn()
+        self.rng = rng
+        self.request_fn = request_fn
+        self.round_executor = RoundExecutor(executor, max_workers)
+        self.participants = []  # type: List[Any]
+
+        # since we know len of data of client, and let w_hat = sum(n_clients), W = 1
+        self.W = 1
+        self.total_data = total_data
+
+    @abc.abstractmethod
+    def send_train_request(self, client: Any, minibatch_size: int, epoch: int, gradient_norm_bound: float):
+        """Abstract method for sending training request to client.
+
+        :param client: Target client used for training.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch for training.
+        :param gradient_norm_bound: L2-norm bound of gradient.
+        """
+        pass
+
+    def train(self, clients: List[Any], minibatch_size: int, epoch: int, gradient_norm_bound: float, noise_scale: float,
+              deadline: Optional[float] = None, target_clients: Optional[int] = None) -> float:
+        """Function to train the model by calling clients concurrently with the executor of the server.
+
+        To tolerate stragglers, more clients than needed can be selected and the round aggregates the updates of the
+        first target_clients clients to finish, or of the clients that finished before the deadline. The clients
+        which fail or do not finish in time are dropped, and the aggregated clients are kept in self.participants.
+        Each update is folded into a running sum as soon as it arrives. The sum is normalized by the fraction of
+        clients that took part, and the noise is scaled with it so that the noise multiplier is noise_scale.
+
+        :param clients: List of client objects used to identify each client.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch used by client for training.
+        :param gradient_norm_bound: L2-norm bound of gradient.
+        :param noise_scale: Value of noise scale. Higher noise scale correspond to higher noise and lower privacy budget.
+        :param deadline: Time in seconds after which the round stops waiting for the clients, defaults to None.
+        :param target_clients: Number of clients to aggregate, defaults to None (all clients).
+        :return: Sampling ratio of the round for the privacy budget tracker, 0 if no client took part (the model is
+            unchanged). Any selected client may take part, so it is the ratio of selected clients.
+        """
+        aggregator = self._aggregator()
+        request, args = self._request(minibatch_size, epoch, gradient_norm_bound)
+        res = self.round_executor.run(request, clients, args, deadline=deadline, target_clients=target_clients,
+                                      on_result=self._collector(aggregator, gradient_norm_bound))
+        return self._aggregate(res, aggregator, len(clients), gradient_norm_bound, noise_scale)
+
+    def _request(self, *args: Any) -> Tuple[Callable[..., Any], Tuple[Any, ...]]:
+        """Return the function sending the training requests of a round and its arguments after the client."""
+        if self.request_fn is None:
+            return self.send_train_request, args
+        return self.request_fn, (self.model.get_weights(), *args)
+
+    def _aggregator(self) -> StreamingAggregator:
+        """Create the running weighted sum of the updates of a round, with the layout of the model of the server."""
+        return StreamingAggregator(ParameterLayout.from_arrays(self.model.get_weights()))
+
+    def _collector(self, aggregator: StreamingAggregator,
+                   gradient_norm_bound: float) -> Callable[[Any, Tuple[Any, int]], None]:
+        """Create the function adding the update returned by a client to the aggregator. The update is decoded if it
+        is encoded, and clipped again, since compression after clipping may increase its norm, so that the
+        sensitivity of the sum, and the noise scale, still hold."""
+        def collect(client: Any, result: Tuple[Any, int]):
+            grad, number = result
+            if isinstance(grad, (bytes, bytearray, memoryview)):
+                grad = decode_update(grad)
+            aggregator.add(grad, number / self.total_data, norm_bound=gradient_norm_bound)
+        return collect
+
+    def _aggregate(self, res: List[Tuple[Any, Any]], aggregator: StreamingAggregator, selected: int,
+                   gradient_norm_bound: float, noise_scale: float) -> float:
+        """Add the noisy average of the updates returned by the clients of a round to the model.
+
+        :param res: List of (client, None) of the clients that finished.
+        :param aggregator: Sum of the updates of the clients that finished, weighted by their fraction of the data.
+        :param selected: Number of clients selected for the round.
+        :param gradient_norm_bound: L2-norm bound of gradient.
+        :param noise_scale: Value of noise scale.
+        :return: Sampling ratio of the round for the privacy budget tracker, 0 if no client took part.
+        """
+        self.participants = [client for client, _ in res]
+        if aggregator.count == 0:
+            return 0.
+
+        qW = aggregator.count/len(self.clients) * self.W
+        layout = aggregator.layout
+        total_grad = aggregator.sum() / qW
+
+        sigma = noise_scale*gradient_norm_bound/qW
+        new_weights = layout.flatten(self.model.get_weights())
+        new_weights += self.gaussian_noise(total_grad, sigma)
+
+        self.model.set_weights(layout.unflatten(new_weights))
+        return selected/len(self.clients)
+
+    def close(self):
+        """Shut down the default thread pool of the server."""
+        self.round_executor.close()
+
+    def select_clients(self, number: int) -> List[Any]:
+        """Select clients from self.clients randomly.
+
+        :param number: Number of client to select.
+        :return: List of clients object in self.clients.
+        """
+        rng = get_default_rng() if self.rng is None else self.rng
+        return rng.choice(self.clients, size=min(number, len(self.clients)), replace=False)
+
+    def gaussian_noise(self, x: Union[int, float, ndarray], standard_deviation: float):
+        """Helper function for adding Gaussian noise.
+
+        :param x: Input data
+        :param standard_deviation: Standard deviation of Gaussian noise.
+        :return: Input data with noise
+        """
+        shape = (1, ) if isinstance(x, (int, float)) else x.shape
+        rng = get_default_rng() if self.rng is None else self.rng
+        noise = rng.normal(loc=0.,
+                           scale=standard_deviation,
+                           size=shape)
+        return x + noise
+
+
+class AsyncFedAvgServer(FedAvgServer):
+    """Server side of FederatedAveraging (FedAvg) algorithm with asynchronous training requests.
+    The requests of a round run concurrently on the event loop of the caller, so a round with thousands of remote
+    clients needs no thread per request. See :class:`federated_round.LocalTransport` for an in-process transport.
+    """
+
+    def __init__(self, model_fn: Callable[[], Any], clients: List[Any], rng: Optional[Generator] = None):
+        """
+        :param model_fn: Function used to create instance of model, should be the same as clients.
+        :param clients: List of client objects used to identify each client.
+        :param rng: Random number generator used to select clients, defaults to None (the default generator of the calling thread)
+        """
+        super().__init__(model_fn, clients, rng)
+
+    @abc.abstractmethod
+    async def send_train_request(self, client: Any, minibatch_size: int, epoch: int):
+        """Abstract coroutine for sending training request to client.
+
+        :param client: Target client used for training.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch for training.
+        """
+        pass
+
+    async def train(self, clients: List[Any], minibatch_size: int, epoch: int, deadline: Optional[float] = None,
+                    target_clients: Optional[int] = None) -> int:
+        """Coroutine to train the model by calling clients concurrently, same as :meth:`FedAvgServer.train`.
+
+        :param clients: List of client objects used to identify each client.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch used by client for training.
+        :param deadline: Time in seconds after which the round stops waiting for the clients, defaults to None.
+        :param target_clients: Number of clients to aggregate, defaults to None (all clients).
+        :return: Number of clients aggregated, the model is unchanged if it is 0.
+        """
+        aggregator = self._aggregator()
+        res = await run_round_async(self.send_train_request, clients, (minibatch_size, epoch),
+                                    deadline=deadline, target_clients=target_clients,
+                                    on_result=self._collector(aggregator))
+        return self._aggregate(res, aggregator)
+
+
+class AsyncDPFedAvgServer(DPFedAvgServer):
+    """Server side of DP-FedAvg algorithm with asynchronous training requests.
+    The requests of a round run concurrently on the event loop of the caller, so a round with thousands of remote
+    clients needs no thread per request. See :class:`federated_round.LocalTransport` for an in-process transport.
+    """
+
+    def __init__(self, model_fn: Callable[[], Any], clients: List[Any], total_data: int, rng: Optional[Generator] = None):
+        """
+        :param model_fn: Function used to create instance of model, should be the same as clients.
+        :param clients: List of client objects used to identify each client.
+        :param total_data: Number of total data.
+        :param rng: Random number generator used to select clients and add noise, defaults to None (the default generator of the calling thread)
+        """
+        super().__init__(model_fn, clients, total_data, rng)
+
+    @abc.abstractmethod
+    async def send_train_request(self, client: Any, minibatch_size: int, epoch: int, gradient_norm_bound: float):
+        """Abstract coroutine for sending training request to client.
+
+        :param client: Target client used for training.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch for training.
+        :param gradient_norm_bound: L2-norm bound of gradient.
+        """
+        pass
+
+    async def train(self, clients: List[Any], minibatch_size: int, epoch: int, gradient_norm_bound: float,
+                    noise_scale: float, deadline: Optional[float] = None, target_clients: Optional[int] = None) -> float:
+        """Coroutine to train the model by calling clients concurrently, same as :meth:`DPFedAvgServer.train`.
+
+        :param clients: List of client objects used to identify each client.
+        :param minibatch_size: Size of minibatch used by client during training.
+        :param epoch: Number of epoch used by client for training.
+        :param gradient_norm_bound: L2-norm bound of gradient.
+        :param noise_scale: Value of noise scale. Higher noise scale correspond to higher noise and lower privacy budget.
+        :param deadline: Time in seconds after which the round stops waiting for the clients, defaults to None.
+        :param target_clients: Number of clients to aggregate, defaults to None (all clients).
+        :return: Sampling ratio of the round for the privacy budget tracker, 0 if no client took part.
+        """
+        aggregator = self._aggregator()
+        res = await run_round_async(self.send_train_request, clients, (minibatch_size, epoch, gradient_norm_bound),
+                                    deadline=deadline, target_clients=target_clients,
+                                    on_result=self._collector(aggregator, gradient_norm_bound))
+        return self._aggregate(res, aggregator, len(clients), gradient_norm_bound, noise_scale)
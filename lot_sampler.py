@@ -0,0 +1,122 @@
+"""
+Lot samplers for differentially private SGD.
+
+The moment accountant (https://arxiv.org/pdf/1607.00133.pdf) assumes that every lot is drawn by Poisson sampling:
+each example is in the lot independently with probability q, the sampling ratio. :class:`PoissonLotSampler` draws the
+indices of a lot directly, by skipping over the examples that are not sampled with geometrically distributed gaps,
+in O(q * N) time instead of O(N) for a dataset of N examples.
+"""
+
+import queue
+import threading
+from typing import Any, Iterator, Optional, Sequence, Union
+
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+
+from random_generator import create_rng
+
+
+class PoissonLotSampler:
+    """Poisson sampling of lots of indices, optionally prefetched by a background thread.
+
+    The sampler owns its random number generator, which is used by the background thread only while lots are
+    prefetched, so it should not be shared with other threads.
+    """
+
+    def __init__(self, dataset_size: int, sampling_ratio: float, prefetch: int = 2, rng: Optional[Generator] = None):
+        """
+        :param dataset_size: Number of examples in the dataset
+        :param sampling_ratio: Probability that an example is in a lot, to be passed to the privacy budget tracker
+        :param prefetch: Number of lots sampled ahead by a background thread, defaults to 2, 0 to sample in the
+            calling thread
+        :param rng: Random number generator used for sampling, defaults to None (a new generator)
+        """
+        assert dataset_size > 0, "expected a positive value."
+        assert 0 < sampling_ratio <= 1, "expected a sampling ratio in (0, 1]."
+        assert prefetch >= 0, "expected a non-negative value."
+        self.dataset_size = dataset_size
+        self.sampling_ratio = sampling_ratio
+        self.prefetch = prefetch
+        self._rng = create_rng() if rng is None else rng
+
+    @property
+    def expected_lot_size(self) -> float:
+        return self.sampling_ratio * self.dataset_size
+
+    def sample_lot(self) -> ndarray:
+        """Sample the indices of one lot.
+
+        The gaps between consecutive sampled indices are geometric with success probability `sampling_ratio`, and
+        they are drawn in chunks slightly larger than the expected lot size until the end of the dataset is reached.
+
+        :return: Sorted indices of the examples in the lot
+        """
+        if self.sampling_ratio == 1:
+            return np.arange(self.dataset_size)
+        expected = self.expected_lot_size
+        chunk_size = int(expected + 4 * np.sqrt(expected)) + 16
+        chunks = []
+        last = -1
+        while last < self.dataset_size:
+            indices = last + np.cumsum(self._rng.geometric(self.sampling_ratio, size=chunk_size))
+            chunks.append(indices)
+            last = indices[-1]
+        indices = np.concatenate(chunks)
+        return indices[:np.searchsorted(indices, self.dataset_size)]
+
+    def sample(self, number_of_lots: int) -> Iterator[ndarray]:
+        """Sample the indices of several lots, prefetched by a background thread if `prefetch` > 0.
+
+        :param number_of_lots: Number of lots
+        :return: Iterator of the indices of each lot
+        """
+        if self.prefetch == 0:
+            for _ in range(number_of_lots):
+                yield self.sample_lot()
+            return
+
+        lots = queue.Queue(maxsize=self.prefetch)  # type: queue.Queue
+        stopped = threading.Event()
+
+        def put(item: Union[ndarray, BaseException]) -> bool:
+            while not stopped.is_set():
+                try:
+                    lots.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for _ in range(number_of_lots):
+                    if not put(self.sample_lot()):
+                        return
+            except BaseException as e:  # passed to the consumer, which would wait for the next lot forever
+                put(e)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            for _ in range(number_of_lots):
+                lot = lots.get()
+                if isinstance(lot, BaseException):
+                    raise lot
+                yield lot
+        finally:
+            stopped.set()
+            thread.join()
+
+
+def take(data: Union[ndarray, Sequence[Any]], indices: ndarray) -> Union[ndarray, list]:
+    """Select the examples of a lot without copying the rest of the dataset.
+
+    :param data: The dataset, an array (indexed by the first axis) or a sequence of examples
+    :param indices: Indices of the examples
+    :return: The examples, as an array for an array dataset, otherwise as a list
+    """
+    if isinstance(data, ndarray):
+        return data[indices]
+    return [data[i] for i in indices]
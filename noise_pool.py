@@ -0,0 +1,159 @@
+"""
+A pool of precomputed noise for low latency query answering.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+
+from random_generator import create_rng
+
+
+class _VariateBuffer:
+    """Blocks of precomputed standard variates of one distribution. Not thread-safe, guarded by the pool."""
+
+    def __init__(self, draw: Callable[[int], ndarray]):
+        self.draw = draw
+        self.blocks = deque()  # type: Deque[ndarray]
+        self.offset = 0  # number of variates already handed out from the first block
+
+    def available(self) -> int:
+        return sum(len(block) for block in self.blocks) - self.offset
+
+    def take(self, number: int) -> ndarray:
+        assert number <= self.available(), "not enough variates in the buffer."
+        out = np.empty(number)
+        filled = 0
+        while filled < number:
+            block = self.blocks[0]
+            n = min(number - filled, len(block) - self.offset)
+            out[filled:filled + n] = block[self.offset:self.offset + n]
+            filled += n
+            self.offset += n
+            if self.offset == len(block):
+                self.blocks.popleft()
+                self.offset = 0
+        return out
+
+
+class NoisePool:
+    """Pool of standard Laplace and standard Gaussian variates, pre-generated in blocks by a background thread and
+    scaled by the query at hand. Every variate is handed out exactly once, so the draws stay independent.
+
+    The pool provides the `laplace` and `normal` methods of `numpy.random.Generator` and can be passed as `rng` to the
+    mechanisms in :mod:`private_mechanisms` and to :class:`PrivateTable <private_table.PrivateTable>`. Other methods
+    (e.g. `gumbel`) are drawn directly from the underlying generator.
+
+    The background thread refills a distribution up to `high_watermark` blocks as soon as it has fewer than
+    `low_watermark` blocks left. If the pool is drained faster, the missing variates are drawn by the caller.
+    """
+
+    def __init__(self, block_size: int = 65536, low_watermark: int = 2, high_watermark: int = 4,
+                 rng: Optional[Generator] = None):
+        """
+        :param block_size: Number of variates generated at once, defaults to 65536
+        :param low_watermark: Refill a distribution when it has fewer blocks left, defaults to 2
+        :param high_watermark: Number of blocks of a distribution after a refill, defaults to 4
+        :param rng: Random number generator used to draw the variates, defaults to None (a new generator)
+        """
+        assert block_size > 0, "expected a positive value."
+        assert 0 < low_watermark <= high_watermark, "expected 0 < low_watermark <= high_watermark."
+        self.block_size = block_size
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self._rng = create_rng() if rng is None else rng
+        self._buffers = {
+            'laplace': _VariateBuffer(lambda n: self._rng.laplace(size=n)),
+            'normal': _VariateBuffer(lambda n: self._rng.standard_normal(n)),
+        }  # type: Dict[str, _VariateBuffer]
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._refill, daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'NoisePool':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._rng, name)
+
+    def close(self):
+        """Stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _needs_refill(self) -> bool:
+        return any(buffer.available() < self.low_watermark * self.block_size for buffer in self._buffers.values())
+
+    def _refill(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._needs_refill())
+            while True:
+                with self._condition:
+                    if self._closed:
+                        return
+                    pending = [buffer for buffer in self._buffers.values()
+                               if buffer.available() < self.high_watermark * self.block_size]
+                if not pending:
+                    break
+                # generate outside of the lock so that queries are not blocked
+                for buffer in pending:
+                    block = buffer.draw(self.block_size)
+                    with self._condition:
+                        buffer.blocks.append(block)
+
+    def _take(self, name: str, loc: float, scale: Union[float, ndarray], size: Union[None, int, Tuple[int, ...]]):
+        if size is None:
+            shape = np.broadcast(np.asarray(loc), np.asarray(scale)).shape
+        else:
+            shape = (size, ) if isinstance(size, int) else tuple(size)
+        number, buffer = int(np.prod(shape)), self._buffers[name]
+        while True:
+            with self._condition:
+                missing = number - buffer.available()
+                if missing <= 0:
+                    variates = buffer.take(number)
+                    if self._needs_refill():
+                        self._condition.notify()
+                    break
+            # the pool is drained faster than it is refilled, generate outside of the lock like the refill so that
+            # the other queries are not blocked, they may take the block first in which case another one is drawn
+            block = buffer.draw(max(self.block_size, missing))
+            with self._condition:
+                buffer.blocks.append(block)
+        noise = loc + scale * variates.reshape(shape)
+        return float(noise) if shape == () else noise
+
+    def laplace(self, loc: float = 0., scale: Union[float, ndarray] = 1.,
+                size: Union[None, int, Tuple[int, ...]] = None) -> Union[float, ndarray]:
+        """Draw Laplace noise from the pool, same as `numpy.random.Generator.laplace`.
+
+        :param loc: Location of the distribution, defaults to 0
+        :param scale: Scale of the distribution, defaults to 1
+        :param size: Output shape, defaults to None (a single value, or the shape of `scale`)
+        :return: The drawn noise
+        """
+        return self._take('laplace', loc, scale, size)
+
+    def normal(self, loc: float = 0., scale: Union[float, ndarray] = 1.,
+               size: Union[None, int, Tuple[int, ...]] = None) -> Union[float, ndarray]:
+        """Draw Gaussian noise from the pool, same as `numpy.random.Generator.normal`.
+
+        :param loc: Mean of the distribution, defaults to 0
+        :param scale: Standard deviation of the distribution, defaults to 1
+        :param size: Output shape, defaults to None (a single value, or the shape of `scale`)
+        :return: The drawn noise
+        """
+        return self._take('normal', loc, scale, size)
@@ -0,0 +1,154 @@
+"""
+Flat parameter vectors, used by the differentially private optimizers and federated learning.
+
+The weights (or gradients) of a model are a list of arrays, one per layer. A :class:`ParameterLayout` keeps the shapes
+of the layers and their offsets in one contiguous vector, so that clipping, adding noise and weighted averaging are
+single vector operations, and each layer is a zero-copy view of the vector. A :class:`StreamingAggregator`
+averages vectors one at a time, e.g. the updates of the clients of a federated learning round as they arrive.
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+
+
+class ParameterLayout:
+    """Shapes of the layers of a model and their offsets in a flat parameter vector."""
+
+    def __init__(self, shapes: Sequence[Tuple[int, ...]], dtype: Union[type, np.dtype] = np.float64):
+        """
+        :param shapes: Shape of each layer
+        :param dtype: Data type of the parameter vector, defaults to float64
+        """
+        self.shapes = [tuple(shape) for shape in shapes]
+        self.dtype = np.dtype(dtype)
+        self.offsets = np.concatenate([[0], np.cumsum([int(np.prod(shape)) for shape in self.shapes])]).astype(int)
+
+    @classmethod
+    def from_arrays(cls, arrays: Any, dtype: Optional[Union[type, np.dtype]] = None) -> 'ParameterLayout':
+        """Create the layout of a list of arrays, e.g. the weights of a model. A scalar or an array which is not of
+        object dtype is a single layer.
+
+        :param arrays: The list of arrays
+        :param dtype: Data type of the parameter vector, defaults to None (the result type of the arrays, at least float32)
+        :return: The parameter layout
+        """
+        layers = _layers(arrays)
+        if dtype is None:
+            dtype = np.result_type(np.float32, *[np.asarray(layer).dtype for layer in layers])
+        return cls([np.shape(layer) for layer in layers], dtype)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ParameterLayout) and self.shapes == other.shapes and self.dtype == other.dtype
+
+    def __repr__(self):
+        return f'ParameterLayout({self.shapes}, {self.dtype})'
+
+    @property
+    def size(self) -> int:
+        """Number of parameters."""
+        return int(self.offsets[-1])
+
+    def zeros(self) -> ndarray:
+        return np.zeros(self.size, dtype=self.dtype)
+
+    def flatten(self, arrays: Any, out: Optional[ndarray] = None) -> ndarray:
+        """Copy a list of arrays into a flat parameter vector. A flat vector of the right size is returned as it is,
+        or copied into `out`.
+
+        :param arrays: The list of arrays, with the shapes of the layout
+        :param out: Vector to copy the arrays into, defaults to None (a new vector)
+        :return: The flat parameter vector
+        """
+        if isinstance(arrays, ndarray) and arrays.dtype != object and arrays.shape == (self.size, ):
+            if out is None:
+                return arrays
+            out[:] = arrays
+            return out
+        layers = _layers(arrays)
+        assert len(layers) == len(self.shapes), f'expecting {len(self.shapes)} layers, got {len(layers)}.'
+        out = self.zeros() if out is None else out
+        for layer, start, end in zip(layers, self.offsets[:-1], self.offsets[1:]):
+            out[start:end] = np.ravel(layer)
+        return out
+
+    def unflatten(self, vector: ndarray) -> List[ndarray]:
+        """Split a flat parameter vector into its layers, as views of the vector.
+
+        :param vector: The flat parameter vector
+        :return: List of arrays, one for each layer
+        """
+        assert vector.shape == (self.size, ), f'expecting a vector of size {self.size}.'
+        return [vector[start:end].reshape(shape)
+                for shape, start, end in zip(self.shapes, self.offsets[:-1], self.offsets[1:])]
+
+
+def _layers(arrays: Any) -> list:
+    if np.isscalar(arrays) or (isinstance(arrays, ndarray) and arrays.dtype != object):
+        return [arrays]
+    return list(arrays)
+
+
+def clip_by_l2_norm(vector: ndarray, norm_bound: float) -> ndarray:
+    """Scale a flat parameter vector in place so that its L2-norm is at most `norm_bound`.
+
+    :param vector: The flat parameter vector
+    :param norm_bound: L2-norm bound
+    :return: The clipped vector
+    """
+    vector /= max(1., np.linalg.norm(vector) / norm_bound)
+    return vector
+
+
+def weighted_sum(vectors: Union[ndarray, Sequence[ndarray]], weights: Union[ndarray, Sequence[float]]) -> ndarray:
+    """Compute the weighted sum of flat parameter vectors as one matrix-vector product.
+
+    :param vectors: Flat parameter vectors of the same size, or a matrix with one vector per row
+    :param weights: Weight of each vector
+    :return: The weighted sum
+    """
+    return np.asarray(weights, dtype=float) @ (vectors if isinstance(vectors, ndarray) else np.stack(vectors))
+
+
+class StreamingAggregator:
+    """Running weighted sum of flat parameter vectors.
+
+    Each vector is folded into a preallocated accumulator as soon as it is added, so that it can be released, and
+    the memory used is O(model size) however many vectors are aggregated. The sum is accumulated in float64.
+    """
+
+    def __init__(self, layout: ParameterLayout):
+        """
+        :param layout: Layout of the vectors, which may also be added as lists of arrays
+        """
+        self.layout = layout
+        dtype = np.result_type(layout.dtype, np.float64)
+        self._total = np.zeros(layout.size, dtype=dtype)
+        self._scratch = np.empty(layout.size, dtype=dtype)
+        self.count = 0
+        self.total_weight = 0.
+
+    def add(self, vector: Any, weight: float = 1., norm_bound: Optional[float] = None):
+        """Add a weighted vector to the sum.
+
+        :param vector: Flat parameter vector, or list of arrays with the shapes of the layout
+        :param weight: Weight of the vector, defaults to 1
+        :param norm_bound: L2-norm bound the vector is clipped to before it is weighted, defaults to None (no clipping)
+        """
+        scratch = self.layout.flatten(vector, out=self._scratch)
+        if norm_bound is not None:
+            clip_by_l2_norm(scratch, norm_bound)
+        scratch *= weight
+        self._total += scratch
+        self.count += 1
+        self.total_weight += weight
+
+    def sum(self) -> ndarray:
+        """:return: The weighted sum of the vectors added, the accumulator itself"""
+        return self._total
+
+    def mean(self) -> ndarray:
+        """:return: The weighted mean of the vectors added, i.e. the weighted sum divided by the total weight"""
+        assert self.total_weight > 0, "expected vectors with a positive total weight."
+        return self._total / self.total_weight
@@ -2,7 +2,12 @@
 PrivacyBudget classes.
 """
 
-from typing import List
+from typing import List, Optional, Union
+
+import numpy as np
+from numpy import ndarray
+
+from calculate_rdp import get_privacy_spent_rdp
 
 
 class PrivacyBudget:
@@ -49,5 +54,39 @@ def combine_privacy_losses(losses: List[PrivacyBudget]) -> PrivacyBudget:
     :param losses: List of privacy losses
     :return: The total privacy loss
     """
-    e = [(x+y) for (x, y) in zip(*losses)]  # type: ignore
+    e = [sum(x) for x in zip(*losses)]  # type: ignore
     return PrivacyBudget(*e)
+
+
+class RenyiPrivacyBudget(PrivacyBudget):
+    """A Renyi differential privacy (RDP) budget (https://arxiv.org/pdf/1702.07476.pdf), represented by its RDP
+    curve :math:`\epsilon(\\alpha)` over a set of orders :math:`\\alpha`, and viewed as a
+    :math:`(\epsilon,\delta)`-privacy budget for a target :math:`\epsilon` or :math:`\delta`.
+
+    Adding two RDP budgets adds their RDP curves, which is tighter than adding their :math:`(\epsilon,\delta)`.
+    """
+
+    def __init__(self, orders: Union[List[float], ndarray], rdp: Union[List[float], ndarray],
+                 target_eps: Optional[float] = None, target_delta: Optional[float] = None):
+        """Must specify exactly either one of `target_eps` or `target_delta`.
+
+        :param orders: RDP orders :math:`\\alpha`, all greater than 1
+        :param rdp: RDP :math:`\epsilon(\\alpha)` of each order
+        :param target_eps: Target value of :math:`\epsilon`, defaults to None
+        :param target_delta: Target value of :math:`\delta`, defaults to None
+        """
+        self.orders = np.asarray(orders, dtype=float)
+        self.rdp = np.asarray(rdp, dtype=float)
+        assert self.orders.shape == self.rdp.shape, "expecting one RDP value for each order."
+        self.target_eps = target_eps
+        self.target_delta = target_delta
+        super().__init__(*get_privacy_spent_rdp(self.orders, self.rdp, target_eps, target_delta))
+
+    def __add__(self, other):
+        """add two privacy budgets, composing the RDP curves if both are RDP budgets with the same orders."""
+        if isinstance(other, RenyiPrivacyBudget) and np.array_equal(self.orders, other.orders):
+            return RenyiPrivacyBudget(self.orders, self.rdp + other.rdp, self.target_eps, self.target_delta)
+        return super().__add__(other)
+
+    def __repr__(self):
+        return f'({self.epsilon}, {self.delta})-DP from RDP'
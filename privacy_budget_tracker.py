@@ -2,74 +2,320 @@
 PrivacyBudgetTracker classes.
 """
 
+import contextlib
+import threading
+import uuid
 from abc import ABC
-from typing import List, Union
+from typing import Any, ContextManager, Dict, List, Optional, Set, Tuple, Union
 
 import numpy as np
+from numpy import ndarray
 
 from calculate_moment import *
-from privacy_budget import PrivacyBudget
+from calculate_rdp import DEFAULT_ORDERS, compute_rdp, get_privacy_spent_rdp
+from privacy_budget import PrivacyBudget, RenyiPrivacyBudget
+from privacy_ledger import PrivacyLedger
+
+
+class PrivacyBudgetReservation:
+    """A privacy loss reserved by :meth:`PrivacyBudgetTracker.reserve`. The reserved privacy loss counts against the
+    total privacy budget until it is either committed, when the query is answered, or rolled back, when it fails.
+
+    Used as a context manager, the reservation is committed at the end of the block, or rolled back if the block
+    raises an exception.
+    """
+
+    def __init__(self, tracker: 'PrivacyBudgetTracker', privacy_loss: Any):
+        """
+        :param tracker: The privacy budget tracker
+        :param privacy_loss: The reserved privacy loss, in the representation of the tracker
+        """
+        self.id = uuid.uuid4().hex
+        self.tracker = tracker
+        self.privacy_loss = privacy_loss
+
+    def __enter__(self) -> 'PrivacyBudgetReservation':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.pending:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+
+    @property
+    def pending(self) -> bool:
+        """Whether the reservation is neither committed nor rolled back."""
+        return self in self.tracker._pending
+
+    def commit(self):
+        """Add the reserved privacy loss to the consumed privacy budget."""
+        self.tracker._commit(self)
+
+    def rollback(self):
+        """Release the reserved privacy loss."""
+        self.tracker._rollback(self)
 
 
 class PrivacyBudgetTracker(ABC):
     """Base class of privacy budget tracker.
+
+    All trackers are safe for concurrent use. `reserve` atomically checks the remaining privacy budget, including the
+    privacy loss reserved by pending queries, and reserves the privacy loss of a query, so the query can be answered
+    outside of any lock and the total privacy budget is never overspent. `update_privacy_loss` reserves and commits
+    at once.
+
+    With a :class:`PrivacyLedger <privacy_ledger.PrivacyLedger>`, the reservations are recorded persistently and
+    trackers using ledgers on the same path, in one or several processes, share the total privacy budget. Each tracker
+    opens its own ledger instance. The privacy losses recorded by the other trackers are read at every reservation
+    and by `refresh`.
+
+    Subclasses represent the privacy loss in a form that is composed by `_compose` (e.g. a privacy budget or a vector
+    of log moments), and define `_fits`, `_committed_loss`, `_set_committed_loss`, `_encode_loss` and `_decode_loss`.
     """
 
-    def __init__(self, total_privacy_budget: PrivacyBudget):
+    def __init__(self, total_privacy_budget: PrivacyBudget, ledger: Optional[PrivacyLedger] = None):
         """
         :param total_privacy_budget: The total privacy budget that can be consumed by the private table. 
             When is there is no privacy budget left, stop answering queries.
+        :param ledger: Persistent ledger of the privacy losses, used by this tracker only, defaults to None (the
+            privacy losses are only kept in memory)
         """
+        if ledger is not None:
+            ledger.attach()
+        self._lock = threading.Lock()
+        self._pending = set()  # type: Set[PrivacyBudgetReservation]
+        self._ledger = ledger
+        self._ledger_pending = {}  # type: Dict[str, Any]  # reservations recorded by other trackers, by id
         self.total_privacy_budget = total_privacy_budget
         self.consumed_privacy_budget = PrivacyBudget(0., 0.)
+        self._reserved_loss = self._committed_loss()  # committed privacy loss and privacy loss of pending queries
+        self.refresh()
+
+    def _compose(self, privacy_loss: Any, other: Any) -> Any:
+        return privacy_loss + other
+
+    def _fits(self, privacy_loss: Any) -> bool:
+        return privacy_loss <= self.total_privacy_budget
+
+    def _committed_loss(self) -> Any:
+        return self.consumed_privacy_budget
+
+    def _set_committed_loss(self, privacy_loss: Any):
+        self.consumed_privacy_budget = privacy_loss
+
+    def _encode_loss(self, privacy_loss: Any) -> List[float]:
+        return [float(x) for x in privacy_loss]
+
+    def _decode_loss(self, values: List[float]) -> Any:
+        return PrivacyBudget(*values)
+
+    def _ledger_lock(self) -> ContextManager:
+        return self._ledger.lock() if self._ledger is not None else contextlib.nullcontext()
+
+    def _recompose_reserved_loss(self):
+        # recompose instead of subtracting, so that releasing a reservation does not accumulate rounding errors
+        self._reserved_loss = self._committed_loss()
+        for privacy_loss in [pending.privacy_loss for pending in self._pending] + list(self._ledger_pending.values()):
+            self._reserved_loss = self._compose(self._reserved_loss, privacy_loss)
+
+    def _replay(self):
+        """Apply the records of the other trackers appended to the ledger. The locks must be held."""
+        released = False
+        for record in self._ledger.read():
+            if record['writer'] == self._ledger.writer:
+                continue
+            if record['type'] == 'reserve':
+                privacy_loss = self._decode_loss(record['loss'])
+                self._ledger_pending[record['id']] = privacy_loss
+                self._reserved_loss = self._compose(self._reserved_loss, privacy_loss)
+            elif record['id'] in self._ledger_pending:
+                privacy_loss = self._ledger_pending.pop(record['id'])
+                if record['type'] == 'commit':
+                    self._set_committed_loss(self._compose(self._committed_loss(), privacy_loss))
+                released = True
+        if released:
+            self._recompose_reserved_loss()
+
+    def refresh(self):
+        """Read the privacy losses recorded in the ledger by other trackers, e.g. before reading
+        `consumed_privacy_budget`. Does nothing without a ledger."""
+        if self._ledger is not None:
+            with self._lock, self._ledger.lock():
+                self._replay()
+
+    def _reserve(self, privacy_loss: Any) -> PrivacyBudgetReservation:
+        reservation = PrivacyBudgetReservation(self, privacy_loss)
+        with self._lock, self._ledger_lock():
+            if self._ledger is not None:
+                self._replay()
+            reserved_loss = self._compose(self._reserved_loss, privacy_loss)
+            assert self._fits(reserved_loss), "there is not enough privacy budget."
+            if self._ledger is not None:
+                self._ledger.append({'id': reservation.id, 'type': 'reserve', 'loss': self._encode_loss(privacy_loss)})
+            self._reserved_loss = reserved_loss
+            self._pending.add(reservation)
+        return reservation
+
+    def _commit(self, reservation: PrivacyBudgetReservation):
+        with self._lock, self._ledger_lock():
+            assert reservation in self._pending, "the reservation is already committed or rolled back."
+            if self._ledger is not None:
+                ticket = self._ledger.append({'id': reservation.id, 'type': 'commit'})
+            self._pending.remove(reservation)
+            self._set_committed_loss(self._compose(self._committed_loss(), reservation.privacy_loss))
+            if not self._pending and not self._ledger_pending:
+                self._reserved_loss = self._committed_loss()
+        if self._ledger is not None:
+            # the reservation must be durable before the answer is released, synced outside of the locks
+            # together with the records of concurrent queries
+            self._ledger.sync(ticket)
+
+    def _rollback(self, reservation: PrivacyBudgetReservation):
+        with self._lock, self._ledger_lock():
+            assert reservation in self._pending, "the reservation is already committed or rolled back."
+            if self._ledger is not None:
+                self._ledger.append({'id': reservation.id, 'type': 'rollback'})
+            self._pending.remove(reservation)
+            self._recompose_reserved_loss()
 
 
 class SimplePrivacyBudgetTracker(PrivacyBudgetTracker):
     """Privacy budget tracker that use simple composition theorem to update consumed privacy budget.
     """
 
+    def reserve(self, privacy_budget: PrivacyBudget) -> PrivacyBudgetReservation:
+        """Reserve the privacy loss of a query if the remaining privacy budget is enough, see `update_privacy_loss`.
+
+        :param privacy_budget: A :math:`(\epsilon,\delta)`-privacy budget to be reserved
+        :return: The reservation, to be committed or rolled back
+        """
+        return self._reserve(privacy_budget)
+
     def update_privacy_loss(self, privacy_budget: PrivacyBudget):
         """Update the consumed privacy budget using a simple privacy composition theorem. 
         Also check if the remain privacy budget is enough for the current query.
 
         :param privacy_budget: A :math:`(\epsilon,\delta)`-privacy budget to be updated
         """
-        e = self.consumed_privacy_budget + privacy_budget
-        assert e <= self.total_privacy_budget, "there is not enough privacy budget."
-
-        self.consumed_privacy_budget = e
+        self.reserve(privacy_budget).commit()
 
 
 class AdvancedPrivacyBudgetTracker(PrivacyBudgetTracker):
     """Privacy budget tracker that use advance composition theorem to update consumed privacy budget.
     """
 
-    def update_privacy_loss(self, privacy_budget: PrivacyBudget, delta_prime: float, k: int = 1):
-        """Calculate and update privacy loss of multiple query with same privacy_budget.
-        :param privacy_budget: Privacy budget of query
-        :param delta_prime: Value of :math:`\epsilon'`
-        :param k: Number of query, defaults to 1
-        """
+    def reserve(self, privacy_budget: PrivacyBudget, delta_prime: float, k: int = 1) -> PrivacyBudgetReservation:
+        """Reserve the privacy loss of multiple query if the remaining privacy budget is enough, see `update_privacy_loss`.
 
+        :return: The reservation, to be committed or rolled back
+        """
         assert delta_prime > 0, "Value of delta should be positive"
 
         kfold_privacy_budget = PrivacyBudget(np.sqrt(2*k*np.log(1/delta_prime))*privacy_budget.epsilon
                                              + k*privacy_budget.epsilon*(np.exp(privacy_budget.epsilon)-1),
                                              k*privacy_budget.delta + delta_prime)
+        return self._reserve(kfold_privacy_budget)
 
-        e = self.consumed_privacy_budget + kfold_privacy_budget
-        assert e <= self.total_privacy_budget, "there is not enough privacy budget."
-
-        self.consumed_privacy_budget = e
+    def update_privacy_loss(self, privacy_budget: PrivacyBudget, delta_prime: float, k: int = 1):
+        """Calculate and update privacy loss of multiple query with same privacy_budget.
+        :param privacy_budget: Privacy budget of query
+        :param delta_prime: Value of :math:`\epsilon'`
+        :param k: Number of query, defaults to 1
+        """
+        self.reserve(privacy_budget, delta_prime, k).commit()
 
 
 class MomentPrivacyBudgetTracker(PrivacyBudgetTracker):
     """Privacy budget tracker that use moment accountant (https://arxiv.org/pdf/1607.00133.pdf) to update consumed privacy budget.
+
+    The log moments of all updates are accumulated, so that updates with different sampling ratios, noise scales and
+    numbers of steps are composed by the moment accountant instead of adding their :math:`(\epsilon,\delta)`.
+    The accumulated log moments are only converted to :math:`(\epsilon,\delta)` when `consumed_privacy_budget` is read.
     """
 
+    def __init__(self, total_privacy_budget: PrivacyBudget, ledger: Optional[PrivacyLedger] = None):
+        """
+        :param total_privacy_budget: The total privacy budget that can be consumed.
+        :param ledger: Persistent ledger of the privacy losses, defaults to None
+        """
+        self.log_moments = None  # type: Optional[ndarray]  # accumulated log moments of orders 1, 2, ...
+        self.target_eps = None  # type: Optional[float]
+        self.target_delta = None  # type: Optional[float]
+        super().__init__(total_privacy_budget, ledger)
+
+    @property
+    def consumed_privacy_budget(self) -> PrivacyBudget:
+        with self._lock:
+            if self._consumed_privacy_budget is None:
+                log_moments = list(zip(range(1, len(self.log_moments) + 1), self.log_moments))
+                target_eps, target_delta = self._targets()
+                self._consumed_privacy_budget = PrivacyBudget(*get_privacy_spent(log_moments, target_eps, target_delta))
+            return self._consumed_privacy_budget
+
+    @consumed_privacy_budget.setter
+    def consumed_privacy_budget(self, privacy_budget: Optional[PrivacyBudget]):
+        self._consumed_privacy_budget = privacy_budget
+
+    def _compose(self, log_moments: Optional[ndarray], other: ndarray) -> ndarray:
+        # only the orders computed by both are kept
+        if log_moments is None:
+            return other
+        orders = min(len(log_moments), len(other))
+        return log_moments[:orders] + other[:orders]
+
+    def _fits(self, log_moments: ndarray) -> bool:
+        """Check that the log moments give a :math:`(\epsilon,\delta)` within the total privacy budget for some
+        order, i.e. :math:`\\alpha(\lambda) - \lambda\epsilon \le \log\delta`, without converting them."""
+        epsilon, delta = self.total_privacy_budget
+        orders = np.arange(1, len(log_moments) + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return bool(np.any(log_moments - orders * epsilon <= np.log(delta)))
+
+    def _committed_loss(self) -> Optional[ndarray]:
+        return self.log_moments
+
+    def _set_committed_loss(self, log_moments: ndarray):
+        self.log_moments = log_moments
+        self.consumed_privacy_budget = None
+
+    def _encode_loss(self, log_moments: ndarray) -> List[float]:
+        return log_moments.tolist()
+
+    def _decode_loss(self, values: List[float]) -> ndarray:
+        return np.asarray(values, dtype=float)
+
+    def _targets(self) -> Tuple[Optional[float], Optional[float]]:
+        # the losses replayed from a ledger are reported for the total delta until a target is given
+        if self.target_eps is None and self.target_delta is None:
+            return None, self.total_privacy_budget.delta
+        return self.target_eps, self.target_delta
+
+    def reserve(self, sampling_ratio: float, sigma: float, steps: int, moment_order: int = 32,
+                target_eps: Union[float, None] = None, target_delta: Union[float, None] = None) -> PrivacyBudgetReservation:
+        """Reserve the privacy loss if the remaining privacy budget is enough, see `update_privacy_loss`.
+
+        :return: The reservation, to be committed or rolled back
+        """
+        assert (target_eps is None) ^ (target_delta is None), "Exactly one of epsilon and delta should be specified"
+        assert (target_eps is None) or (target_eps > 0), "Value of epsilon should be positive"
+        assert (target_delta is None) or (target_delta > 0), "Value of delta should be positive"
+
+        reservation = self._reserve(compute_log_moments(sampling_ratio, sigma, steps, moment_order))
+        with self._lock:
+            self.target_eps = target_eps
+            self.target_delta = target_delta
+            if self.log_moments is not None:
+                self.consumed_privacy_budget = None
+        return reservation
+
     def update_privacy_loss(self, sampling_ratio: float, sigma: float, steps: int, moment_order: int = 32,
                             target_eps: Union[float, None] = None, target_delta: Union[float, None] = None):
-        """Calculate and update privacy loss. Must specify exactly either one of `target_eps` or `target_delta`.
+        """Calculate and update privacy loss. Must specify exactly either one of `target_eps` or `target_delta`,
+        which is used to report the consumed privacy budget of all updates so far.
+
+        Only the orders computed by every update are kept, so the accountant uses the smallest `moment_order` so far.
 
         :param sampling_ratio: Ratio of data used to total data in one step
         :param sigma: Noise scale
@@ -78,14 +324,75 @@ class MomentPrivacyBudgetTracker(PrivacyBudgetTracker):
         :param target_eps: Target value of :math:`\epsilon`, defaults to None
         :param target_delta: Target value of :math:`\delta`, defaults to None
         """
+        self.reserve(sampling_ratio, sigma, steps, moment_order, target_eps, target_delta).commit()
+
+
+class RenyiPrivacyBudgetTracker(PrivacyBudgetTracker):
+    """Privacy budget tracker that use Renyi differential privacy (https://arxiv.org/pdf/1702.07476.pdf) of the
+    sampled Gaussian mechanism (https://arxiv.org/abs/1908.10530) to update consumed privacy budget.
+
+    The RDP of all updates is composed before being converted to :math:`(\epsilon,\delta)`, using the closed form
+    for integer orders and a series for fractional orders.
+    """
+
+    def __init__(self, total_privacy_budget: PrivacyBudget, orders: Union[List[float], ndarray] = DEFAULT_ORDERS,
+                 ledger: Optional[PrivacyLedger] = None):
+        """
+        :param total_privacy_budget: The total privacy budget that can be consumed.
+        :param orders: RDP orders used for the accounting, defaults to 1.1, 1.2, ..., 10.9, 11, 12, ..., 63, 128, 256, 512
+        :param ledger: Persistent ledger of the privacy losses, defaults to None
+        """
+        self.orders = np.asarray(orders, dtype=float)
+        self.rdp = np.zeros_like(self.orders)
+        self.target_eps = None  # type: Optional[float]
+        self.target_delta = None  # type: Optional[float]
+        super().__init__(total_privacy_budget, ledger)
+
+    def _fits(self, rdp: ndarray) -> bool:
+        epsilon, delta = self.total_privacy_budget
+        return get_privacy_spent_rdp(self.orders, rdp, target_eps=epsilon)[1] <= delta
+
+    def _committed_loss(self) -> ndarray:
+        return self.rdp
+
+    def _set_committed_loss(self, rdp: ndarray):
+        self.rdp = rdp
+        if self.target_eps is None and self.target_delta is None:
+            # the losses replayed from a ledger are reported for the total delta until a target is given
+            self.consumed_privacy_budget = RenyiPrivacyBudget(self.orders, rdp, target_delta=self.total_privacy_budget.delta)
+        else:
+            self.consumed_privacy_budget = RenyiPrivacyBudget(self.orders, rdp, self.target_eps, self.target_delta)
+
+    def _encode_loss(self, rdp: ndarray) -> List[float]:
+        return rdp.tolist()
+
+    def _decode_loss(self, values: List[float]) -> ndarray:
+        return np.asarray(values, dtype=float)
+
+    def reserve(self, sampling_ratio: float, sigma: float, steps: int, target_eps: Union[float, None] = None,
+                target_delta: Union[float, None] = None) -> PrivacyBudgetReservation:
+        """Reserve the privacy loss if the remaining privacy budget is enough, see `update_privacy_loss`.
+
+        :return: The reservation, to be committed or rolled back
+        """
+        assert (target_eps is None) ^ (target_delta is None), "Exactly one of epsilon and delta should be specified"
         assert (target_eps is None) or (target_eps > 0), "Value of epsilon should be positive"
         assert (target_delta is None) or (target_delta > 0), "Value of delta should be positive"
 
-        log_moments = [(i, compute_log_moment(sampling_ratio, sigma, steps, i)) for i in range(1, moment_order + 1)]
-        privacy = get_privacy_spent(log_moments, target_eps, target_delta)
-        privacy_budget = PrivacyBudget(privacy[0], privacy[1])
+        reservation = self._reserve(compute_rdp(sampling_ratio, sigma, steps, self.orders))
+        with self._lock:
+            self.target_eps = target_eps
+            self.target_delta = target_delta
+        return reservation
 
-        e = self.consumed_privacy_budget + privacy_budget
-        assert e <= self.total_privacy_budget, "there is not enough privacy budget."
+    def update_privacy_loss(self, sampling_ratio: float, sigma: float, steps: int,
+                            target_eps: Union[float, None] = None, target_delta: Union[float, None] = None):
+        """Calculate and update privacy loss. Must specify exactly either one of `target_eps` or `target_delta`.
 
-        self.consumed_privacy_budget = e
+        :param sampling_ratio: Ratio of data used to total data in one step
+        :param sigma: Noise scale
+        :param steps: Number of update performed
+        :param target_eps: Target value of :math:`\epsilon`, defaults to None
+        :param target_delta: Target value of :math:`\delta`, defaults to None
+        """
+        self.reserve(sampling_ratio, sigma, steps, target_eps, target_delta).commit()
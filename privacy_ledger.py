@@ -0,0 +1,238 @@
+"""
+PrivacyLedger classes, persistent backends of the privacy budget trackers.
+
+A ledger is an append-only log of the privacy losses reserved, committed and rolled back by the trackers using it.
+Trackers of several processes sharing one ledger replay the records of each other before every reservation, under
+an exclusive lock of the ledger, so they share one total privacy budget. A restarted process replays the whole ledger.
+
+A reservation counts against the total privacy budget as soon as its record is appended, and the records are made
+durable with group commit: when a reservation is committed, i.e. before the answer of the query is released, the
+caller waits until its records are synced to disk, and a single sync covers all records appended by concurrent
+queries in the meantime. A reservation without a commit or rollback record, e.g. of a process that crashed, is
+never released.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, ContextManager, Dict, Iterator, List
+
+
+class PrivacyLedger(ABC):
+    """Base class of privacy ledger.
+
+    Records are dictionaries with the keys `writer` (the ledger instance which appended it), `id` (of the
+    reservation), `type` (`reserve`, `commit` or `rollback`) and `loss` (the reserved privacy loss, for `reserve`).
+
+    The answer of a query is released once its records are durable, so a thread answering queries one after another
+    pays one sync per query. Only concurrent queries share a sync: without `group_commit_delay`, the commits arriving
+    while a sync runs share the next one, and with a delay, the commits arriving within the delay also share the sync,
+    at the cost of adding the delay to the latency of every query. A delay pays off when many threads or processes
+    answer queries at the same time, e.g. a delay of the order of the sync time of the disk.
+    """
+
+    def __init__(self, group_commit_delay: float = 0.):
+        """
+        :param group_commit_delay: Time in seconds a sync waits for more records before syncing them together,
+            defaults to 0 (a sync starts at once)
+        """
+        assert group_commit_delay >= 0, "expected a non-negative value."
+        self.writer = uuid.uuid4().hex
+        self.group_commit_delay = group_commit_delay
+        self._sync_condition = threading.Condition()
+        self._appended = 0  # number of records appended by this instance
+        self._synced = 0  # number of records appended by this instance that are durable
+        self._syncing = False
+        self._attached = False
+
+    def attach(self):
+        """Register the tracker using this ledger instance. The writer identifies the ledger instance and each record
+        is read once per instance, so an instance is used by a single tracker, and other trackers, also of the same
+        process, open their own ledger on the same path."""
+        with self._sync_condition:
+            assert not self._attached, \
+                "the ledger is already used by another tracker, open another ledger on the same path."
+            self._attached = True
+
+    @abstractmethod
+    def lock(self) -> ContextManager:
+        """Exclusive lock of the ledger across processes, held while reading and appending records."""
+
+    @abstractmethod
+    def read(self) -> List[Dict[str, Any]]:
+        """Read the records appended since the previous read, must be called with the lock held.
+
+        :return: The new records, in the order they were appended
+        """
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Append a record, must be called with the lock held. The record is durable after `sync`.
+
+        :param record: The record, without `writer`
+        :return: Ticket of the record, to be passed to `sync`
+        """
+        self._write(dict(record, writer=self.writer))
+        with self._sync_condition:
+            self._appended += 1
+            return self._appended
+
+    def sync(self, ticket: int):
+        """Wait until the record of a ticket and all records appended before it are durable.
+
+        Only one thread syncs at a time, and it syncs all the records appended so far, so the callers waiting for
+        the same sync share it (group commit).
+
+        :param ticket: Ticket returned by `append`
+        """
+        with self._sync_condition:
+            while self._synced < ticket:
+                if self._syncing:
+                    self._sync_condition.wait()
+                    continue
+                self._syncing = True
+                self._sync_condition.release()
+                try:
+                    if self.group_commit_delay > 0:
+                        time.sleep(self.group_commit_delay)
+                    with self._sync_condition:
+                        appended = self._appended
+                    self._flush()
+                finally:
+                    self._sync_condition.acquire()
+                    self._syncing = False
+                    self._sync_condition.notify_all()
+                self._synced = max(self._synced, appended)
+
+    @abstractmethod
+    def _write(self, record: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def _flush(self):
+        """Make all records written so far durable."""
+
+    def close(self):
+        pass
+
+
+class FileLedger(PrivacyLedger):
+    """Ledger stored in an append-only file of JSON lines, locked with `fcntl.flock` and synced with `os.fsync`."""
+
+    def __init__(self, path: str, group_commit_delay: float = 0.):
+        """
+        :param path: Path of the ledger file, created if it does not exist
+        :param group_commit_delay: Time in seconds a sync waits for more records before syncing them together,
+            defaults to 0, see :class:`PrivacyLedger` for the trade-off between latency and number of syncs
+        """
+        super().__init__(group_commit_delay)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._offset = 0  # bytes already read
+        self._torn = False  # the file ends with an incomplete record of a crashed writer
+        self._thread_lock = threading.Lock()  # flock does not exclude the threads sharing the file descriptor
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def read(self) -> List[Dict[str, Any]]:
+        size = os.fstat(self._fd).st_size
+        data = os.pread(self._fd, size - self._offset, self._offset)
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        # the lock is held, so an incomplete last record was left by a writer that crashed while appending it
+        self._torn = end < len(data)
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:  # a record torn by a crash, followed by a newline
+                continue
+        return records
+
+    def _write(self, record: Dict[str, Any]):
+        data = (json.dumps(record) + '\n').encode()
+        if self._torn:
+            data = b'\n' + data
+            self._torn = False
+        os.write(self._fd, data)
+
+    def _flush(self):
+        os.fsync(self._fd)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class SQLiteLedger(PrivacyLedger):
+    """Ledger stored in a SQLite database in WAL mode. Records are appended in `BEGIN IMMEDIATE` transactions, which
+    are committed without syncing (`synchronous=NORMAL`), and synced together by syncing the write-ahead log."""
+
+    def __init__(self, path: str, group_commit_delay: float = 0., timeout: float = 60.):
+        """
+        :param path: Path of the database, created if it does not exist
+        :param group_commit_delay: Time in seconds a sync waits for more records before syncing them together,
+            defaults to 0, see :class:`PrivacyLedger` for the trade-off between latency and number of syncs
+        :param timeout: Time in seconds to wait for the lock of the database, defaults to 60
+        """
+        super().__init__(group_commit_delay)
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection_lock = threading.RLock()
+        self._last_seq = 0  # sequence number of the last record read
+        with self._connection_lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS records (seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                                     'record TEXT NOT NULL)')
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        with self._connection_lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def read(self) -> List[Dict[str, Any]]:
+        with self._connection_lock:
+            rows = self._connection.execute('SELECT seq, record FROM records WHERE seq > ? ORDER BY seq',
+                                            (self._last_seq, )).fetchall()
+        if rows:
+            self._last_seq = rows[-1][0]
+        return [json.loads(record) for _, record in rows]
+
+    def _write(self, record: Dict[str, Any]):
+        with self._connection_lock:
+            self._connection.execute('INSERT INTO records (record) VALUES (?)', (json.dumps(record), ))
+
+    def _flush(self):
+        # a checkpoint does not sync the WAL when it cannot copy any frame, e.g. while other connections read or
+        # write, so the WAL file is synced directly. A committed record is either in the WAL, or was copied by a
+        # checkpoint into the database file, which SQLite syncs before the WAL is reset.
+        try:
+            fd = os.open(f'{self.path}-wal', os.O_RDONLY)
+        except FileNotFoundError:  # all connections were closed, which checkpoints and syncs the database
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self._connection_lock:
+            self._connection.close()
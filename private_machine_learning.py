@@ -1,13 +1,27 @@
-import random
-from datetime import datetime
-from typing import Any, Callable, Union
+from typing import Any, Callable, Optional, Union
 
 import numpy as np
 from numpy import ndarray
-from numpy.random import normal
+from numpy.random import Generator
 
+from lot_sampler import PoissonLotSampler, take
+from parameter_vector import ParameterLayout
 from privacy_budget import PrivacyBudget
 from privacy_budget_tracker import MomentPrivacyBudgetTracker
+from random_generator import get_default_rng
+
+
+def clip_and_sum_gradients(per_example_gradients: ndarray, gradient_norm_bound: Union[int, float]) -> ndarray:
+    """Clip the L2-norm of each per-example gradient to `gradient_norm_bound` and sum them.
+
+    :param per_example_gradients: Per-example gradients stacked in an array of shape (number of examples, ...)
+    :param gradient_norm_bound: L2-norm bound of the gradient.
+    :return: Sum of the clipped gradients, of shape (...)
+    """
+    per_example_gradients = np.asarray(per_example_gradients, dtype=float)
+    flat_gradients = per_example_gradients.reshape(len(per_example_gradients), -1)
+    scale = 1. / np.maximum(1., np.linalg.norm(flat_gradients, axis=1) / gradient_norm_bound)
+    return (scale @ flat_gradients).reshape(per_example_gradients.shape[1:])
 
 
 def private_SGD(gradient_function: Callable[[Any], Union[int, float, list, ndarray]],
@@ -21,7 +35,10 @@ def private_SGD(gradient_function: Callable[[Any], Union[int, float, list, ndarr
                 sigma: Union[int, float],
                 moment_privacy_budget_tracker: MomentPrivacyBudgetTracker,
                 test_interval: int = None,
-                test_function: Callable[[], None] = None
+                test_function: Callable[[], None] = None,
+                rng: Optional[Generator] = None,
+                batched: bool = False,
+                lot_sampler: Optional[PoissonLotSampler] = None
                 ):
     """This Differencial Privacy(DP) SGD proposed in https://arxiv.org/pdf/1607.00133.pdf. 
     This privacy budget is calculated using :func:`MomentPrivacyBudgetTracker <privacy_budget_tracker.MomentPrivacyBudgetTracker>`. 
@@ -38,57 +55,71 @@ def private_SGD(gradient_function: Callable[[Any], Union[int, float, list, ndarr
     :param moment_privacy_budget_tracker: Instance of MomentPrivacyBudgetTracker.
     :param test_interval: test_function will be triggred every test_interval steps if test_function is specify , defaults to None
     :param test_function: Fucntion to test the performance of model, defaults to None
+    :param rng: Random number generator used for shuffling, sampling groups and noise, defaults to None (the default generator of the calling thread)
+    :param batched: If True, gradient_function receives the whole group as an array and returns the per-example gradients
+        stacked in an array of shape (group size, ...), which are clipped and summed with vectorized operations, defaults to False
+    :param lot_sampler: Sampler of the lots by Poisson sampling, whose sampling ratio is used by the moment accountant.
+        The lots are selected from train_data without copying it, and group_size is ignored. Defaults to None
+        (a random group of group_size contiguous samples of the shuffled train_data in each step)
     """
+    rng = get_default_rng() if rng is None else rng
 
-    def gaussian_noise(x, standard_deviation):
-        shape = None if isinstance(x, (int, float)) else x.shape
-        noise = normal(loc=0.,
-                       scale=standard_deviation,
-                       size=shape)
-        return x + noise
-
-    random.seed(datetime.now())
-    idx = list(range(len(train_data)))
-    random.shuffle(idx)
-    train_data = np.array(train_data)[idx]
-    number_of_group = len(train_data)//group_size
-
-    for step in range(number_of_steps):
-        group_id = int(random.random()*number_of_group)
-        train_data_group = train_data[group_size*group_id: group_size*(group_id+1)]
-        total_grad = np.array([])
-        total_loss = 0
-
-        for i in range(len(train_data_group)):
-            grad = gradient_function(train_data_group[i])
-            if isinstance(grad, int) or isinstance(grad, float):
-                grad /= max(1, grad**2/gradient_norm_bound)
-            elif isinstance(grad, list) or isinstance(grad, ndarray):  # Either list/array or list/array of list/array
-                grad = np.array(grad, dtype=object)
-                grad /= max(1, np.linalg.norm(np.hstack([np.array(i).flatten() for i in grad]))/gradient_norm_bound)
-            else:
-                raise(TypeError("Data type returned by gradient_function should be either int, float, list or numpy ndarray"))
-            total_grad = (total_grad + grad) if i > 0 else grad
-
-        if isinstance(total_grad, int) or isinstance(total_grad, float):
-            total_grad = gaussian_noise(grad, sigma*gradient_norm_bound)
-        elif isinstance(total_grad, ndarray):
-            total_grad = np.array([gaussian_noise(i, sigma*gradient_norm_bound) for i in total_grad], dtype=object)
-        else:
-            raise(TypeError)
-        total_grad /= len(train_data_group)
+    if lot_sampler is None:
+        idx = rng.permutation(len(train_data))
+        train_data = np.array(train_data)[idx]
+        number_of_group = len(train_data)//group_size
+        sampling_ratio, lot_size = group_size/len(train_data), group_size
 
+        def sample_groups():
+            for _ in range(number_of_steps):
+                group_id = int(rng.integers(number_of_group))
+                yield train_data[group_size*group_id: group_size*(group_id+1)]
+        lots = sample_groups()
+    else:
+        assert lot_sampler.dataset_size == len(train_data), 'the lot sampler does not match the training data.'
+        sampling_ratio, lot_size = lot_sampler.sampling_ratio, lot_sampler.expected_lot_size
+        lots = (take(train_data, indices) for indices in lot_sampler.sample(number_of_steps))
+
+    # the shapes of the weights and gradients do not change, their layouts and the matrix of per-example gradients
+    # are created once and reused by every step, the matrix only grows for a lot larger than the previous ones
+    weights_layout = ParameterLayout.from_arrays(get_weights_function(), dtype=np.float64)
+    gradient_layout = None  # type: Optional[ParameterLayout]
+    per_example_gradients = None  # type: Optional[ndarray]
+
+    for step, train_data_group in enumerate(lots):
         weights = get_weights_function()
-        lr = learning_rate_function(step+1)
-        if isinstance(total_grad, ndarray):
-            weights = np.array(weights)
-        weights = weights - lr * total_grad
-        update_weights_function(weights)
+
+        if len(train_data_group) == 0:  # a Poisson sampled lot may be empty
+            total_grad = weights_layout.zeros()
+        elif batched:
+            batch_gradients = np.asarray(gradient_function(np.asarray(train_data_group)), dtype=float)
+            total_grad = clip_and_sum_gradients(batch_gradients, gradient_norm_bound).reshape(-1)
+        else:
+            for i in range(len(train_data_group)):
+                grad = gradient_function(train_data_group[i])
+                if not isinstance(grad, (int, float, list, ndarray)):
+                    raise(TypeError("Data type returned by gradient_function should be either int, float, list or numpy ndarray"))
+                if gradient_layout is None:
+                    gradient_layout = ParameterLayout.from_arrays(grad, dtype=np.float64)
+                if per_example_gradients is None or len(per_example_gradients) < len(train_data_group):
+                    per_example_gradients = np.empty((len(train_data_group), gradient_layout.size))
+                gradient_layout.flatten(grad, out=per_example_gradients[i])
+            total_grad = clip_and_sum_gradients(per_example_gradients[:len(train_data_group)], gradient_norm_bound)
+        total_grad += rng.normal(loc=0., scale=sigma*gradient_norm_bound, size=total_grad.shape)
+        total_grad /= lot_size
+
+        new_weights = weights_layout.flatten(weights) - learning_rate_function(step+1) * total_grad
+        if np.isscalar(weights):
+            update_weights_function(float(new_weights[0]))
+        elif isinstance(weights, ndarray) and weights.dtype != object:
+            update_weights_function(new_weights.reshape(weights.shape))
+        else:
+            update_weights_function(weights_layout.unflatten(new_weights))
 
         if test_function and test_interval and (step+1) % test_interval == 0:
             test_function()
 
-    moment_privacy_budget_tracker.update_privacy_loss(sampling_ratio=group_size/len(train_data),
+    moment_privacy_budget_tracker.update_privacy_loss(sampling_ratio=sampling_ratio,
                                                       sigma=sigma,
                                                       steps=number_of_steps,
                                                       moment_order=32,
@@ -1,15 +1,17 @@
-from typing import Any, Callable, Dict, NamedTuple, Union
+from typing import Any, Callable, Dict, NamedTuple, Optional, Union
 
 import numpy as np
 from numpy import ndarray
-from numpy.random import choice, laplace, normal
+from numpy.random import Generator
 
 from privacy_budget import PrivacyBudget
 from privacy_budget_tracker import SimplePrivacyBudgetTracker
+from random_generator import get_default_rng
 from utils import check_positive
 
 
-def laplace_mechanism(x: Union[int, float, ndarray], sensitivity: float, privacy_budget: PrivacyBudget) -> Union[float, ndarray]:
+def laplace_mechanism(x: Union[int, float, ndarray], sensitivity: float, privacy_budget: PrivacyBudget,
+                      rng: Optional[Generator] = None) -> Union[float, ndarray]:
     """Differentially private Laplace mechanism. Add Laplacian noise to the value:
 
     .. math::
@@ -20,17 +22,20 @@ def laplace_mechanism(x: Union[int, float, ndarray], sensitivity: float, privacy
     :param x: Sensitive input data
     :param sensitivity: The global L1-sensitivity :math:`\Delta f` of `x`
     :param privacy_budget: The privacy budget :math:`(\epsilon,0)` used for the outputs
+    :param rng: Random number generator, defaults to None (the default generator of the calling thread)
     :return: Input data protected by noise
     """
     check_positive(privacy_budget.epsilon)
     check_positive(sensitivity)
 
     shape = None if isinstance(x, (int, float)) else x.shape
-    noise = laplace(loc=0., scale=sensitivity / privacy_budget.epsilon, size=shape)
+    rng = get_default_rng() if rng is None else rng
+    noise = rng.laplace(loc=0., scale=sensitivity / privacy_budget.epsilon, size=shape)
     return x + noise
 
 
-def gaussian_mechanism(x: Union[int, float, ndarray], sensitivity: float, privacy_budget: PrivacyBudget) -> Union[float, ndarray]:
+def gaussian_mechanism(x: Union[int, float, ndarray], sensitivity: float, privacy_budget: PrivacyBudget,
+                       rng: Optional[Generator] = None) -> Union[float, ndarray]:
     """Differentially private Gaussian mechanism. Add Gaussian noise to the value:
 
     .. math::
@@ -41,6 +46,7 @@ def gaussian_mechanism(x: Union[int, float, ndarray], sensitivity: float, privac
     :param x: Sensitive input data
     :param sensitivity: The global L2-sensitivity :math:`\Delta f` of `x`
     :param privacy_budget: The privacy budget :math:`(\epsilon,\delta)` used for the outputs
+    :param rng: Random number generator, defaults to None (the default generator of the calling thread)
     :return: Input data protected by noise
     """
     check_positive(privacy_budget.epsilon)
@@ -49,13 +55,14 @@ def gaussian_mechanism(x: Union[int, float, ndarray], sensitivity: float, privac
     assert(privacy_budget.epsilon < 1)
 
     shape = None if isinstance(x, (int, float)) else x.shape
-    noise = normal(loc=0.,
-                   scale=np.sqrt(2 * np.log(1.25/privacy_budget.delta)) * sensitivity / privacy_budget.epsilon,
-                   size=shape)
+    rng = get_default_rng() if rng is None else rng
+    noise = rng.normal(loc=0.,
+                       scale=np.sqrt(2 * np.log(1.25/privacy_budget.delta)) * sensitivity / privacy_budget.epsilon,
+                       size=shape)
     return x + noise
 
 
-def histogram_mechanism(x: ndarray, privacy_budget: PrivacyBudget) -> ndarray:
+def histogram_mechanism(x: ndarray, privacy_budget: PrivacyBudget, rng: Optional[Generator] = None) -> ndarray:
     """Differentially private histogram mechanism. Add Laplacian noise to the value:
 
     .. math::
@@ -66,12 +73,15 @@ def histogram_mechanism(x: ndarray, privacy_budget: PrivacyBudget) -> ndarray:
     :param x: Sensitive input data
     :param sensitivity: The global L1-sensitivity :math:`\Delta f` of `x`
     :param privacy_budget: The privacy budget :math:`(\epsilon,0)` used for the outputs
+    :param rng: Random number generator, defaults to None (the default generator of the calling thread)
     :return: Input data protected by noise
     """
-    return laplace_mechanism(x=x, sensitivity=2, privacy_budget=privacy_budget)
+    return laplace_mechanism(x=x, sensitivity=2, privacy_budget=privacy_budget, rng=rng)
 
 
-def exponential_mechanism(x: ndarray, score_function: Callable[[ndarray], ndarray], sensitivity: float, privacy_budget: PrivacyBudget) -> Any:
+def exponential_mechanism(x: ndarray, score_function: Callable[[ndarray], ndarray], sensitivity: float,
+                          privacy_budget: PrivacyBudget, size: Optional[int] = None,
+                          rng: Optional[Generator] = None) -> Any:
     """Differentially private exponantial mechanism. Each keys sampling by probability proportional to:
 
     .. math::
@@ -79,17 +89,23 @@ def exponential_mechanism(x: ndarray, score_function: Callable[[ndarray], ndarra
 
     The result guarantees :math:`(\epsilon,\delta)`-differential privacy.
 
+    The sampling uses the Gumbel-max trick in log space: the key with the largest
+    :math:`\\frac{\epsilon \\times score}{2 \Delta f} + Gumbel(0, 1)` is selected,
+    which never exponentiates the scores and draws all selections with one vectorized call.
+
     :param x: Sensitive input data
-    :param score_function: a function to receive `x` and return a dictionary with items {`element`: `score`}
+    :param score_function: a function to receive `x` and return a tuple of (`elements`, `scores`)
     :param sensitivity: The global L1-sensitivity :math:`\Delta f` of `x`
-    :param privacy_budget: The privacy budget :math:`(\epsilon,0)` used for the outputs
-    :return: The sampled element
+    :param privacy_budget: The privacy budget :math:`(\epsilon,0)` used for each selection
+    :param size: Number of independent selections, defaults to None (a single selection)
+    :param rng: Random number generator, defaults to None (the default generator of the calling thread)
+    :return: The sampled element, or an array of `size` sampled elements
     """
     check_positive(privacy_budget.epsilon)
     check_positive(sensitivity)
 
     R, s = score_function(x)
-    s -= np.max(s)
-    probability = [np.exp(privacy_budget.epsilon*score/(2*sensitivity)) for score in s]
-    probability /= np.sum(probability)
-    return choice(R, p=probability)
+    log_probability = privacy_budget.epsilon * np.asarray(s, dtype=float) / (2*sensitivity)
+    shape = (len(log_probability), ) if size is None else (size, len(log_probability))
+    rng = get_default_rng() if rng is None else rng
+    return np.asarray(R)[np.argmax(log_probability + rng.gumbel(size=shape), axis=-1)]
@@ -1,18 +1,28 @@
-from typing import Dict, List, Union
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
 from numpy import ndarray
+from numpy.random import Generator
 from pandas import DataFrame
 
+from column_statistics import ColumnStatistics
 from data_domain import CategoricalDataDomain, DataDomain, RealDataDomain
-from privacy_budget import PrivacyBudget
+from privacy_budget import PrivacyBudget, combine_privacy_losses
 from privacy_budget_tracker import SimplePrivacyBudgetTracker
 from private_mechanisms import (exponential_mechanism, gaussian_mechanism,
                                 histogram_mechanism, laplace_mechanism)
+from random_generator import get_default_rng
 from utils import check_positive
 
 
+def _to_python(value: Any) -> Any:
+    """Convert a numpy scalar, e.g. a value of a data domain created from a numpy array, to a Python scalar."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
 class PrivateTable:
     """Private Table class which uses pandas dataframe as the backend.
 
@@ -30,18 +40,37 @@ class PrivateTable:
     - histogram
     """
 
-    def __init__(self, dataframe: DataFrame, data_domains: Dict[str, DataDomain], total_privacy_budget: PrivacyBudget, delta_prime=0.5):
+    def __init__(self, dataframe: DataFrame, data_domains: Dict[str, DataDomain], total_privacy_budget: PrivacyBudget, delta_prime=0.5,
+                 rng: Optional[Generator] = None, validate: bool = True):
         """
         :param dataframe: The data source 
         :param data_domains: Specify the set of all posible value for each data column. It is a map from `column_name` to a `data_domain`.
         :param total_privacy_budget: The total privacy budget that can be consumed by the private table. When is there is no privacy budget left, stop answering queries.
+        :param rng: Random number generator used by the mechanisms, defaults to None (the default generator of the calling thread)
+        :param validate: Check the data source against the data domains and encode its categorical columns, only
+            disable it for data already checked and encoded, e.g. by :func:`load`, defaults to True
         """
         super().__init__()
+        self._init_state(dataframe, data_domains, set(dataframe.columns.values.tolist()), total_privacy_budget, rng)
+        if validate:
+            self._dataframe = self._check_and_encode(dataframe)
+
+    def _init_state(self, dataframe: Optional[DataFrame], data_domains: Dict[str, DataDomain], columns: Set[str],
+                    total_privacy_budget: PrivacyBudget, rng: Optional[Generator]):
+        """Set the state shared by the private tables, whatever their backend.
+
+        :param dataframe: The data source, None for backends which do not keep it in memory
+        :param data_domains: The data domains of the columns
+        :param columns: The names of the columns
+        :param total_privacy_budget: The total privacy budget that can be consumed by the private table.
+        :param rng: Random number generator used by the mechanisms
+        """
+        self._rng = rng
         self._dataframe = dataframe
         self._data_domains = data_domains
-        self._columns = set(dataframe.columns.values.tolist())
+        self._columns = columns
         self.privacy_budget_tracker = SimplePrivacyBudgetTracker(total_privacy_budget)
-        assert self.check_data_domains(data_domains) == True
+        self._statistics = {}  # type: Dict[str, ColumnStatistics]
 
     def __repr__(self):
         return (f'PrivateTable (\n'
@@ -50,16 +79,154 @@ class PrivateTable:
                 f'  Privacy budget : {self.privacy_budget_tracker.total_privacy_budget},\n'
                 f'  Privacy loss   : {self.privacy_budget_tracker.consumed_privacy_budget}\n)')
 
+    def replace_dataframe(self, dataframe: DataFrame):
+        """Replace the data source. The new data is checked against the data domains and the cached
+        column statistics are invalidated.
+
+        :param dataframe: The new data source
+        """
+        assert set(dataframe.columns.values.tolist()) == self._columns, 'Columns of the new dataframe do not match.'
+        self._dataframe = self._check_and_encode(dataframe)
+        self._statistics = {}
+
+    def _check_and_encode(self, dataframe: DataFrame) -> DataFrame:
+        """Check the data source against the data domains and store the categorical columns as compact integer codes,
+        following the order of their data domain. The values of a categorical column are looked up once, values out
+        of its domain are those with the code -1.
+
+        :param dataframe: The data source, not modified
+        :return: The data source with categorical columns of `category` dtype
+        """
+        encoded, violations = {}, {}  # type: Dict[str, pd.Series], Dict[str, int]
+        for col in self._columns:
+            domain = self._data_domains[col]
+            if isinstance(domain, CategoricalDataDomain):
+                codes = domain.encode(dataframe[col])
+                num_invalid = int(np.count_nonzero(codes < 0))
+                if num_invalid == 0:
+                    encoded[col] = pd.Series(domain.decode(codes), index=dataframe.index)
+            else:
+                num_invalid = len(dataframe) - int(np.count_nonzero(domain.contains_all(dataframe[col])))
+            if num_invalid > 0:
+                violations[col] = num_invalid
+        assert not violations, f'Data out of domain (column: number of rows): {violations}'
+        return dataframe.assign(**encoded)
+
+    def save(self, directory: str):
+        """Persist the private table in a columnar format: one `.npy` file per column and a `manifest.json` with the
+        data domains. Categorical columns are stored as integer codes following the order of their data domain.
+        The privacy budget is not persisted. The manifest is validated before any file is written and replaced
+        atomically after the columns, so a failed save never leaves a manifest pointing to missing columns.
+
+        :param directory: Directory to save the files, created if not exists
+        """
+        columns, manifest = [], {'size': len(self._dataframe), 'columns': []}  # type: List[ndarray], Dict[str, Any]
+        for i, col in enumerate(sorted(self._columns)):
+            domain = self._data_domains[col]
+            if isinstance(domain, CategoricalDataDomain):
+                values = domain.encode(self._dataframe[col])
+                domain_spec = {'type': 'categorical', 'values': [_to_python(value) for value in domain.values]}
+            elif isinstance(domain, RealDataDomain):
+                values = self._dataframe[col].to_numpy()
+                if values.dtype == object:
+                    raise TypeError(f'Column `{col}` of object dtype cannot be saved, convert it to a numerical dtype.')
+                domain_spec = {'type': 'real', 'lower_bound': _to_python(domain.lower_bound),
+                               'upper_bound': _to_python(domain.upper_bound)}
+            else:
+                raise TypeError(f'Data domain of column `{col}` cannot be saved.')
+            columns.append(values)
+            manifest['columns'].append({'name': col, 'file': f'{i}.npy', 'domain': domain_spec})
+        try:
+            manifest_json = json.dumps(manifest, indent=2)
+        except TypeError as e:
+            raise TypeError(f'Data domains cannot be saved: {e}') from e
+
+        os.makedirs(directory, exist_ok=True)
+        for values, column in zip(columns, manifest['columns']):
+            np.save(os.path.join(directory, column['file']), values, allow_pickle=False)
+        manifest_path = os.path.join(directory, 'manifest.json')
+        with open(manifest_path + '.tmp', 'w') as f:
+            f.write(manifest_json)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    @classmethod
+    def load(cls, directory: str, total_privacy_budget: PrivacyBudget, mmap_mode: Optional[str] = 'r',
+             rng: Optional[Generator] = None) -> 'PrivateTable':
+        """Open a private table saved by :func:`save`. The columns are memory-mapped, so processes opening the same
+        directory share one physical copy of the data. The data is not parsed nor checked against the data domains
+        again, since it was checked before being saved.
+
+        :param directory: Directory of the saved private table
+        :param total_privacy_budget: The total privacy budget that can be consumed by the private table.
+        :param mmap_mode: Memory-map mode passed to `numpy.load`, None to read the columns into memory, defaults to 'r'
+        :param rng: Random number generator used by the mechanisms, defaults to None
+        :return: The private table
+        """
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        data, data_domains = {}, {}  # type: Dict[str, pd.Series], Dict[str, DataDomain]
+        for column in manifest['columns']:
+            values = np.load(os.path.join(directory, column['file']), mmap_mode=mmap_mode, allow_pickle=False)
+            assert len(values) == manifest['size'], f'Column `{column["name"]}` is corrupted.'
+            spec = column['domain']
+            if spec['type'] == 'categorical':
+                domain = CategoricalDataDomain(spec['values'])  # type: DataDomain
+                data[column['name']] = pd.Series(domain.decode(values), copy=False)
+            else:
+                domain = RealDataDomain(spec['lower_bound'], spec['upper_bound'])
+                data[column['name']] = pd.Series(values, copy=False)
+            data_domains[column['name']] = domain
+
+        return cls(pd.DataFrame(data, copy=False), data_domains, total_privacy_budget, rng=rng, validate=False)
+
+    def _random_generator(self) -> Generator:
+        return get_default_rng() if self._rng is None else self._rng
+
+    def _column_statistics(self, column: str) -> ColumnStatistics:
+        """Return the cached sufficient statistics of a column, created at the first access.
+
+        :param column: Name of the selected column
+        :return: Statistics of the selected column
+        """
+        if column not in self._statistics:
+            series = self._dataframe[column]
+            values = series.array if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+            self._statistics[column] = ColumnStatistics(values)
+        return self._statistics[column]
+
+    def _numerical_histogram(self, column: str, bins: Union[ndarray, List[float]]) -> ndarray:
+        """Compute the exact histogram of a numerical column.
+
+        :param column: Name of the selected column
+        :param bins: Bins of histogram
+        :return: Number of rows in each bin
+        """
+        hist, binedge = np.histogram(self._dataframe[column], bins=bins)
+        return hist
+
     def check_data_domains(self, domains: Dict[str, DataDomain]) -> bool:
         """Check if data in private columns are belong to the data domain `domains`.
 
         :param domains: Data domain specifications
         :return: `True` if data in the private table belonging to the `domains`, `False` otherwise
         """
+        return not self.find_domain_violations(domains)
+
+    def find_domain_violations(self, domains: Dict[str, DataDomain]) -> Dict[str, int]:
+        """Count the rows of each private column that do not belong to the data domain `domains`.
+
+        The check is vectorized over each column, see :func:`DataDomain.contains_all <data_domain.DataDomain.contains_all>`.
+
+        :param domains: Data domain specifications
+        :return: A map from `column_name` to the number of rows out of domain, only columns with violations are included
+        """
+        violations = {}
         for col in self._columns:
-            if not np.all(self._dataframe[col].apply(domains[col].contains)):
-                return False
-        return True
+            num_invalid = len(self._dataframe) - int(np.count_nonzero(domains[col].contains_all(self._dataframe[col])))
+            if num_invalid > 0:
+                violations[col] = num_invalid
+        return violations
 
     def mean(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Return a private mean using Laplace mechanism.
@@ -75,13 +242,13 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        mean = np.mean(self._dataframe[column])
-        sensitivity = domain.length()/len(self._dataframe[column])
-        noisy_mean = laplace_mechanism(mean, sensitivity, privacy_budget)
-
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            statistics = self._column_statistics(column)
+            mean = statistics.mean
+            sensitivity = domain.length()/statistics.count
+            noisy_mean = laplace_mechanism(mean, sensitivity, privacy_budget, self._rng)
 
-        return noisy_mean
+            return noisy_mean
 
     def gaussian_mean(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Return a private mean using Gaussian mechanism.
@@ -96,13 +263,13 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        mean = np.mean(self._dataframe[column])
-        sensitivity = domain.length()/len(self._dataframe[column])
-        noisy_mean = gaussian_mechanism(mean, sensitivity, privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            statistics = self._column_statistics(column)
+            mean = statistics.mean
+            sensitivity = domain.length()/statistics.count
+            noisy_mean = gaussian_mechanism(mean, sensitivity, privacy_budget, self._rng)
 
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
-
-        return noisy_mean
+            return noisy_mean
 
     def std(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Compute the standard deviation.
@@ -117,13 +284,13 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        std = np.std(self._dataframe[column])
-        sensitivity = domain.length()/np.sqrt(len(self._dataframe[column]))
-        noisy_std = laplace_mechanism(std, sensitivity, privacy_budget)
-
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            statistics = self._column_statistics(column)
+            std = statistics.std
+            sensitivity = domain.length()/np.sqrt(statistics.count)
+            noisy_std = laplace_mechanism(std, sensitivity, privacy_budget, self._rng)
 
-        return noisy_std
+            return noisy_std
 
     def var(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Compute the variance.
@@ -138,13 +305,13 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        var = np.var(self._dataframe[column])
-        sensitivity = domain.length()**2/len(self._dataframe[column])  # (H-L)^2/N
-        noisy_var = laplace_mechanism(var, sensitivity, privacy_budget)
-
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            statistics = self._column_statistics(column)
+            var = statistics.var
+            sensitivity = domain.length()**2/statistics.count  # (H-L)^2/N
+            noisy_var = laplace_mechanism(var, sensitivity, privacy_budget, self._rng)
 
-        return noisy_var
+            return noisy_var
 
     def min(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Compute the minimum.
@@ -159,13 +326,12 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        minn = np.min(self._dataframe[column])
-        sensitivity = domain.length()
-        noisy_min = laplace_mechanism(minn, sensitivity, privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            minn = self._column_statistics(column).min
+            sensitivity = domain.length()
+            noisy_min = laplace_mechanism(minn, sensitivity, privacy_budget, self._rng)
 
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
-
-        return noisy_min
+            return noisy_min
 
     def max(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Compute the maximum.
@@ -180,13 +346,12 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        maxx = np.max(self._dataframe[column])
-        sensitivity = domain.length()
-        noisy_max = laplace_mechanism(maxx, sensitivity, privacy_budget)
-
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            maxx = self._column_statistics(column).max
+            sensitivity = domain.length()
+            noisy_max = laplace_mechanism(maxx, sensitivity, privacy_budget, self._rng)
 
-        return noisy_max
+            return noisy_max
 
     def median(self, column: str, privacy_budget: PrivacyBudget) -> float:
         """Compute the median.
@@ -201,13 +366,12 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        median = np.median(self._dataframe[column])
-        sensitivity = domain.length()/2
-        noisy_median = laplace_mechanism(median, sensitivity, privacy_budget)
-
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            median = self._column_statistics(column).median
+            sensitivity = domain.length()/2
+            noisy_median = laplace_mechanism(median, sensitivity, privacy_budget, self._rng)
 
-        return noisy_median
+            return noisy_median
 
     def mode(self, column: str, privacy_budget: PrivacyBudget) -> int:
         """Compute the mode.
@@ -222,20 +386,21 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, CategoricalDataDomain)
 
-        def score_function(x):
-            R = np.unique(x)
-            s = [np.sum(x == label) for label in R]
-            return R, s
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            statistics = self._column_statistics(column)
 
-        sensitivity = 1
-        noisy_mode = exponential_mechanism(self._dataframe[column], score_function, sensitivity, privacy_budget)
+            def score_function(x):
+                return statistics.category_counts
 
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+            sensitivity = 1
+            noisy_mode = exponential_mechanism(statistics.category_counts[0], score_function, sensitivity,
+                                               privacy_budget, rng=self._rng)
 
-        return noisy_mode
+            return noisy_mode
 
     def cat_hist(self, column: str, privacy_budget: PrivacyBudget) -> ndarray:
-        """Compute the histogram for a categorical column.
+        """Compute the histogram for a categorical column. The bins follow the order of the values of the data domain,
+        including values that do not occur in the column.
 
         :param column: Name of the selected column
         :param privacy_budget: Privacy budget to be used
@@ -247,11 +412,11 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, CategoricalDataDomain)
 
-        key, hist = np.unique(self._dataframe[column], return_counts=True)
-        noisy_hist = histogram_mechanism(hist, privacy_budget)
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            key, hist = self._column_statistics(column).category_counts
+            noisy_hist = histogram_mechanism(hist, privacy_budget, self._rng)
 
-        return noisy_hist
+            return noisy_hist
 
     def num_hist(self, column: str, bins: Union[ndarray, List[float]], privacy_budget: PrivacyBudget) -> ndarray:
         """Compute the histogram for a categorical column.
@@ -267,9 +432,212 @@ class PrivateTable:
         domain = self._data_domains[column]
         assert isinstance(domain, RealDataDomain)
 
-        hist, binedge = np.histogram(self._dataframe[column], bins=bins)
-        noisy_hist = histogram_mechanism(hist, privacy_budget)
+        with self.privacy_budget_tracker.reserve(privacy_budget):
+            hist = self._numerical_histogram(column, bins)
+            noisy_hist = histogram_mechanism(hist, privacy_budget, self._rng)
+
+            return noisy_hist
+
+    def query_batch(self, queries: List[Tuple[str, str, PrivacyBudget]]) -> List[float]:
+        """Answer a batch of statistical queries at once.
+
+        The exact answers are computed from the cached column statistics, the noise of all queries is drawn with
+        a single vectorized call per mechanism and the privacy budget of the whole batch is consumed in one update.
+        If the remaining privacy budget cannot cover the whole batch, no query is answered.
+
+        Supported functions: `mean`, `gaussian_mean`, `std`, `var`, `min`, `max` and `median`.
+
+        :param queries: List of (`function`, `column`, `privacy_budget`)
+        :return: Private answers in the same order as `queries`
+        """
+        assert len(queries) > 0, 'expecting at least one query.'
+        for function, column, privacy_budget in queries:
+            assert function in self._BATCH_QUERIES, f'Function `{function}` is not supported in a batch.'
+            assert column in self._columns, f'Column `{column}`is not exists.'
+            assert column in self._data_domains
+            assert isinstance(self._data_domains[column], RealDataDomain)
+            check_positive(privacy_budget.epsilon)
+            if function == 'gaussian_mean':
+                check_positive(privacy_budget.delta)
+                assert(privacy_budget.epsilon < 1)
+            elif function == 'mean':
+                assert(privacy_budget.delta == 0)
+
+        batch_privacy_budget = combine_privacy_losses([privacy_budget for _, _, privacy_budget in queries])
+        with self.privacy_budget_tracker.reserve(batch_privacy_budget):
+            answers = np.zeros(len(queries))
+            scales = np.zeros(len(queries))
+            for i, (function, column, privacy_budget) in enumerate(queries):
+                statistics = self._column_statistics(column)
+                answers[i], sensitivity = self._BATCH_QUERIES[function](statistics, self._data_domains[column])
+                check_positive(sensitivity)
+                if function == 'gaussian_mean':
+                    scales[i] = np.sqrt(2 * np.log(1.25/privacy_budget.delta)) * sensitivity / privacy_budget.epsilon
+                else:
+                    scales[i] = sensitivity / privacy_budget.epsilon
+
+            is_gaussian = np.array([function == 'gaussian_mean' for function, _, _ in queries])
+            rng = self._random_generator()
+            answers[~is_gaussian] += rng.laplace(loc=0., scale=scales[~is_gaussian])
+            answers[is_gaussian] += rng.normal(loc=0., scale=scales[is_gaussian])
+
+            return answers.tolist()
+
+    def group_by(self, column: str) -> 'GroupedPrivateTable':
+        """Group the private table by a categorical column, see :class:`GroupedPrivateTable`.
+
+        :param column: Name of the categorical column used to split the table into groups
+        :return: The grouped private table
+        """
+        assert column in self._columns, f'Column `{column}`is not exists.'
+        assert column in self._data_domains
+        assert isinstance(self._data_domains[column], CategoricalDataDomain)
+
+        return GroupedPrivateTable(self, column)
+
+    def _grouped_aggregates(self, by: str, column: Optional[str] = None) -> DataFrame:
+        """Compute the exact number of rows and sum of `column` of each group in one `groupby` pass.
+
+        :param by: Name of the categorical column defining the groups
+        :param column: Name of the numerical column to be summed, defaults to None (only count the rows)
+        :return: A dataframe with columns `count` and `sum` (if `column` is given), indexed by all values in the
+            domain of `by`
+        """
+        groups = self._data_domains[by].values
+        if column is None:
+            aggregates = self._dataframe.groupby(by, sort=False).size().to_frame('count')
+        else:
+            aggregates = self._dataframe.groupby(by, sort=False)[column].agg(['count', 'sum'])
+        return aggregates.reindex(groups, fill_value=0)
+
+    def _grouped_cat_hist(self, by: str, column: str) -> DataFrame:
+        """Compute the exact histogram of the categorical `column` of each group in one `groupby` pass.
+
+        :param by: Name of the categorical column defining the groups
+        :param column: Name of the categorical column to be counted
+        :return: A dataframe of counts, indexed by all values in the domain of `by` with one column for each value
+            in the domain of `column`
+        """
+        hist = self._dataframe.groupby([by, column], sort=False).size().unstack(fill_value=0)
+        return hist.reindex(index=self._data_domains[by].values, columns=self._data_domains[column].values,
+                            fill_value=0)
+
+    # Map from function name to a function computing (exact answer, sensitivity) from column statistics and domain
+    _BATCH_QUERIES = {
+        'mean': lambda s, d: (s.mean, d.length()/s.count),
+        'gaussian_mean': lambda s, d: (s.mean, d.length()/s.count),
+        'std': lambda s, d: (s.std, d.length()/np.sqrt(s.count)),
+        'var': lambda s, d: (s.var, d.length()**2/s.count),
+        'min': lambda s, d: (s.min, d.length()),
+        'max': lambda s, d: (s.max, d.length()),
+        'median': lambda s, d: (s.median, d.length()/2),
+    }  # type: Dict[str, Callable[[ColumnStatistics, RealDataDomain], Tuple[float, float]]]
+
+
+class GroupedPrivateTable:
+    """Private aggregates over the disjoint groups of a private table, split by the values of a categorical column.
+
+    Every group in the data domain is released, including empty groups. Since a row belongs to exactly one group,
+    a grouped query consumes its privacy budget only once (parallel composition).
+
+    Supported statistical functions:
+
+    - count
+    - sum
+    - mean
+    - categorical histogram
+    """
+
+    def __init__(self, private_table: PrivateTable, column: str):
+        """
+        :param private_table: The private table to be grouped
+        :param column: Name of the categorical column used to split the table into groups
+        """
+        self._private_table = private_table
+        self._column = column
+
+    def __repr__(self):
+        return f'GroupedPrivateTable (by: {self._column})'
+
+    def _real_domain(self, column: str) -> RealDataDomain:
+        assert column in self._private_table._columns, f'Column `{column}`is not exists.'
+        assert column in self._private_table._data_domains
+        domain = self._private_table._data_domains[column]
+        assert isinstance(domain, RealDataDomain)
+        return domain
+
+    def count(self, privacy_budget: PrivacyBudget) -> pd.Series:
+        """Compute the number of rows of each group.
+
+        :param privacy_budget: Privacy budget to be used
+        :return: Private number of rows, indexed by group
+        """
+        assert(privacy_budget.delta == 0)
+
+        with self._private_table.privacy_budget_tracker.reserve(privacy_budget):
+            count = self._private_table._grouped_aggregates(self._column)['count']
+            noisy_count = histogram_mechanism(count.to_numpy(dtype=float), privacy_budget, self._private_table._rng)
+
+            return pd.Series(noisy_count, index=count.index)
+
+    def sum(self, column: str, privacy_budget: PrivacyBudget) -> pd.Series:
+        """Compute the sum of a numerical column for each group.
+
+        :param column: Name of the selected column
+        :param privacy_budget: Privacy budget to be used
+        :return: Private sum of the selected column, indexed by group
+        """
+        assert(privacy_budget.delta == 0)
+        domain = self._real_domain(column)
+
+        with self._private_table.privacy_budget_tracker.reserve(privacy_budget):
+            total = self._private_table._grouped_aggregates(self._column, column)['sum']
+            sensitivity = 2*max(abs(domain.lower_bound), abs(domain.upper_bound))  # a row may move to another group
+            noisy_total = laplace_mechanism(total.to_numpy(dtype=float), sensitivity, privacy_budget,
+                                            self._private_table._rng)
+
+            return pd.Series(noisy_total, index=total.index)
+
+    def mean(self, column: str, privacy_budget: PrivacyBudget) -> pd.Series:
+        """Compute the mean of a numerical column for each group as the ratio of a private sum and a private count,
+        each using half of the privacy budget. The noise of both is drawn in one vectorized call.
+
+        :param column: Name of the selected column
+        :param privacy_budget: Privacy budget to be used
+        :return: Private mean of the selected column, indexed by group, clipped to the data domain
+        """
+        assert(privacy_budget.delta == 0)
+        check_positive(privacy_budget.epsilon)
+        domain = self._real_domain(column)
+
+        with self._private_table.privacy_budget_tracker.reserve(privacy_budget):
+            aggregates = self._private_table._grouped_aggregates(self._column, column)
+            num_groups = len(aggregates)
+            exact = np.concatenate([aggregates['count'].to_numpy(dtype=float), aggregates['sum'].to_numpy(dtype=float)])
+            sensitivity = np.repeat([2., 2*max(abs(domain.lower_bound), abs(domain.upper_bound))], num_groups)
+            check_positive(sensitivity[-1])
+            rng = self._private_table._random_generator()
+            noisy = exact + rng.laplace(loc=0., scale=sensitivity / (privacy_budget.epsilon/2))
+
+            noisy_mean = noisy[num_groups:] / np.maximum(noisy[:num_groups], 1.)
+            noisy_mean = np.clip(noisy_mean, domain.lower_bound, domain.upper_bound)
+
+            return pd.Series(noisy_mean, index=aggregates.index)
+
+    def cat_hist(self, column: str, privacy_budget: PrivacyBudget) -> DataFrame:
+        """Compute the histogram of a categorical column for each group.
+
+        :param column: Name of the selected column
+        :param privacy_budget: Privacy budget to be used
+        :return: Private histograms, one row for each group and one column for each category
+        """
+        assert(privacy_budget.delta == 0)
+        assert column in self._private_table._columns, f'Column `{column}`is not exists.'
+        assert column in self._private_table._data_domains
+        assert isinstance(self._private_table._data_domains[column], CategoricalDataDomain)
 
-        self.privacy_budget_tracker.update_privacy_loss(privacy_budget)
+        with self._private_table.privacy_budget_tracker.reserve(privacy_budget):
+            hist = self._private_table._grouped_cat_hist(self._column, column)
+            noisy_hist = histogram_mechanism(hist.to_numpy(dtype=float), privacy_budget, self._private_table._rng)
 
-        return noisy_hist
+            return pd.DataFrame(noisy_hist, index=hist.index, columns=hist.columns)
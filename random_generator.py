@@ -0,0 +1,84 @@
+"""
+Random number generators used by the differentially private mechanisms.
+
+All mechanisms draw their noise from a `numpy.random.Generator`. It can be passed explicitly (e.g. one generator per
+thread created by :func:`spawn_rngs`), otherwise the default generator of the calling thread is used. The default
+generators of different threads are independent streams spawned from one root `numpy.random.SeedSequence`,
+so concurrent queries do not contend on a global random state, and :func:`seed_default_rng` makes them reproducible.
+"""
+
+import secrets
+import threading
+from typing import List, Optional, Union
+
+from numpy.random import PCG64, SFC64, Generator, Philox, SeedSequence
+
+BIT_GENERATORS = {'PCG64': PCG64, 'Philox': Philox, 'SFC64': SFC64}
+
+
+def create_rng(seed: Union[None, int, SeedSequence] = None, bit_generator: str = 'PCG64', secure: bool = False) -> Generator:
+    """Create a random number generator.
+
+    :param seed: Seed of the generator, defaults to None (fresh entropy from the operating system)
+    :param bit_generator: Name of the bit generator, one of `PCG64`, `Philox` or `SFC64`, defaults to `PCG64`
+    :param secure: Use the cryptographically secure ChaCha20 bit generator of the `randomgen` package seeded from the
+        operating system instead, defaults to False
+    :return: The random number generator
+    """
+    if secure:
+        assert seed is None, 'a cryptographically secure generator cannot be seeded.'
+        from randomgen import ChaCha
+        return Generator(ChaCha(seed=secrets.randbits(256), rounds=20))
+
+    assert bit_generator in BIT_GENERATORS, f'Bit generator `{bit_generator}` is not supported.'
+    return Generator(BIT_GENERATORS[bit_generator](seed))
+
+
+def spawn_rngs(number: int, seed: Union[None, int, SeedSequence] = None, bit_generator: str = 'PCG64') -> List[Generator]:
+    """Create independent random number generators, e.g. one for each thread, using `SeedSequence.spawn`.
+
+    :param number: Number of generators
+    :param seed: Seed of the root `SeedSequence`, defaults to None (fresh entropy from the operating system)
+    :param bit_generator: Name of the bit generator, one of `PCG64`, `Philox` or `SFC64`, defaults to `PCG64`
+    :return: List of random number generators
+    """
+    root = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+    return [create_rng(child, bit_generator) for child in root.spawn(number)]
+
+
+class _DefaultRNGState(threading.local):
+    rng = None  # type: Optional[Generator]
+    generation = -1
+
+
+_lock = threading.Lock()
+_root_seed_sequence = SeedSequence()
+_bit_generator = 'PCG64'
+_generation = 0
+_thread_state = _DefaultRNGState()
+
+
+def seed_default_rng(seed: Union[None, int, SeedSequence] = None, bit_generator: str = 'PCG64'):
+    """Reset the default random number generators of all threads.
+
+    :param seed: Seed of the root `SeedSequence`, defaults to None (fresh entropy from the operating system)
+    :param bit_generator: Name of the bit generator, one of `PCG64`, `Philox` or `SFC64`, defaults to `PCG64`
+    """
+    global _root_seed_sequence, _bit_generator, _generation
+    assert bit_generator in BIT_GENERATORS, f'Bit generator `{bit_generator}` is not supported.'
+    with _lock:
+        _root_seed_sequence = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+        _bit_generator = bit_generator
+        _generation += 1
+
+
+def get_default_rng() -> Generator:
+    """Return the default random number generator of the calling thread, spawned at its first use.
+
+    :return: The random number generator
+    """
+    if _thread_state.generation != _generation:
+        with _lock:
+            _thread_state.rng = create_rng(_root_seed_sequence.spawn(1)[0], _bit_generator)
+            _thread_state.generation = _generation
+    return _thread_state.rng
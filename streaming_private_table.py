@@ -0,0 +1,153 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from numpy import ndarray
+from numpy.random import Generator
+from pandas import DataFrame
+
+from column_statistics import StreamingColumnStatistics
+from data_domain import DataDomain
+from privacy_budget import PrivacyBudget
+from private_table import PrivateTable
+
+
+class StreamingPrivateTable(PrivateTable):
+    """Private Table class which reads the data source chunk by chunk instead of keeping it in memory.
+
+    The data domains are checked and the mergeable sufficient statistics of every column (count, sum, sum of squares,
+    min, max, histogram and category counts) are computed in a single pass at construction, so the memory usage is
+    bounded by the size of one chunk. The statistical functions have the same noise and privacy budget semantics
+    as :class:`PrivateTable <private_table.PrivateTable>`, except that the median is approximated from a histogram,
+    see :class:`StreamingColumnStatistics <column_statistics.StreamingColumnStatistics>`.
+
+    Numerical histograms with arbitrary bins and grouped aggregates need another pass over the data source,
+    which is only possible if the data source can be read again (a file path, a function returning the chunks or a
+    collection of chunks such as a list, but not an iterator).
+    """
+
+    def __init__(self, chunks: Union[Iterable[DataFrame], Callable[[], Iterable[DataFrame]]],
+                 data_domains: Dict[str, DataDomain], total_privacy_budget: PrivacyBudget, resolution: int = 1024,
+                 rng: Optional[Generator] = None):
+        """
+        :param chunks: The data source, either an iterable of dataframes or a function that returns a new iterable
+            of dataframes every time it is called. Only a one-shot iterator, e.g. a generator, cannot be read again.
+        :param data_domains: Specify the set of all posible value for each data column. It is a map from `column_name` to a `data_domain`.
+        :param total_privacy_budget: The total privacy budget that can be consumed by the private table. When is there is no privacy budget left, stop answering queries.
+        :param resolution: Number of histogram bins used to approximate the median of numerical columns, defaults to 1024
+        :param rng: Random number generator used by the mechanisms, defaults to None (the default generator of the calling thread)
+        """
+        self._init_state(None, data_domains, set(data_domains), total_privacy_budget, rng)
+        if callable(chunks):
+            self._chunks_fn = chunks  # type: Optional[Callable[[], Iterable[DataFrame]]]
+        elif not isinstance(chunks, Iterator):  # e.g. a list of dataframes, which can be iterated again
+            self._chunks_fn = lambda: chunks
+        else:
+            self._chunks_fn = None
+
+        self._statistics = {col: StreamingColumnStatistics(data_domains[col], resolution) for col in self._columns}
+        self._violations = {}  # type: Dict[str, int]
+        self._size = 0
+        for chunk in (chunks() if callable(chunks) else chunks):
+            assert set(chunk.columns.values.tolist()) == self._columns, 'Columns of the chunk do not match the data domains.'
+            self._size += len(chunk)
+            for col in self._columns:
+                valid = data_domains[col].contains_all(chunk[col])
+                num_invalid = len(chunk) - int(np.count_nonzero(valid))
+                if num_invalid > 0:
+                    self._violations[col] = self._violations.get(col, 0) + num_invalid
+                self._statistics[col].update(chunk[col])
+        assert not self._violations, f'Data out of domain (column: number of rows): {self._violations}'
+
+    @classmethod
+    def from_csv(cls, path: str, data_domains: Dict[str, DataDomain], total_privacy_budget: PrivacyBudget,
+                 chunksize: int = 100000, resolution: int = 1024, rng: Optional[Generator] = None,
+                 **kwargs) -> 'StreamingPrivateTable':
+        """Create a streaming private table from a CSV file.
+
+        :param path: Path of the CSV file
+        :param data_domains: Specify the set of all posible value for each data column.
+        :param total_privacy_budget: The total privacy budget that can be consumed by the private table.
+        :param chunksize: Number of rows in one chunk, defaults to 100000
+        :param resolution: Number of histogram bins used to approximate the median, defaults to 1024
+        :param rng: Random number generator used by the mechanisms, defaults to None (the default generator of the calling thread)
+        :param kwargs: Other arguments passed to `pandas.read_csv`, e.g. `names` or `usecols`
+        :return: The streaming private table
+        """
+        def chunks() -> Iterator[DataFrame]:
+            yield from pd.read_csv(path, chunksize=chunksize, **kwargs)
+
+        return cls(chunks, data_domains, total_privacy_budget, resolution, rng)
+
+    @classmethod
+    def from_parquet(cls, path: str, data_domains: Dict[str, DataDomain], total_privacy_budget: PrivacyBudget,
+                     batch_size: int = 100000, resolution: int = 1024,
+                     rng: Optional[Generator] = None) -> 'StreamingPrivateTable':
+        """Create a streaming private table from a Parquet file. Requires `pyarrow`.
+
+        :param path: Path of the Parquet file
+        :param data_domains: Specify the set of all posible value for each data column, only these columns are read.
+        :param total_privacy_budget: The total privacy budget that can be consumed by the private table.
+        :param batch_size: Maximum number of rows in one chunk, defaults to 100000
+        :param resolution: Number of histogram bins used to approximate the median, defaults to 1024
+        :param rng: Random number generator used by the mechanisms, defaults to None (the default generator of the calling thread)
+        :return: The streaming private table
+        """
+        import pyarrow.parquet as pq
+
+        def chunks() -> Iterator[DataFrame]:
+            parquet_file = pq.ParquetFile(path)
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=list(data_domains)):
+                yield batch.to_pandas()
+
+        return cls(chunks, data_domains, total_privacy_budget, resolution, rng)
+
+    def __repr__(self):
+        return (f'StreamingPrivateTable (\n'
+                f'  Columns        : {self._columns},\n'
+                f'  Size           : {self._size},\n'
+                f'  Privacy budget : {self.privacy_budget_tracker.total_privacy_budget},\n'
+                f'  Privacy loss   : {self.privacy_budget_tracker.consumed_privacy_budget}\n)')
+
+    def replace_dataframe(self, dataframe: DataFrame):
+        raise TypeError('replacing the data source is not supported in streaming mode, create another table.')
+
+    def save(self, directory: str):
+        raise TypeError('saving is not supported in streaming mode, save a private table of the data in memory.')
+
+    def find_domain_violations(self, domains: Dict[str, DataDomain]) -> Dict[str, int]:
+        assert domains is self._data_domains, 'the data source can only be checked against its own data domains.'
+        return dict(self._violations)
+
+    def _column_statistics(self, column: str) -> StreamingColumnStatistics:
+        return self._statistics[column]
+
+    def _chunks(self) -> Iterable[DataFrame]:
+        assert self._chunks_fn is not None, 'this query needs another pass over the data source, ' \
+                                            'which is not possible for a one-shot iterator of chunks.'
+        return self._chunks_fn()
+
+    def _numerical_histogram(self, column: str, bins: Union[ndarray, List[float]]) -> ndarray:
+        hist = np.zeros(len(bins) - 1, dtype=np.int64)
+        for chunk in self._chunks():
+            hist += np.histogram(chunk[column], bins=bins)[0]
+        return hist
+
+    def _grouped_aggregates(self, by: str, column: Optional[str] = None) -> DataFrame:
+        groups = self._data_domains[by].values
+        aggregates = pd.DataFrame(0, index=groups, columns=['count'] if column is None else ['count', 'sum'])
+        for chunk in self._chunks():
+            if column is None:
+                chunk_aggregates = chunk.groupby(by, sort=False).size().to_frame('count')
+            else:
+                chunk_aggregates = chunk.groupby(by, sort=False)[column].agg(['count', 'sum'])
+            aggregates += chunk_aggregates.reindex(groups, fill_value=0)
+        return aggregates
+
+    def _grouped_cat_hist(self, by: str, column: str) -> DataFrame:
+        groups, categories = self._data_domains[by].values, self._data_domains[column].values
+        hist = pd.DataFrame(0, index=groups, columns=categories)
+        for chunk in self._chunks():
+            chunk_hist = chunk.groupby([by, column], sort=False).size().unstack(fill_value=0)
+            hist += chunk_hist.reindex(index=groups, columns=categories, fill_value=0)
+        return hist
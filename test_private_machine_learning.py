@@ -4,9 +4,10 @@ import numpy as np
 import pandas as pd
 import pytest
 
+from lot_sampler import PoissonLotSampler
 from privacy_budget import PrivacyBudget
 from privacy_budget_tracker import MomentPrivacyBudgetTracker
-from private_machine_learning import private_SGD
+from private_machine_learning import clip_and_sum_gradients, private_SGD
 from utils import check_absolute_error
 
 
@@ -74,3 +75,121 @@ def test_private_SGD(data):
 
     check_absolute_error(moment_accountant.consumed_privacy_budget.epsilon, 8.805554, 1e-6)
     check_absolute_error(moment_accountant.consumed_privacy_budget.delta, 0.000625, 1e-6)
+
+
+def test_clip_and_sum_gradients():
+    """check the vectorized clipping against clipping each gradient."""
+    rng = np.random.default_rng(0)
+    gradients = rng.normal(scale=5., size=(50, 3, 2))
+    expected = sum(g / max(1, np.linalg.norm(g)/4.) for g in gradients)
+    assert np.allclose(clip_and_sum_gradients(gradients, 4.), expected)
+
+
+def test_private_SGD_batched(data):
+
+    train_data, test_data = data[:800], data[800:]
+    param = np.random.rand(2)  # y = param[0]*x+param[1]
+
+    def gradient_function(batch_data):
+        x, y = batch_data[:, 0], batch_data[:, 1]
+        y_pred = param[0]*x + param[1]
+        return np.stack([-2.0 * x * (y-y_pred), -2.0 * (y-y_pred)], axis=1)
+
+    def update_weights_function(new_weight):
+        param[:] = new_weight
+
+    def test_function():
+        x = np.array([i[0] for i in test_data])
+        y = np.array([i[1] for i in test_data])
+        loss = np.mean((param[0]*x + param[1] - y)**2)
+        check_absolute_error(loss, 0., 20.)
+
+    moment_accountant = MomentPrivacyBudgetTracker(PrivacyBudget(10, 0.001))
+
+    private_SGD(gradient_function=gradient_function,
+                get_weights_function=lambda: np.copy(param),
+                update_weights_function=update_weights_function,
+                learning_rate_function=lambda step: 0.1 if step < 10 else 0.01 if step < 50 else 0.005,
+                train_data=train_data,
+                group_size=100,
+                gradient_norm_bound=10,
+                number_of_steps=100,
+                sigma=1,
+                moment_privacy_budget_tracker=moment_accountant,
+                test_interval=100,
+                test_function=test_function,
+                rng=np.random.default_rng(1),
+                batched=True
+                )
+
+    check_absolute_error(moment_accountant.consumed_privacy_budget.epsilon, 8.805554, 1e-6)
+
+
+def test_private_SGD_poisson_sampling(data):
+    """check private SGD with lots drawn by Poisson sampling, accounted with their sampling ratio."""
+    train_data = data[:800]
+    param = np.random.rand(2)
+
+    def gradient_function(batch_data):
+        x, y = batch_data[:, 0], batch_data[:, 1]
+        y_pred = param[0]*x + param[1]
+        return np.stack([-2.0 * x * (y-y_pred), -2.0 * (y-y_pred)], axis=1)
+
+    def update_weights_function(new_weight):
+        param[:] = new_weight
+
+    moment_accountant = MomentPrivacyBudgetTracker(PrivacyBudget(10, 0.001))
+
+    private_SGD(gradient_function=gradient_function,
+                get_weights_function=lambda: np.copy(param),
+                update_weights_function=update_weights_function,
+                learning_rate_function=lambda step: 0.1 if step < 10 else 0.01 if step < 50 else 0.005,
+                train_data=np.array(train_data),
+                group_size=100,
+                gradient_norm_bound=10,
+                number_of_steps=100,
+                sigma=1,
+                moment_privacy_budget_tracker=moment_accountant,
+                rng=np.random.default_rng(1),
+                batched=True,
+                lot_sampler=PoissonLotSampler(800, 0.125, rng=np.random.default_rng(2))
+                )
+
+    check_absolute_error(param[0], 5., 0.5)
+    check_absolute_error(moment_accountant.consumed_privacy_budget.epsilon, 8.805554, 1e-6)
+
+
+def test_private_SGD_poisson_sampling_per_example(data):
+    """check that the per-example gradients of lots of varying sizes, stored in a buffer reused across steps,
+    give the same training as the batched gradients."""
+    train_data = np.array(data[:800])
+    params = []
+    for batched in [False, True]:
+        param = np.zeros(2)
+
+        def gradient_function(batch_data):
+            batch_data = np.atleast_2d(batch_data)
+            x, y = batch_data[:, 0], batch_data[:, 1]
+            y_pred = param[0]*x + param[1]
+            gradients = np.stack([-2.0 * x * (y-y_pred), -2.0 * (y-y_pred)], axis=1)
+            return gradients if batched else gradients[0]
+
+        def update_weights_function(new_weight):
+            param[:] = new_weight
+
+        private_SGD(gradient_function=gradient_function,
+                    get_weights_function=lambda: np.copy(param),
+                    update_weights_function=update_weights_function,
+                    learning_rate_function=lambda step: 0.01,
+                    train_data=train_data,
+                    group_size=100,
+                    gradient_norm_bound=10,
+                    number_of_steps=20,
+                    sigma=1,
+                    moment_privacy_budget_tracker=MomentPrivacyBudgetTracker(PrivacyBudget(10, 0.001)),
+                    rng=np.random.default_rng(1),
+                    batched=batched,
+                    lot_sampler=PoissonLotSampler(800, 0.125, rng=np.random.default_rng(2))
+                    )
+        params.append(param)
+    assert np.allclose(params[0], params[1])
@@ -0,0 +1,18 @@
+import numpy as np
+
+from calculate_moment import compute_log_moment, compute_log_moments
+
+
+def test_compute_log_moments():
+    """check the vectorized log moments are the same as the log moments computed order by order."""
+    for q, sigma, steps in [(0.125, 1., 100), (0.01, 4., 1000), (0.05, 0.8, 10)]:
+        log_moments = compute_log_moments(q, sigma, steps, 32)
+        expected = [compute_log_moment(q, sigma, steps, lmbd, verbose=True) for lmbd in range(1, 33)]
+        finite = np.isfinite(expected)
+        assert np.allclose(log_moments[finite], np.array(expected)[finite], rtol=1e-10)
+        assert np.all(np.isinf(log_moments[~finite]))
+
+
+def test_compute_log_moment_memoized():
+    """check the T-step log moment is T times the memoized one-step log moment."""
+    assert np.isclose(compute_log_moment(0.1, 2., 10, 5) * 3, compute_log_moment(0.1, 2., 30, 5), rtol=1e-12)
@@ -0,0 +1,59 @@
+import numpy as np
+
+from calculate_moment import compute_log_moments
+from calculate_rdp import DEFAULT_ORDERS, compute_rdp, get_privacy_spent_rdp
+from privacy_budget import PrivacyBudget, RenyiPrivacyBudget
+from privacy_budget_tracker import RenyiPrivacyBudgetTracker
+from utils import check_absolute_error
+
+
+def test_compute_rdp_integer_orders():
+    """check the RDP of integer orders against the log moments of the moments accountant."""
+    orders = np.arange(2, 34)
+    rdp = compute_rdp(0.125, 1., 100, orders)
+    log_moments = compute_log_moments(0.125, 1., 100, 32)
+    assert np.allclose(rdp * (orders - 1), log_moments, rtol=1e-9)
+
+
+def test_compute_rdp_fractional_orders():
+    """check the RDP of fractional orders lies between the RDP of the neighbouring integer orders."""
+    rdp = compute_rdp(0.01, 1.1, 1, [2., 2.5, 3.])
+    assert rdp[0] <= rdp[1] <= rdp[2]
+    assert np.allclose(compute_rdp(1., 2., 3, [1.5, 4.]), [3 * 1.5 / 8, 3 * 4. / 8])
+
+
+def test_compute_rdp_non_decreasing():
+    """check that the RDP of the default orders, fractional and integer, is non-decreasing in the order."""
+    for q, sigma in [(0.1, 4.), (0.01, 1.1), (0.001, 0.8), (0.5, 2.)]:
+        rdp = compute_rdp(q, sigma, 1, DEFAULT_ORDERS[DEFAULT_ORDERS <= 64])
+        assert np.all(np.diff(rdp) >= -1e-12 * rdp[1:]), (q, sigma)
+    check_absolute_error(compute_rdp(0.1, 4., 1, [1.5])[0], 0.00048213, 1e-7)
+
+
+def test_get_privacy_spent_rdp():
+    orders = np.array([2., 4., 8.])
+    rdp = np.array([0.5, 1., 2.])
+    eps, delta = get_privacy_spent_rdp(orders, rdp, target_delta=1e-5)
+    check_absolute_error(eps, min(rdp + np.log(1e5) / (orders - 1)), 1e-12)
+    check_absolute_error(get_privacy_spent_rdp(orders, rdp, target_eps=eps)[1], 1e-5, 1e-12)
+
+
+def test_renyi_privacy_budget():
+    orders = [2., 4., 8.]
+    e1 = RenyiPrivacyBudget(orders, [0.5, 1., 2.], target_delta=1e-5)
+    e2 = e1 + e1
+    assert np.allclose(e2.rdp, [1., 2., 4.])
+    assert e2.delta == 1e-5
+    assert e1.epsilon < e2.epsilon < 2 * e1.epsilon
+
+
+def test_renyi_privacy_budget_tracker():
+    """check the RDP accountant against the moments accountant used in test_private_SGD."""
+    tracker = RenyiPrivacyBudgetTracker(PrivacyBudget(10, 0.001), orders=np.arange(2, 34))
+    tracker.update_privacy_loss(sampling_ratio=100/800, sigma=1, steps=100, target_delta=0.5/800)
+    check_absolute_error(tracker.consumed_privacy_budget.epsilon, 8.805554, 1e-6)
+
+    tracker = RenyiPrivacyBudgetTracker(PrivacyBudget(10, 0.001))
+    tracker.update_privacy_loss(sampling_ratio=100/800, sigma=1, steps=50, target_delta=0.5/800)
+    tracker.update_privacy_loss(sampling_ratio=100/800, sigma=1, steps=50, target_delta=0.5/800)
+    assert tracker.consumed_privacy_budget.epsilon <= 8.805554
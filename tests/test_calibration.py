@@ -0,0 +1,59 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from calculate_moment import compute_log_moments, get_privacy_spent
+from calibration import calibrate_noise_multiplier, compute_epsilon
+from utils import check_absolute_error
+
+
+def test_compute_epsilon():
+    """check the vectorized epsilon against the moment accountant."""
+    log_moments = list(zip(range(1, 33), compute_log_moments(0.125, 1., 100, 32)))
+    check_absolute_error(compute_epsilon(0.125, 1., 100, 0.000625), get_privacy_spent(log_moments, target_delta=0.000625)[0], 1e-9)
+
+
+def test_calibrate_noise_multiplier(tmp_path):
+    cache_path = str(tmp_path / 'calibration.json')
+    sigma = calibrate_noise_multiplier(0.125, 100, 8.805554, 0.000625, tolerance=1e-4, cache_path=cache_path)
+    check_absolute_error(sigma, 1., 1e-3)
+    assert compute_epsilon(0.125, sigma, 100, 0.000625) <= 8.805554
+    assert compute_epsilon(0.125, sigma * (1 - 2e-4), 100, 0.000625) > 8.805554
+
+    with open(cache_path) as f:
+        assert list(json.load(f).values()) == [sigma]
+    assert calibrate_noise_multiplier(0.125, 100, 8.805554, 0.000625, tolerance=1e-4, cache_path=cache_path) == sigma
+
+
+def test_calibration_cache_shared_by_processes(tmp_path, monkeypatch):
+    """check that nothing is saved by default, and that the configurations of other processes are read and kept."""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    calibrate_noise_multiplier(0.125, 10, 8., 0.000625)
+    assert not (tmp_path / 'home').exists()
+
+    cache_path = str(tmp_path / 'calibration.json')
+    sigma = calibrate_noise_multiplier(0.125, 100, 8.805554, 0.000625, cache_path=cache_path)
+    with open(cache_path) as f:
+        cache = json.load(f)
+    key = '0.125,100,4.0,0.000625,32,0.001'
+    cache[key] = 2.5  # saved by another process after this process read the file
+    with open(cache_path, 'w') as f:
+        json.dump(cache, f)
+    assert calibrate_noise_multiplier(0.125, 100, 4., 0.000625, cache_path=cache_path) == 2.5
+
+    with open(cache_path, 'w') as f:
+        json.dump({'other': 1.}, f)
+    other_sigma = calibrate_noise_multiplier(0.125, 50, 8.805554, 0.000625, cache_path=cache_path)
+    with open(cache_path) as f:
+        assert sorted(json.load(f).values()) == sorted([1., other_sigma])
+    assert calibrate_noise_multiplier(0.125, 100, 8.805554, 0.000625, cache_path=cache_path) == sigma
+
+
+def test_calibration_cache_concurrent_processes(tmp_path):
+    """check that the configurations saved concurrently by several processes are all kept."""
+    cache_path = str(tmp_path / 'calibration.json')
+    calibrate = partial(calibrate_noise_multiplier, 0.125, target_eps=8., target_delta=0.000625, cache_path=cache_path)
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        sigmas = list(pool.map(calibrate, range(10, 90, 10)))
+    with open(cache_path) as f:
+        assert sorted(json.load(f).values()) == sorted(sigmas)
@@ -1,3 +1,6 @@
+import numpy as np
+import pytest
+
 from data_domain import CategoricalDataDomain, RealDataDomain
 
 
@@ -13,3 +16,32 @@ def test_cat_data_domain():
     assert dd.contains(2) == True
     assert dd.contains(None) == False
     assert dd.contains('2') == False
+
+
+def test_real_data_domain_contains_all():
+    dd = RealDataDomain(-1., 1.)
+    assert list(dd.contains_all([0., -2., 1., 3., float('nan')])) == [True, False, True, False, False]
+
+
+def test_cat_data_domain_contains_all():
+    dd = CategoricalDataDomain([1, 2, 3])
+    assert list(dd.contains_all([2, None, '2', 3])) == [True, False, False, True]
+
+
+def test_cat_data_domain_values_order():
+    dd = CategoricalDataDomain(['b', 'c', 'a', 'c'])
+    assert dd.values == ['b', 'c', 'a']
+
+
+def test_cat_data_domain_encode():
+    dd = CategoricalDataDomain([1, 2, 3])
+    codes = dd.encode([2, None, '2', 3])
+    assert list(codes) == [1, -1, -1, 2] and codes.dtype == np.int8
+    assert list(dd.decode(dd.encode([3, 1]))) == [3, 1]
+
+
+def test_cat_data_domain_null_values():
+    for null in [None, float('nan'), np.nan]:
+        with pytest.raises(AssertionError, match='null values'):
+            CategoricalDataDomain(['a', null])
+    assert CategoricalDataDomain([('a', None), 'b']).values == [('a', None), 'b']
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from federated_learning import DPFedAvgClient, FedAvgClient  # noqa: E402
+
+
+def _model():
+    return tf.keras.Sequential([tf.keras.Input(shape=(2, )), tf.keras.layers.Dense(1)])
+
+
+def _loss(model, minibatch):
+    minibatch = tf.convert_to_tensor(minibatch, dtype=tf.float32)
+    return tf.reduce_mean(tf.square(model(minibatch[:, :2])[:, 0] - minibatch[:, 2]))
+
+
+def _client_data():
+    rng = np.random.default_rng(0)
+    return [tuple(row) for row in rng.normal(size=(16, 3)).astype(np.float32)]
+
+
+def test_fedavg_client_graph_and_eager():
+    """check that the compiled epoch over the tf.data pipeline trains the model like the eager steps."""
+    tf.random.set_seed(0)
+    data = _client_data()
+    global_weights = _model().get_weights()
+    # one minibatch per epoch, so that the order of the shuffled data does not change the gradient
+    weights = [FedAvgClient(_model, _loss, data, **kwargs).train(global_weights, len(data), 3)[0]
+               for kwargs in [{}, {'use_tf_data': True}, {'use_tf_data': True, 'use_tf_function': True}]]
+    for other in weights[1:]:
+        for layer, other_layer in zip(weights[0], other):
+            assert np.allclose(layer, other_layer, atol=1e-5)
+
+    # the optimizer variables are created in the first trace, the next rounds reuse the compiled epoch
+    client = FedAvgClient(_model, _loss, data, use_tf_data=True, use_tf_function=True)
+    for minibatch_size in [len(data), len(data), 4]:
+        client.train(global_weights, minibatch_size, 2)
+    assert client._compiled_train_fn.experimental_get_tracing_count() == 1
+    with pytest.raises(AssertionError):
+        FedAvgClient(_model, _loss, data, use_tf_function=True)
+
+
+def test_dp_fedavg_client_graph_and_eager():
+    """check that the update clipped by TensorFlow ops in the compiled epoch is the update clipped by numpy."""
+    tf.random.set_seed(0)
+    data = _client_data()
+    global_weights = _model().get_weights()
+    updates = [DPFedAvgClient(_model, _loss, data, **kwargs).train(global_weights, len(data), 3, 1e-3)[0]
+               for kwargs in [{}, {'use_tf_data': True}, {'use_tf_data': True, 'use_tf_function': True}]]
+    assert np.linalg.norm(updates[0]) <= 1e-3 + 1e-6
+
+    client = DPFedAvgClient(_model, _loss, data, use_tf_data=True, use_tf_function=True)
+    for bound in [1e-3, 2e-3]:
+        update, _ = client.train(global_weights, 4, 2, bound)
+        assert np.linalg.norm(update) <= bound + 1e-6
+    assert client._compiled_train_fn.experimental_get_tracing_count() == 1
+    for other in updates[1:]:
+        assert np.allclose(updates[0], other, atol=1e-5)
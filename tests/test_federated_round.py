@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from federated_round import LocalTransport, RoundExecutor, run_round_async
+
+
+def test_round_executor():
+    """check that the requests run on a bounded pool and failed clients are dropped."""
+    running = []
+    lock = threading.Lock()
+
+    def request(client, scale):
+        with lock:
+            running.append(threading.get_ident())
+        time.sleep(0.01)
+        if client == 3:
+            raise ValueError('client failed')
+        return client * scale
+
+    with RoundExecutor(max_workers=4) as executor:
+        results = executor.run(request, list(range(10)), (2, ))
+    assert sorted(results) == [(i, i * 2) for i in range(10) if i != 3]
+    assert len(set(running)) <= 4
+
+    collected = []
+    with RoundExecutor(max_workers=4) as executor:
+        results = executor.run(request, list(range(10)), (2, ),
+                               on_result=lambda client, result: collected.append(result))
+    assert sorted(collected) == [i * 2 for i in range(10) if i != 3]
+    assert sorted(client for client, _ in results) == [i for i in range(10) if i != 3]
+    assert all(result is None for _, result in results)
+
+    with RoundExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError):
+            executor.run(request, [3], (2, ))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert RoundExecutor(pool).run(request, [1, 2], (3, )) in ([(1, 3), (2, 6)], [(2, 6), (1, 3)])
+
+
+def test_round_executor_stragglers():
+    """check the deadline and the aggregation over the first clients to finish, in an order set by events."""
+    finished = {client: threading.Event() for client in range(5)}
+
+    def request(client):
+        finished[client].wait()
+        return client
+
+    order = [1, 3, 0]  # each result releases the next client, the other clients never finish during the round
+
+    def release_next(client, result):
+        if order.index(client) + 1 < len(order):
+            finished[order[order.index(client) + 1]].set()
+
+    finished[order[0]].set()
+    with RoundExecutor(max_workers=8) as executor:
+        collected = executor.run(request, list(range(5)), target_clients=2, on_result=release_next)
+        assert [client for client, _ in collected] == [1, 3]
+
+        for event in finished.values():
+            event.clear()
+        finished[2].set()
+        finished[4].set()
+        results = executor.run(request, list(range(5)), deadline=0.05)
+        assert sorted(client for client, _ in results) == [2, 4]
+
+        for event in finished.values():
+            event.set()
+
+
+def _negate(client):
+    return -client
+
+
+def test_round_executor_process_pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        results = RoundExecutor(pool).run(_negate, list(range(4)), target_clients=4)
+    assert sorted(results) == [(i, -i) for i in range(4)]
+
+
+class InFlight:
+    """Number of requests running at the same time."""
+
+    def __init__(self):
+        self.current = 0
+        self.max = 0
+
+    async def __aenter__(self):
+        self.current += 1
+        self.max = max(self.max, self.current)
+
+    async def __aexit__(self, *args):
+        self.current -= 1
+
+
+def test_round_executor_asyncio():
+    """check that coroutine requests run concurrently on the event loop."""
+    in_flight = InFlight()
+
+    async def request(client):
+        async with in_flight:
+            await asyncio.sleep(0.01)
+        return -client
+
+    with RoundExecutor(max_workers=1) as executor:
+        results = executor.run(request, list(range(20)))
+        assert in_flight.max == 20
+        assert sorted(results) == [(i, -i) for i in range(20)]
+
+        async def blocked(client):
+            await asyncio.sleep(3600)  # cancelled at the end of the round
+
+        assert executor.run(blocked, list(range(20)), deadline=0.01) == []
+
+
+class Client:
+    def __init__(self, number):
+        self.number = number
+
+    def train(self, weights, minibatch_size, epoch):
+        return weights + self.number, self.number
+
+
+def test_run_round_async():
+    """check that thousands of requests over the local transport run concurrently on one event loop."""
+    clients = [Client(i) for i in range(2000)]
+    transport = LocalTransport(latency=0.01)
+    in_flight = InFlight()
+
+    async def request(client, weights):
+        async with in_flight:
+            return await transport.send(client, weights, 1, 1)
+
+    results = asyncio.run(run_round_async(request, clients, (1., )))
+    assert in_flight.max == 2000
+    assert transport.requests == 2000
+    assert sorted(result for _, result in results) == [(1. + i, i) for i in range(2000)]
+
+    collected = []
+    results = asyncio.run(run_round_async(request, clients[:10], (1., ), target_clients=5,
+                                          on_result=lambda client, result: collected.append(result[1])))
+    assert len(collected) == 5 and all(result is None for _, result in results)
+
+
+def test_run_round_async_stragglers():
+    """check the deadline, the first clients to finish and failed clients of asynchronous rounds."""
+    transport = LocalTransport(latency=lambda client: client.number / 100)
+
+    async def request(client):
+        if client.number == 1:
+            raise ValueError('client failed')
+        return await transport.send(client, 0., 1, 1)
+
+    clients = [Client(i) for i in [30, 1, 0, 2, 3, 50]]
+    results = asyncio.run(run_round_async(request, clients, target_clients=2))
+    assert [client.number for client, _ in results] == [0, 2]
+    results = asyncio.run(run_round_async(request, clients, deadline=0.2))
+    assert [client.number for client, _ in results] == [0, 2, 3]
+    with pytest.raises(ValueError):
+        asyncio.run(run_round_async(request, [Client(1)]))
+    assert asyncio.run(run_round_async(request, clients[-1:], deadline=0.01)) == []
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        transport = LocalTransport(executor=pool)
+        assert asyncio.run(transport.send(Client(2), 1., 1, 1)) == (3., 2)
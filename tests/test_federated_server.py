@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from federated_round import LocalTransport
+from federated_server import AsyncFedAvgServer, DPFedAvgServer, FedAvgServer
+
+
+class FakeModel:
+    """Model with the get_weights / set_weights interface of a Keras model."""
+
+    def __init__(self):
+        self.weights = [np.zeros((2, 2), dtype=np.float32), np.zeros(3, dtype=np.float32)]
+
+    def get_weights(self):
+        return [layer.copy() for layer in self.weights]
+
+    def set_weights(self, weights):
+        self.weights = [np.array(layer, dtype=np.float32).reshape(old.shape) for layer, old in zip(weights, self.weights)]
+
+
+def _weights(value):
+    return [np.full((2, 2), value, dtype=np.float32), np.full(3, value, dtype=np.float32)]
+
+
+class BlockingServer(FedAvgServer):
+    """Server whose clients finish when their event is set, client i returns weights i with i + 1 data."""
+
+    def __init__(self, clients):
+        super().__init__(FakeModel, clients)
+        self.finished = {client: threading.Event() for client in clients}
+
+    def send_train_request(self, client, minibatch_size, epoch):
+        self.finished[client].wait()
+        return _weights(client), client + 1
+
+
+class BlockingDPServer(DPFedAvgServer):
+    """DP server whose clients finish when their event is set, each client returns the update 1 with 10 data."""
+
+    def __init__(self, clients, total_data):
+        super().__init__(FakeModel, clients, total_data, rng=np.random.default_rng(0))
+        self.finished = {client: threading.Event() for client in clients}
+
+    def send_train_request(self, client, minibatch_size, epoch, gradient_norm_bound):
+        self.finished[client].wait()
+        return np.full(7, 0.1), 10
+
+
+def test_fedavg_server_target_clients():
+    """check that the round aggregates the first clients to finish only, without waiting for the others."""
+    server = BlockingServer(list(range(5)))
+    server.finished[4].set()
+    server.finished[1].set()
+    assert server.train(server.clients, 1, 1, target_clients=2) == 2
+    assert sorted(server.participants) == [1, 4]
+    assert np.allclose(server.model.weights[0], (4 * 5 + 1 * 2) / 7)
+    for event in server.finished.values():
+        event.set()
+    server.close()
+
+
+def test_fedavg_server_deadline():
+    """check that the clients which do not finish before the deadline are dropped."""
+    server = BlockingServer(list(range(4)))
+    server.finished[0].set()
+    server.finished[3].set()
+    assert server.train(server.clients, 1, 1, deadline=0.05) == 2
+    assert sorted(server.participants) == [0, 3]
+    assert np.allclose(server.model.weights[1], (0 * 1 + 3 * 4) / 5)
+
+    assert server.train([1, 2], 1, 1, deadline=0.01) == 0
+    assert server.participants == []
+    assert np.allclose(server.model.weights[1], 12 / 5)
+    for event in server.finished.values():
+        event.set()
+    server.close()
+
+
+def test_dp_fedavg_server_sampling_ratio():
+    """check that the update is normalized by the clients that took part and the sampling ratio counts the
+    selected clients."""
+    server = BlockingDPServer(list(range(8)), total_data=80)
+    for client in [0, 1]:
+        server.finished[client].set()
+    sampling_ratio = server.train(list(range(4)), 1, 1, gradient_norm_bound=10., noise_scale=0., deadline=0.05)
+    assert sampling_ratio == 4 / 8
+    assert sorted(server.participants) == [0, 1]
+    # each update 0.1 with weight 10 / 80, divided by qW = 2 / 8
+    assert np.allclose(server.model.weights[0], 0.1)
+
+    assert server.train([2, 3], 1, 1, gradient_norm_bound=10., noise_scale=0., deadline=0.01) == 0.
+    for event in server.finished.values():
+        event.set()
+    server.close()
+
+
+def _request(client, global_weights, minibatch_size, epoch):
+    return [layer + client for layer in global_weights], 1
+
+
+def test_fedavg_server_process_pool():
+    with pytest.raises(AssertionError):
+        FedAvgServer(FakeModel, [0, 1], executor=ProcessPoolExecutor(max_workers=1))
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        server = FedAvgServer(FakeModel, [0, 1, 2, 3], executor=pool, request_fn=_request)
+        assert server.train(server.clients, 1, 1) == 4
+    assert np.allclose(server.model.weights[0], 1.5)
+
+
+class Client:
+    def __init__(self, number):
+        self.number = number
+
+    def train(self, global_weights, minibatch_size, epoch):
+        return [layer + self.number for layer in global_weights], 1
+
+
+class LocalServer(AsyncFedAvgServer):
+    def __init__(self, clients, transport):
+        super().__init__(FakeModel, clients)
+        self.transport = transport
+
+    async def send_train_request(self, client, minibatch_size, epoch):
+        return await self.transport.send(client, self.model.get_weights(), minibatch_size, epoch)
+
+
+def test_async_fedavg_server():
+    server = LocalServer([Client(i) for i in range(100)], LocalTransport(latency=0.001))
+    assert asyncio.run(server.train(server.clients, 1, 1)) == 100
+    assert np.allclose(server.model.weights[0], 49.5)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from lot_sampler import PoissonLotSampler, take
+
+
+def test_poisson_lot_sampler():
+    """check that each example is sampled independently with the sampling ratio."""
+    sampler = PoissonLotSampler(1000, 0.05, prefetch=0, rng=np.random.default_rng(0))
+    lots = list(sampler.sample(2000))
+    sizes = np.array([len(lot) for lot in lots])
+    assert abs(sizes.mean() - 50) < 1
+    assert abs(sizes.var() - 1000 * 0.05 * 0.95) < 5
+    for lot in lots[:100]:
+        assert np.all(np.diff(lot) > 0) and lot[0] >= 0 and lot[-1] < 1000
+    frequencies = np.bincount(np.concatenate(lots), minlength=1000) / 2000
+    assert abs(frequencies[:500].mean() - frequencies[500:].mean()) < 0.005
+
+    assert np.array_equal(PoissonLotSampler(10, 1.).sample_lot(), np.arange(10))
+
+
+def test_poisson_lot_sampler_prefetch():
+    """check that prefetched lots are the same as the lots sampled in the calling thread."""
+    lots = list(PoissonLotSampler(1000, 0.1, prefetch=0, rng=np.random.default_rng(1)).sample(20))
+    prefetched = list(PoissonLotSampler(1000, 0.1, prefetch=3, rng=np.random.default_rng(1)).sample(20))
+    assert all(np.array_equal(a, b) for a, b in zip(lots, prefetched))
+
+    for i, lot in enumerate(PoissonLotSampler(1000, 0.1, prefetch=1).sample(100)):
+        if i == 2:
+            break
+
+
+class FailingSampler(PoissonLotSampler):
+    """Sampler whose third lot fails."""
+
+    def __init__(self, prefetch):
+        super().__init__(100, 0.1, prefetch=prefetch, rng=np.random.default_rng(0))
+        self.lots = 0
+
+    def sample_lot(self):
+        self.lots += 1
+        if self.lots == 3:
+            raise ValueError('index source failed')
+        return super().sample_lot()
+
+
+def test_poisson_lot_sampler_prefetch_error():
+    """check that an error of the prefetching thread is raised in the consumer instead of blocking it."""
+    for prefetch in [0, 1, 4]:
+        lots = FailingSampler(prefetch).sample(10)
+        next(lots), next(lots)
+        with pytest.raises(ValueError, match='index source failed'):
+            next(lots)
+
+
+def test_take():
+    data = np.arange(20).reshape(10, 2)
+    assert np.array_equal(take(data, np.array([1, 3])), [[2, 3], [6, 7]])
+    assert take([(0, 'a'), (1, 'b'), (2, 'c')], np.array([0, 2])) == [(0, 'a'), (2, 'c')]
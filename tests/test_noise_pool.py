@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+
+from noise_pool import NoisePool
+from privacy_budget import PrivacyBudget
+from private_mechanisms import exponential_mechanism, gaussian_mechanism, laplace_mechanism
+from random_generator import create_rng
+
+
+def test_noise_pool_distributions():
+    """check the scaled variates drawn from the pool follow the Laplace and Gaussian distributions."""
+    with NoisePool(block_size=1000, rng=create_rng(1)) as pool:
+        laplace = pool.laplace(loc=1., scale=2., size=100000)
+        normal = pool.normal(scale=np.full((100, 1000), 3.))
+        assert laplace.shape == (100000, )
+        assert normal.shape == (100, 1000)
+        assert abs(np.mean(laplace) - 1.) < 0.1 and abs(np.std(laplace) - 2. * np.sqrt(2)) < 0.1
+        assert abs(np.mean(normal)) < 0.1 and abs(np.std(normal) - 3.) < 0.1
+        assert isinstance(pool.laplace(), float)
+
+
+def test_noise_pool_variates_handed_out_once():
+    """check no variate is handed out twice when the pool is shared by threads."""
+    with NoisePool(block_size=100, low_watermark=1, high_watermark=2, rng=create_rng(1)) as pool:
+        draws = []
+
+        def query():
+            draws.append(pool.laplace(size=1000))
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        draws = np.concatenate(draws)
+        assert len(np.unique(draws)) == len(draws) == 8000
+
+
+def test_noise_pool_as_rng():
+    """check the pool can be used by the mechanisms as a random number generator."""
+    with NoisePool(block_size=1000) as pool:
+        assert abs(laplace_mechanism(10., 1., PrivacyBudget(1000.), rng=pool) - 10.) < 1.
+        assert gaussian_mechanism(np.zeros(10), 1., PrivacyBudget(0.5, 0.1), rng=pool).shape == (10, )
+        assert exponential_mechanism(None, lambda x: (['a', 'b'], [0., 100.]), 1., PrivacyBudget(10.), rng=pool) == 'b'
+
+
+def test_noise_pool_drained_draw_outside_lock():
+    """check that a query drawing a large block for a drained pool does not block the other queries."""
+    with NoisePool(block_size=100, rng=create_rng(1)) as pool:
+        buffer = pool._buffers['laplace']
+        draw, drawing, release = buffer.draw, threading.Event(), threading.Event()
+
+        def blocking_draw(n):
+            if n >= 50000:  # the variates missing for the large query
+                drawing.set()
+                release.wait()
+            return draw(n)
+
+        buffer.draw = blocking_draw
+        large, small = [], []
+        thread = threading.Thread(target=lambda: large.append(pool.laplace(size=100000)))
+        thread.start()
+        try:
+            assert drawing.wait(5)
+            other = threading.Thread(target=lambda: small.append((pool.laplace(size=10), pool.normal(size=10))),
+                                     daemon=True)
+            other.start()
+            other.join(5)
+            assert small and small[0][0].shape == (10, )  # answered while the large block is being drawn
+        finally:
+            release.set()
+            thread.join()
+        assert large[0].shape == (100000, )
@@ -0,0 +1,51 @@
+import numpy as np
+
+from parameter_vector import ParameterLayout, StreamingAggregator, clip_by_l2_norm, weighted_sum
+
+
+def test_parameter_layout():
+    weights = [np.arange(6, dtype=np.float32).reshape(2, 3), np.array([6., 7.], dtype=np.float32), np.float32(8.)]
+    layout = ParameterLayout.from_arrays(weights)
+    assert layout.shapes == [(2, 3), (2, ), ()]
+    assert layout.size == 9
+    assert layout.dtype == np.float32
+
+    vector = layout.flatten(weights)
+    assert np.array_equal(vector, np.arange(9))
+    assert layout.flatten(vector) is vector
+
+    layers = layout.unflatten(vector)
+    assert [layer.shape for layer in layers] == layout.shapes
+    layers[0][1, 2] = -1.  # the layers are views of the vector
+    assert vector[5] == -1.
+
+    out = layout.zeros()
+    assert layout.flatten(weights, out=out) is out
+    assert np.array_equal(out, np.arange(9))
+
+
+def test_clip_and_weighted_sum():
+    vector = np.array([3., 4.])
+    assert clip_by_l2_norm(vector, 1.) is vector
+    assert np.allclose(vector, [0.6, 0.8])
+    assert np.allclose(clip_by_l2_norm(np.array([0.3, 0.4]), 1.), [0.3, 0.4])
+
+    assert np.allclose(weighted_sum([np.array([1., 2.]), np.array([3., 4.])], [0.25, 0.75]), [2.5, 3.5])
+
+
+def test_streaming_aggregator():
+    """check that the running weighted mean is the same as the weighted sum of all vectors."""
+    layout = ParameterLayout([(2, 2), (3, )], np.float32)
+    rng = np.random.default_rng(0)
+    vectors = [rng.normal(size=layout.size).astype(np.float32) for _ in range(20)]
+    weights = rng.integers(1, 100, size=20)
+    aggregator = StreamingAggregator(layout)
+    for vector, weight in zip(vectors, weights):
+        aggregator.add(layout.unflatten(vector) if weight % 2 else vector, weight)
+    assert aggregator.count == 20 and aggregator.total_weight == weights.sum()
+    assert np.allclose(aggregator.mean(), weighted_sum(vectors, weights / weights.sum()))
+    assert np.allclose(aggregator.sum(), weighted_sum(vectors, weights))
+
+    aggregator = StreamingAggregator(layout)
+    aggregator.add(np.full(layout.size, 3.), 2., norm_bound=1.)
+    assert np.isclose(np.linalg.norm(aggregator.sum()), 2.)
@@ -14,3 +14,8 @@ def test_privacy_budget_class():
     e2 = PrivacyBudget(0.2, 0.004)
     e3 = PrivacyBudget(1 + 0.2, 0.01 + 0.004)
     assert e3 == e1 + e2
+
+
+def test_combine_multiple_privacy_losses():
+    e = combine_privacy_losses([PrivacyBudget(1., 0.01), PrivacyBudget(2., 0.), PrivacyBudget(3., 0.02)])
+    assert e == PrivacyBudget(6., 0.03)
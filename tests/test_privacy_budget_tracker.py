@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from calculate_moment import compute_log_moments
+from privacy_budget import PrivacyBudget
+from privacy_budget_tracker import MomentPrivacyBudgetTracker, SimplePrivacyBudgetTracker
+from utils import check_absolute_error
+
+
+def test_moment_privacy_budget_tracker_composition():
+    """check that updates with different parameters compose their log moments."""
+    tracker = MomentPrivacyBudgetTracker(PrivacyBudget(10, 0.001))
+    tracker.update_privacy_loss(sampling_ratio=0.125, sigma=1, steps=50, target_delta=0.000625)
+    tracker.update_privacy_loss(sampling_ratio=0.125, sigma=1, steps=50, target_delta=0.000625)
+    check_absolute_error(tracker.consumed_privacy_budget.epsilon, 8.805554, 1e-6)
+    check_absolute_error(tracker.consumed_privacy_budget.delta, 0.000625, 1e-12)
+
+    tracker.update_privacy_loss(sampling_ratio=0.01, sigma=4, steps=10, moment_order=16, target_delta=0.000625)
+    expected = compute_log_moments(0.125, 1, 100, 16) + compute_log_moments(0.01, 4, 10, 16)
+    assert np.allclose(tracker.log_moments, expected)
+
+
+def test_moment_privacy_budget_tracker_exceeded():
+    tracker = MomentPrivacyBudgetTracker(PrivacyBudget(1, 0.001))
+    tracker.update_privacy_loss(sampling_ratio=0.01, sigma=4, steps=100, target_delta=0.0001)
+    consumed = tracker.consumed_privacy_budget
+    with pytest.raises(AssertionError):
+        tracker.update_privacy_loss(sampling_ratio=0.125, sigma=1, steps=100, target_delta=0.0001)
+    assert tracker.consumed_privacy_budget == consumed
+
+
+def test_reserve_commit_rollback():
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(1.))
+    reservation = tracker.reserve(PrivacyBudget(0.6))
+    with pytest.raises(AssertionError):
+        tracker.reserve(PrivacyBudget(0.6))
+    assert tracker.consumed_privacy_budget == PrivacyBudget(0.)
+
+    reservation.rollback()
+    with tracker.reserve(PrivacyBudget(0.6)):
+        pass
+    assert tracker.consumed_privacy_budget == PrivacyBudget(0.6)
+
+    with pytest.raises(ValueError):
+        with tracker.reserve(PrivacyBudget(0.4)):
+            raise ValueError
+    assert tracker.consumed_privacy_budget == PrivacyBudget(0.6)
+    with pytest.raises(AssertionError):
+        reservation.commit()
+
+
+def test_concurrent_reservations():
+    """check concurrent queries never overspend the total privacy budget."""
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(100.))
+
+    def query():
+        try:
+            with tracker.reserve(PrivacyBudget(1.)):
+                time.sleep(0.001)
+            return True
+        except AssertionError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        answered = list(executor.map(lambda _: query(), range(300)))
+    assert sum(answered) == 100
+    assert tracker.consumed_privacy_budget == PrivacyBudget(100.)
@@ -0,0 +1,130 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from privacy_budget import PrivacyBudget
+from privacy_budget_tracker import MomentPrivacyBudgetTracker, SimplePrivacyBudgetTracker
+from privacy_ledger import FileLedger, SQLiteLedger
+
+
+@pytest.fixture(params=[FileLedger, SQLiteLedger])
+def ledger_class(request):
+    return request.param
+
+
+def test_ledger_persistence(ledger_class, tmp_path):
+    """check that a new tracker replays the privacy losses recorded by a previous one."""
+    path = str(tmp_path / 'ledger')
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(10., 0.1), ledger_class(path))
+    tracker.update_privacy_loss(PrivacyBudget(2., 0.01))
+    with pytest.raises(ValueError):
+        with tracker.reserve(PrivacyBudget(3.)):
+            raise ValueError
+    pending = tracker.reserve(PrivacyBudget(1.))  # never released, e.g. the process crashed
+
+    restarted = SimplePrivacyBudgetTracker(PrivacyBudget(10., 0.1), ledger_class(path))
+    assert restarted.consumed_privacy_budget == PrivacyBudget(2., 0.01)
+    with pytest.raises(AssertionError):
+        restarted.update_privacy_loss(PrivacyBudget(7.5))
+    restarted.update_privacy_loss(PrivacyBudget(7.))
+
+    pending.commit()
+    restarted.refresh()
+    assert restarted.consumed_privacy_budget == PrivacyBudget(10., 0.01)
+
+
+def test_ledger_moment_tracker(ledger_class, tmp_path):
+    path = str(tmp_path / 'ledger')
+    tracker = MomentPrivacyBudgetTracker(PrivacyBudget(10, 0.001), ledger_class(path))
+    tracker.update_privacy_loss(sampling_ratio=0.125, sigma=1, steps=50, target_delta=0.000625)
+
+    restarted = MomentPrivacyBudgetTracker(PrivacyBudget(10, 0.001), ledger_class(path))
+    restarted.update_privacy_loss(sampling_ratio=0.125, sigma=1, steps=50, target_delta=0.000625)
+    assert np.isclose(restarted.consumed_privacy_budget.epsilon, 8.805554, atol=1e-6)
+
+
+def _spend(ledger_class, path, number):
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(100.), ledger_class(path))
+    answered = 0
+    for _ in range(number):
+        try:
+            tracker.update_privacy_loss(PrivacyBudget(1.))
+            answered += 1
+        except AssertionError:
+            pass
+    return answered
+
+
+def test_ledger_shared_by_processes(ledger_class, tmp_path):
+    """check that processes sharing a ledger never overspend the total privacy budget."""
+    path = str(tmp_path / 'ledger')
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        answered = pool.starmap(_spend, [(ledger_class, path, 40)] * 4)
+    assert sum(answered) == 100
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(100.), ledger_class(path))
+    assert tracker.consumed_privacy_budget == PrivacyBudget(100.)
+
+
+def test_file_ledger_torn_record(tmp_path):
+    """check that a record torn by a crash is skipped."""
+    path = str(tmp_path / 'ledger')
+    SimplePrivacyBudgetTracker(PrivacyBudget(10.), FileLedger(path)).update_privacy_loss(PrivacyBudget(1.))
+    with open(path, 'a') as f:
+        f.write('{"id": "torn", "type": "res')
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(10.), FileLedger(path))
+    tracker.update_privacy_loss(PrivacyBudget(2.))
+    assert SimplePrivacyBudgetTracker(PrivacyBudget(10.), FileLedger(path)).consumed_privacy_budget == PrivacyBudget(3.)
+
+
+def test_ledger_shared_by_trackers_of_one_process(ledger_class, tmp_path):
+    """check that trackers of one process share the total privacy budget through their own ledger instances."""
+    path = str(tmp_path / 'ledger')
+    ledger = ledger_class(path)
+    tracker = SimplePrivacyBudgetTracker(PrivacyBudget(1.), ledger)
+    with pytest.raises(AssertionError):
+        SimplePrivacyBudgetTracker(PrivacyBudget(1.), ledger)
+
+    other = SimplePrivacyBudgetTracker(PrivacyBudget(1.), ledger_class(path))
+    tracker.update_privacy_loss(PrivacyBudget(1.))
+    with pytest.raises(AssertionError):
+        other.update_privacy_loss(PrivacyBudget(1.))
+
+    threads = [SimplePrivacyBudgetTracker(PrivacyBudget(50.), ledger_class(path)) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        answered = sum(pool.map(_spend_with, [t for t in threads for _ in range(20)]))
+    assert answered == 49
+    restarted = SimplePrivacyBudgetTracker(PrivacyBudget(50.), ledger_class(path))
+    assert restarted.consumed_privacy_budget == PrivacyBudget(50.)
+
+
+def _spend_with(tracker):
+    try:
+        tracker.update_privacy_loss(PrivacyBudget(1.))
+        return 1
+    except AssertionError:
+        return 0
+
+
+def test_ledger_group_commit_delay(ledger_class, tmp_path):
+    """check that a thread pays one sync per query, and that queries arriving one after another from several threads
+    within the group commit delay share their syncs."""
+    for delay, threads in [(0., 1), (0.2, 8)]:
+        ledger = ledger_class(str(tmp_path / f'ledger{threads}'), group_commit_delay=delay)
+        flushes = []
+        flush = ledger._flush
+        ledger._flush = lambda: flushes.append(flush())
+        tracker = SimplePrivacyBudgetTracker(PrivacyBudget(100.), ledger)
+        if threads == 1:
+            for _ in range(8):
+                tracker.update_privacy_loss(PrivacyBudget(1.))
+            assert len(flushes) == 8
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                futures = [pool.submit(tracker.update_privacy_loss, PrivacyBudget(1.)) for _ in range(threads)]
+                for future in futures:
+                    future.result()
+            assert len(flushes) < threads
+        assert tracker.consumed_privacy_budget == PrivacyBudget(8.)
+        ledger.close()
@@ -0,0 +1,25 @@
+import numpy as np
+
+from privacy_budget import PrivacyBudget
+from private_mechanisms import exponential_mechanism
+
+
+def test_exponential_mechanism():
+    """check the most probable element is selected for a large privacy budget."""
+    def score_function(x):
+        return np.unique(x, return_counts=True)
+
+    x = np.array(['a', 'b', 'b', 'c', 'b'])
+    assert exponential_mechanism(x, score_function, 1, PrivacyBudget(1000.)) == 'b'
+
+
+def test_exponential_mechanism_batch():
+    """check the frequencies of a batch of selections against the exponential mechanism probabilities."""
+    def score_function(x):
+        return ['a', 'b', 'c'], [0., 1., 2.]
+
+    selections = exponential_mechanism(None, score_function, 1, PrivacyBudget(2.), size=100000)
+    assert selections.shape == (100000, )
+    probability = np.exp([0., 1., 2.]) / np.sum(np.exp([0., 1., 2.]))
+    frequency = np.array([np.mean(selections == key) for key in ['a', 'b', 'c']])
+    assert all(np.abs(frequency - probability) < 0.01)
@@ -52,9 +52,8 @@ def test_private_categorical_hist(example_private_table: PrivateTable):
     """check private hist implementation for categorical column."""
     noisy_hist = example_private_table.cat_hist('Name', PrivacyBudget(10000.))
 
-    err = [1, 1, 1]
-    noisy_hist.sort()
-    assert all(np.abs(noisy_hist-[1, 1, 2]) < err)
+    err = [1, 1, 1, 1, 1, 1]
+    assert all(np.abs(noisy_hist-[1, 2, 1, 0, 0, 0]) < err)
     del noisy_hist
 
 
@@ -112,3 +111,130 @@ def test_private_mode(example_private_table: PrivateTable):
     noisy_mode = example_private_table.mode('Name', PrivacyBudget(10000.))
     assert noisy_mode == "Jack"
     del noisy_mode
+
+
+def test_domain_violations(example_table: DataFrame):
+    """check that rows out of domain are reported per column."""
+    domains = {'Name': CategoricalDataDomain(['Tom', 'Steve']),
+               'Age': RealDataDomain(0., 30.)}
+    with pytest.raises(AssertionError, match='Age'):
+        PrivateTable(example_table, domains, PrivacyBudget(1.0, 0.))
+
+    domains = {'Name': CategoricalDataDomain(['Tom', 'Jack', 'Steve']),
+               'Age': RealDataDomain(0., 130.)}
+    t = PrivateTable(example_table, domains, PrivacyBudget(1.0, 0.))
+    assert t.find_domain_violations({'Name': CategoricalDataDomain(['Tom', 'Steve']),
+                                     'Age': RealDataDomain(0., 30.)}) == {'Name': 2, 'Age': 2}
+
+
+def test_column_statistics_cache(example_private_table: PrivateTable):
+    """check that column statistics are cached and invalidated when the dataframe is replaced."""
+    statistics = example_private_table._column_statistics('Age')
+    assert statistics is example_private_table._column_statistics('Age')
+    assert statistics.count == 4
+    check_absolute_error(statistics.mean, 33.25, 1e-9)
+    check_absolute_error(statistics.var, np.var([28, 34, 29, 42]), 1e-9)
+    check_absolute_error(statistics.median, 31.5, 1e-9)
+
+    example_private_table.replace_dataframe(pd.DataFrame({'Name': ['Tom', 'Eve'], 'Age': [20, 30]}))
+    assert example_private_table._column_statistics('Age') is not statistics
+    check_absolute_error(example_private_table._column_statistics('Age').mean, 25., 1e-9)
+    with pytest.raises(AssertionError):
+        example_private_table.replace_dataframe(pd.DataFrame({'Name': ['Tom'], 'Age': [200]}))
+    check_absolute_error(example_private_table._column_statistics('Age').mean, 25., 1e-9)
+
+
+def test_query_batch(example_private_table: PrivateTable):
+    """check batched queries and their privacy budget consumption."""
+    answers = example_private_table.query_batch([('mean', 'Age', PrivacyBudget(10000.)),
+                                                 ('gaussian_mean', 'Age', PrivacyBudget(0.99, 0.5)),
+                                                 ('max', 'Age', PrivacyBudget(10000.)),
+                                                 ('median', 'Age', PrivacyBudget(10000.))])
+    check_absolute_error(answers[0], 33.25, 1.)
+    check_absolute_error(answers[2], 42., 1.)
+    check_absolute_error(answers[3], 31.5, 1.)
+    check_absolute_error(example_private_table.privacy_budget_tracker.consumed_privacy_budget.epsilon, 30000.99, 1e-6)
+    check_absolute_error(example_private_table.privacy_budget_tracker.consumed_privacy_budget.delta, 0.5, 1e-9)
+
+
+def test_query_batch_rejected_as_a_whole(example_private_table: PrivateTable):
+    """check that a batch exceeding the remaining privacy budget is rejected without consuming any budget."""
+    with pytest.raises(AssertionError, match='not enough privacy budget'):
+        example_private_table.query_batch([('mean', 'Age', PrivacyBudget(60000.)),
+                                           ('var', 'Age', PrivacyBudget(60000.))])
+    assert example_private_table.privacy_budget_tracker.consumed_privacy_budget == PrivacyBudget(0., 0.)
+
+
+def test_query_rejected_before_scanning(example_private_table: PrivateTable):
+    """check that a query exceeding the remaining privacy budget is rejected before the column is scanned,
+    and that a failing query releases its reserved privacy budget."""
+    with pytest.raises(AssertionError, match='not enough privacy budget'):
+        example_private_table.median('Age', PrivacyBudget(200000.))
+    assert 'Age' not in example_private_table._statistics
+
+    with pytest.raises(ValueError):
+        example_private_table.num_hist('Age', [30, 20, 10], PrivacyBudget(10000.))
+    assert example_private_table.privacy_budget_tracker.consumed_privacy_budget == PrivacyBudget(0., 0.)
+
+
+def test_group_by(example_private_table: PrivateTable):
+    """check grouped count/sum/mean, including groups without any row."""
+    grouped = example_private_table.group_by('Name')
+
+    noisy_count = grouped.count(PrivacyBudget(10000.))
+    assert list(noisy_count.index) == ['Tom', 'Jack', 'Steve', 'Eve', 'Adam', 'Lucifer']
+    assert all(np.abs(noisy_count.to_numpy() - [1, 2, 1, 0, 0, 0]) < 1)
+
+    noisy_sum = grouped.sum('Age', PrivacyBudget(10000.))
+    assert all(np.abs(noisy_sum.to_numpy() - [28, 76, 29, 0, 0, 0]) < 1)
+
+    noisy_mean = grouped.mean('Age', PrivacyBudget(10000.))
+    assert all(np.abs(noisy_mean[['Tom', 'Jack', 'Steve']].to_numpy() - [28, 38, 29]) < 1)
+
+    noisy_hist = grouped.cat_hist('Name', PrivacyBudget(10000.))
+    assert noisy_hist.shape == (6, 6)
+    check_absolute_error(noisy_hist.loc['Jack', 'Jack'], 2, 1)
+    check_absolute_error(noisy_hist.loc['Jack', 'Tom'], 0, 1)
+
+    assert example_private_table.privacy_budget_tracker.consumed_privacy_budget == PrivacyBudget(40000.)
+
+
+def test_save_and_load(example_private_table: PrivateTable, tmp_path):
+    """check that a saved private table is reopened with memory-mapped columns."""
+    example_private_table.save(str(tmp_path))
+    t = PrivateTable.load(str(tmp_path), PrivacyBudget(100000.0))
+    assert t._columns == {'Name', 'Age'}
+    assert t._data_domains['Name'].values == ['Tom', 'Jack', 'Steve', 'Eve', 'Adam', 'Lucifer']
+    assert not t._dataframe['Age'].to_numpy().flags.writeable  # read-only memory map
+    check_absolute_error(t.mean('Age', PrivacyBudget(10000.)), 33.25, 1.)
+    assert t.mode('Name', PrivacyBudget(10000.)) == 'Jack'
+    assert list(t._dataframe['Name']) == ['Tom', 'Jack', 'Steve', 'Jack']
+
+
+def test_categorical_encoding(example_private_table: PrivateTable):
+    """check that categorical columns are stored as compact codes following the order of the data domain."""
+    assert example_private_table._dataframe['Name'].cat.codes.dtype == np.int8
+    assert list(example_private_table._dataframe['Name'].cat.codes) == [0, 1, 2, 1]
+    keys, counts = example_private_table._column_statistics('Name').category_counts
+    assert list(keys) == ['Tom', 'Jack', 'Steve', 'Eve', 'Adam', 'Lucifer']
+    assert list(counts) == [1, 2, 1, 0, 0, 0]
+
+
+def test_save_numpy_domains(tmp_path):
+    """check that data domains with numpy scalars are saved and that unsupported columns fail before any write."""
+    df = pd.DataFrame({'Code': np.array([3, 1, 3]), 'Score': np.array([1, 5, 2])})
+    domains = {'Code': CategoricalDataDomain(np.unique(df['Code'])),
+               'Score': RealDataDomain(np.int64(0), np.int64(10))}
+    PrivateTable(df, domains, PrivacyBudget(1.)).save(str(tmp_path / 'table'))
+    t = PrivateTable.load(str(tmp_path / 'table'), PrivacyBudget(1.))
+    assert t._data_domains['Code'].values == [1, 3]
+    assert list(t._dataframe['Code']) == [3, 1, 3]
+    assert t._data_domains['Score'].upper_bound == 10
+
+    df = pd.DataFrame({'Score': pd.Series([1, 5, 2], dtype=object)})
+    with pytest.raises(TypeError, match='object dtype'):
+        PrivateTable(df, {'Score': RealDataDomain(0., 10.)}, PrivacyBudget(1.)).save(str(tmp_path / 'object'))
+    with pytest.raises(TypeError, match='cannot be saved'):
+        PrivateTable(df.astype(int), {'Score': CategoricalDataDomain([1, 2, 5, frozenset()])}, PrivacyBudget(1.)).save(
+            str(tmp_path / 'domain'))
+    assert not (tmp_path / 'object').exists() and not (tmp_path / 'domain').exists()
@@ -0,0 +1,50 @@
+import threading
+
+import numpy as np
+import pytest
+from numpy.random import SFC64, Philox
+
+from privacy_budget import PrivacyBudget
+from private_mechanisms import laplace_mechanism
+from random_generator import create_rng, get_default_rng, seed_default_rng, spawn_rngs
+
+
+def test_create_rng():
+    assert isinstance(create_rng(1, 'Philox').bit_generator, Philox)
+    assert isinstance(create_rng(1, 'SFC64').bit_generator, SFC64)
+    assert create_rng(1).random() == create_rng(1).random()
+    with pytest.raises(AssertionError):
+        create_rng(1, 'MT19937')
+
+
+def test_create_secure_rng():
+    pytest.importorskip('randomgen')
+    rng = create_rng(secure=True)
+    assert rng.laplace(size=10).shape == (10, )
+    with pytest.raises(AssertionError):
+        create_rng(1, secure=True)
+
+
+def test_spawn_rngs():
+    rngs = spawn_rngs(3, seed=1)
+    draws = [rng.random() for rng in rngs]
+    assert len(set(draws)) == 3
+    assert draws == [rng.random() for rng in spawn_rngs(3, seed=1)]
+
+
+def test_seed_default_rng():
+    seed_default_rng(7)
+    x = laplace_mechanism(0., 1., PrivacyBudget(1.))
+    seed_default_rng(7)
+    assert laplace_mechanism(0., 1., PrivacyBudget(1.)) == x
+    assert laplace_mechanism(0., 1., PrivacyBudget(1.), rng=create_rng(1)) == \
+        laplace_mechanism(0., 1., PrivacyBudget(1.), rng=create_rng(1))
+
+
+def test_default_rng_per_thread():
+    rngs = [get_default_rng()]
+    thread = threading.Thread(target=lambda: rngs.append(get_default_rng()))
+    thread.start()
+    thread.join()
+    assert rngs[0] is get_default_rng()
+    assert rngs[0] is not rngs[1]
@@ -0,0 +1,108 @@
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_statistics import ColumnStatistics, StreamingColumnStatistics
+from data_domain import CategoricalDataDomain, RealDataDomain
+from privacy_budget import PrivacyBudget
+from streaming_private_table import StreamingPrivateTable
+from utils import check_absolute_error
+
+IRIS_COLUMNS = ["Sepal Length", "Sepal Width", "Petal Length", "Petal Width", "Class"]
+IRIS_DOMAINS = {'Sepal Length': RealDataDomain(0., 10.),
+                'Sepal Width': RealDataDomain(0., 10.),
+                'Petal Length': RealDataDomain(0., 10.),
+                'Petal Width': RealDataDomain(0., 10.),
+                'Class': CategoricalDataDomain(['Iris-setosa', 'Iris-versicolor', 'Iris-virginica'])}
+
+
+@pytest.fixture
+def example_streaming_table():
+    return StreamingPrivateTable.from_csv(os.path.join("dataset", "iris_data.txt"), IRIS_DOMAINS,
+                                          PrivacyBudget(100000.0, 1.), chunksize=32, names=IRIS_COLUMNS)
+
+
+def test_streaming_statistics(example_streaming_table: StreamingPrivateTable):
+    """check that the statistics merged over chunks are the same as those of the whole column."""
+    df = pd.read_csv(os.path.join("dataset", "iris_data.txt"), names=IRIS_COLUMNS)
+    for column in IRIS_COLUMNS[:4]:
+        statistics = example_streaming_table._column_statistics(column)
+        assert statistics.count == len(df)
+        check_absolute_error(statistics.mean, df[column].mean(), 1e-9)
+        check_absolute_error(statistics.var, np.var(df[column]), 1e-9)
+        check_absolute_error(statistics.min, df[column].min(), 1e-9)
+        check_absolute_error(statistics.max, df[column].max(), 1e-9)
+        middle = np.sort(df[column])[[len(df) // 2 - 1, len(df) // 2]]
+        assert middle[0] - 10. / 1024 <= statistics.median <= middle[1] + 10. / 1024
+    keys, counts = example_streaming_table._column_statistics('Class').category_counts
+    assert list(keys) == ['Iris-setosa', 'Iris-versicolor', 'Iris-virginica']
+    assert list(counts) == [50, 50, 50]
+
+
+def test_streaming_queries(example_streaming_table: StreamingPrivateTable):
+    """check the statistical functions on top of the streaming backend."""
+    check_absolute_error(example_streaming_table.mean('Sepal Length', PrivacyBudget(10000.)), 5.843333333333335, 1.)
+    check_absolute_error(example_streaming_table.std('Sepal Width', PrivacyBudget(10000.)), 0.4335943113621737, 1.)
+    check_absolute_error(example_streaming_table.median('Petal Length', PrivacyBudget(10000.)), 4.35, 1.)
+    assert example_streaming_table.mode('Class', PrivacyBudget(1.)) in IRIS_DOMAINS['Class'].values
+
+    bins: List[float] = [0., 2., 4., 6., 8.]
+    noisy_hist = example_streaming_table.num_hist('Petal Length', bins, PrivacyBudget(10000.))
+    assert all(np.abs(noisy_hist - [50, 11, 78, 11]) < 1)
+
+    noisy_mean = example_streaming_table.group_by('Class').mean('Sepal Length', PrivacyBudget(10000.))
+    assert all(np.abs(noisy_mean.to_numpy() - [5.006, 5.936, 6.588]) < 1)
+    check_absolute_error(example_streaming_table.privacy_budget_tracker.consumed_privacy_budget.epsilon, 50001., 1e-6)
+
+
+def test_streaming_from_iterator():
+    """check a one-shot iterator of chunks, a list of chunks read again and the reported domain violations."""
+    df = pd.DataFrame({'Name': ['Tom', 'Jack', 'Steve', 'Jack'], 'Age': [28, 34, 29, 42]})
+    domains = {'Name': CategoricalDataDomain(['Tom', 'Jack', 'Steve']), 'Age': RealDataDomain(0., 130.)}
+    t = StreamingPrivateTable(iter([df[:3], df[3:]]), domains, PrivacyBudget(10000.))
+    check_absolute_error(t.max('Age', PrivacyBudget(1000.)), 42., 1.)
+    with pytest.raises(AssertionError, match='one-shot'):
+        t.num_hist('Age', [0., 50., 100.], PrivacyBudget(1000.))
+
+    t = StreamingPrivateTable([df[:3], df[3:]], domains, PrivacyBudget(10000.))
+    assert t._dataframe is None and t._statistics['Age'].count == 4
+    for _ in range(2):
+        assert all(np.abs(t.num_hist('Age', [0., 30., 100.], PrivacyBudget(1000.)) - [2, 2]) < 1)
+
+    with pytest.raises(AssertionError, match="'Age': 2"):
+        StreamingPrivateTable(iter([df[:2], df[2:]]), {'Name': domains['Name'], 'Age': RealDataDomain(0., 30.)},
+                              PrivacyBudget(1.))
+
+
+def test_streaming_variance_large_offset():
+    """check that the variance merged over chunks is precise for values with a large offset."""
+    values = 1e9 + np.random.default_rng(0).random(100000)
+    statistics = StreamingColumnStatistics(RealDataDomain(1e9, 1e9 + 1))
+    other = StreamingColumnStatistics(RealDataDomain(1e9, 1e9 + 1))
+    for chunk in np.array_split(values[:60000], 7):
+        statistics.update(chunk)
+    for chunk in np.array_split(values[60000:], 3):
+        other.update(chunk)
+    statistics.merge(other)
+    check_absolute_error(statistics.var, np.var(values), 1e-6)
+    check_absolute_error(ColumnStatistics(values).var, np.var(values), 1e-9)
+
+
+def test_streaming_unsupported_and_rng():
+    """check that the operations needing the whole data fail fast and that the random generator is passed on."""
+    path = os.path.join("dataset", "iris_data.txt")
+    tables = [StreamingPrivateTable.from_csv(path, IRIS_DOMAINS, PrivacyBudget(10.), chunksize=32, names=IRIS_COLUMNS,
+                                             rng=np.random.default_rng(7)) for _ in range(2)]
+    assert tables[0].mean('Sepal Length', PrivacyBudget(1.)) == tables[1].mean('Sepal Length', PrivacyBudget(1.))
+    with pytest.raises(TypeError, match='streaming mode'):
+        tables[0].replace_dataframe(pd.read_csv(path, names=IRIS_COLUMNS))
+    with pytest.raises(TypeError, match='streaming mode'):
+        tables[0]._column_statistics('Sepal Length').sorted_values
+
+
+def test_streaming_save(example_streaming_table: StreamingPrivateTable, tmp_path):
+    with pytest.raises(TypeError, match='streaming mode'):
+        example_streaming_table.save(str(tmp_path))
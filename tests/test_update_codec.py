@@ -0,0 +1,43 @@
+import numpy as np
+
+from update_codec import QuantizationCodec, TopKCodec, decode_update
+
+
+def test_quantization_codec():
+    rng = np.random.default_rng(0)
+    vector = rng.normal(size=1000)
+    data = QuantizationCodec().encode(vector)
+    assert len(data) < 1000 + 20
+    assert np.abs(decode_update(data) - vector).max() <= np.abs(vector).max() / 254 + 1e-6
+    data = QuantizationCodec('float16').encode(vector)
+    assert len(data) < 2000 + 20
+    assert np.allclose(decode_update(data), vector, rtol=1e-3, atol=1e-4)
+    assert np.array_equal(decode_update(QuantizationCodec().encode(np.zeros(5))), np.zeros(5))
+
+
+def test_quantization_codec_stochastic_rounding():
+    """check that the decoded updates are unbiased with stochastic rounding."""
+    rng = np.random.default_rng(1)
+    vector = np.array([0.3, 1., -0.55, 1e-3 + 1 / 3])
+    for dtype in ['int8', 'float16']:
+        codec = QuantizationCodec(dtype, stochastic_rounding=True, rng=rng)
+        mean = np.mean([decode_update(codec.encode(vector)) for _ in range(10000)], axis=0)
+        nearest = decode_update(QuantizationCodec(dtype).encode(vector))
+        assert np.all(np.abs(mean - vector) <= np.abs(nearest - vector) / 2 + 1e-6)
+
+
+def test_top_k_codec():
+    vector = np.array([0.1, -3., 0.2, 2., 0.])
+    codec = TopKCodec(0.4)
+    total = decode_update(codec.encode(vector))
+    assert np.array_equal(total, [0., -3., 0., 2., 0.])
+    assert np.allclose(codec.residual, [0.1, 0., 0.2, 0., 0.])
+
+    # with error feedback, the coordinates not sent are sent later, so the updates sent converge to the updates
+    for _ in range(99):
+        total += decode_update(codec.encode(vector))
+    assert np.allclose(total / 100, vector, atol=0.05)
+
+    codec = TopKCodec(0.4, error_feedback=False)
+    for _ in range(3):
+        assert np.array_equal(decode_update(codec.encode(vector)), [0., -3., 0., 2., 0.])
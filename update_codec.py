@@ -0,0 +1,152 @@
+"""
+Codecs compressing the updates uploaded by federated learning clients.
+
+A client encodes its update, a flat parameter vector, into compact bytes with an :class:`UpdateCodec`, and the server
+decodes them with :func:`decode_update` before aggregation. The bytes start with a header identifying the codec and
+the size of the vector, so the server does not need to know which codec each client uses. The codecs are:
+
+- :class:`QuantizationCodec`: int8 quantization with a scale per update, or float16, optionally with stochastic
+  rounding, which makes the decoded update an unbiased estimate of the update,
+- :class:`TopKCodec`: top-k sparsification, which sends the largest coordinates only, with error feedback, i.e. the
+  coordinates not sent are added to the next update of the client.
+"""
+
+import struct
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Type
+
+import numpy as np
+from numpy import ndarray
+from numpy.random import Generator
+
+from random_generator import get_default_rng
+
+_HEADER = struct.Struct('<BI')  # codec id, size of the vector
+_SCALE = struct.Struct('<d')
+_COUNT = struct.Struct('<I')
+
+
+class UpdateCodec(ABC):
+    """Base class of update codec."""
+
+    codec_id = 0
+
+    @abstractmethod
+    def encode(self, vector: ndarray) -> bytes:
+        """Encode an update.
+
+        :param vector: The update, as a flat parameter vector
+        :return: The encoded update
+        """
+
+    @classmethod
+    @abstractmethod
+    def _decode(cls, size: int, payload: memoryview) -> ndarray:
+        pass
+
+    def _header(self, size: int) -> bytes:
+        return _HEADER.pack(self.codec_id, size)
+
+
+class QuantizationCodec(UpdateCodec):
+    """Quantization of the updates to int8, with the scale max(abs(update)) / 127, or to float16."""
+
+    codec_id = 1
+
+    def __init__(self, dtype: str = 'int8', stochastic_rounding: bool = False, rng: Optional[Generator] = None):
+        """
+        :param dtype: Data type of the quantized update, `int8` or `float16`, defaults to `int8`
+        :param stochastic_rounding: Round up or down randomly with probabilities such that the decoded update is
+            unbiased, instead of rounding to the nearest value, defaults to False
+        :param rng: Random number generator used for stochastic rounding, defaults to None (the default generator of
+            the calling thread)
+        """
+        assert dtype in ('int8', 'float16'), f'Data type `{dtype}` is not supported.'
+        self.dtype = dtype
+        self.stochastic_rounding = stochastic_rounding
+        self.rng = rng
+
+    def encode(self, vector: ndarray) -> bytes:
+        vector = np.asarray(vector, dtype=np.float64)
+        rng = (get_default_rng() if self.rng is None else self.rng) if self.stochastic_rounding else None
+        if self.dtype == 'float16':
+            finfo = np.finfo(np.float16)
+            vector = np.clip(vector, finfo.min, finfo.max)
+            quantized = vector.astype(np.float16)
+            if self.stochastic_rounding:
+                nearest = quantized.astype(np.float64)
+                other = np.nextafter(quantized, np.where(vector > nearest, np.inf, -np.inf).astype(np.float16))
+                step = other.astype(np.float64) - nearest
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    probability = np.where(step != 0, (vector - nearest) / step, 0.)
+                quantized = np.where(rng.random(len(vector)) < probability, other, quantized)
+            return self._header(len(vector)) + struct.pack('<B', 0) + quantized.tobytes()
+
+        max_abs = float(np.max(np.abs(vector))) if len(vector) > 0 else 0.
+        scale = max_abs / 127 if max_abs > 0 else 1.
+        scaled = vector / scale
+        if self.stochastic_rounding:
+            scaled = np.floor(scaled + rng.random(len(vector)))
+        else:
+            scaled = np.rint(scaled)
+        quantized = np.clip(scaled, -127, 127).astype(np.int8)
+        return self._header(len(vector)) + struct.pack('<B', 1) + _SCALE.pack(scale) + quantized.tobytes()
+
+    @classmethod
+    def _decode(cls, size: int, payload: memoryview) -> ndarray:
+        if payload[0] == 0:
+            return np.frombuffer(payload, dtype=np.float16, count=size, offset=1).astype(np.float32)
+        scale, = _SCALE.unpack_from(payload, 1)
+        return np.frombuffer(payload, dtype=np.int8, count=size, offset=1 + _SCALE.size) * np.float32(scale)
+
+
+class TopKCodec(UpdateCodec):
+    """Top-k sparsification of the updates, with error feedback. The codec keeps the residual of the updates of one
+    client, so each client needs its own instance."""
+
+    codec_id = 2
+
+    def __init__(self, fraction: float, error_feedback: bool = True):
+        """
+        :param fraction: Fraction of the coordinates sent, the k largest ones in absolute value
+        :param error_feedback: Add the coordinates not sent to the next update, defaults to True
+        """
+        assert 0 < fraction <= 1, "expected a fraction in (0, 1]."
+        self.fraction = fraction
+        self.error_feedback = error_feedback
+        self.residual = None  # type: Optional[ndarray]
+
+    def encode(self, vector: ndarray) -> bytes:
+        vector = np.asarray(vector, dtype=np.float64)
+        if self.error_feedback and self.residual is not None and len(self.residual) == len(vector):
+            vector = vector + self.residual
+        k = min(len(vector), max(1, int(np.ceil(self.fraction * len(vector)))))
+        indices = np.sort(np.argpartition(np.abs(vector), len(vector) - k)[len(vector) - k:]).astype(np.uint32)
+        values = vector[indices].astype(np.float32)
+        if self.error_feedback:
+            self.residual = vector.copy()
+            self.residual[indices] -= values
+        return self._header(len(vector)) + _COUNT.pack(k) + indices.tobytes() + values.tobytes()
+
+    @classmethod
+    def _decode(cls, size: int, payload: memoryview) -> ndarray:
+        k, = _COUNT.unpack_from(payload)
+        indices = np.frombuffer(payload, dtype=np.uint32, count=k, offset=_COUNT.size)
+        values = np.frombuffer(payload, dtype=np.float32, count=k, offset=_COUNT.size + 4 * k)
+        vector = np.zeros(size, dtype=np.float32)
+        vector[indices] = values
+        return vector
+
+
+_CODECS = {codec.codec_id: codec for codec in (QuantizationCodec, TopKCodec)}  # type: Dict[int, Type[UpdateCodec]]
+
+
+def decode_update(data: bytes) -> ndarray:
+    """Decode an update encoded by any codec.
+
+    :param data: The encoded update
+    :return: The update, as a flat float32 parameter vector
+    """
+    codec_id, size = _HEADER.unpack_from(data)
+    assert codec_id in _CODECS, f'Unknown codec {codec_id}.'
+    return _CODECS[codec_id]._decode(size, memoryview(data)[_HEADER.size:])